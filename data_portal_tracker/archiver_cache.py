@@ -0,0 +1,110 @@
+# Importing required libraries
+import sqlite3
+import threading
+from time import time
+
+
+class ArchiverCache:
+    """A class containing a persistent local cache (SQLite) that maps dataset/metadata URLs to their IDs in the Archiver, so that URLs confirmed in previous runs don't have to be requested via the Archiver API again.
+
+    Entries expire after a time to live and the least recently used entries are evicted when the cache grows beyond its maximum size.
+    """
+
+    def __init__(self, cache_file: str, time_to_live: float = 14 * 24 * 60 * 60, maximum_entries: int = 5000000, eviction_interval: int = 10000, refresh_interval: float = 24 * 60 * 60):
+        """Instantiating the class.
+
+        Args:
+            cache_file (str): the path of the SQLite file to be created or reused
+            time_to_live (float, optional): the number of seconds after which an entry has to be confirmed via the API again - defaults to 14 days
+            maximum_entries (int, optional): the maximum number of entries kept in the cache - defaults to 5,000,000
+            eviction_interval (int, optional): the number of insertions after which expired and least recently used entries are evicted - defaults to 10,000
+            refresh_interval (float, optional): the number of seconds after which a hit marks an entry as recently used again, so that not every hit writes to the database - defaults to 1 day
+        """
+
+        self.time_to_live = time_to_live
+        self.maximum_entries = maximum_entries
+        self.eviction_interval = eviction_interval
+        self.refresh_interval = refresh_interval
+        self.insertions_since_eviction = 0
+
+        # Opening the database, which is shared by all threads and protected by a lock
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(cache_file, check_same_thread = False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS archiver_ids (url TEXT PRIMARY KEY, archiver_id TEXT NOT NULL, confirmed REAL NOT NULL, last_used REAL NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS archiver_ids_last_used ON archiver_ids (last_used)")
+        self.connection.commit()
+
+        # Removing the entries that expired since the last run
+        self.evict()
+
+    def get(self, url: str) -> str:
+        """Getting the Archiver ID of a URL from the cache.
+
+        Args:
+            url (str): the URL of the dataset/metadata
+
+        Returns:
+            str: the ID of the dataset/metadata in the Archiver or None if the URL is not cached or the entry has expired
+        """
+
+        now = time()
+
+        with self.lock:
+            row = self.connection.execute("SELECT archiver_id, last_used FROM archiver_ids WHERE url = ? AND confirmed > ?", (url, now - self.time_to_live)).fetchone()
+
+            # Marking the entry as recently used, unless it was marked within the refresh interval (which is precise enough for evicting the least recently used entries)
+            if row is not None and row[1] <= now - self.refresh_interval:
+                self.connection.execute("UPDATE archiver_ids SET last_used = ? WHERE url = ?", (now, url))
+                self.connection.commit()
+
+        return row[0] if row is not None else None
+
+    def put(self, url: str, archiver_id: str):
+        """Saving the Archiver ID of a URL that was confirmed via the Archiver API.
+
+        Args:
+            url (str): the URL of the dataset/metadata
+            archiver_id (str): the ID of the dataset/metadata in the Archiver
+        """
+
+        now = time()
+
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO archiver_ids (url, archiver_id, confirmed, last_used) VALUES (?, ?, ?, ?)", (url, str(archiver_id), now, now))
+            self.connection.commit()
+            self.insertions_since_eviction += 1
+            evict = self.insertions_since_eviction >= self.eviction_interval
+
+        if evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """Removing expired entries and, if the cache is larger than its maximum size, the least recently used entries.
+
+        Returns:
+            int: the number of removed entries
+        """
+
+        with self.lock:
+            self.insertions_since_eviction = 0
+
+            # Removing the expired entries
+            removed = self.connection.execute("DELETE FROM archiver_ids WHERE confirmed <= ?", (time() - self.time_to_live,)).rowcount
+
+            # Removing the least recently used entries above the maximum size
+            excess = self.connection.execute("SELECT COUNT(*) FROM archiver_ids").fetchone()[0] - self.maximum_entries
+            if excess > 0:
+                removed += self.connection.execute("DELETE FROM archiver_ids WHERE url IN (SELECT url FROM archiver_ids ORDER BY last_used LIMIT ?)", (excess,)).rowcount
+
+            self.connection.commit()
+
+        return removed
+
+    def close(self):
+        """Closing the database.
+        """
+
+        with self.lock:
+            self.connection.close()
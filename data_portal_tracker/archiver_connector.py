@@ -1,24 +1,39 @@
 # Importing required libraries
-import os
 import json
 import pymongo
-import requests
-import pandas as pd
-from time import sleep
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+import threading
+from random import random
 from datetime import datetime
 from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor, Future
 from dotenv import dotenv_values
+from log_writer import get_log_writer
+from http_client import http_client
+from circuit_breaker import circuit_breaker
+from archiver_cache import ArchiverCache
+from run_store import RunStore
+from retry_queue import RetryQueue
 
 
 class ArchiverConnector:
     """A class containing functions that connect to the Archiver API (using HTTP requests) and the Archiver database (via MongoDB queries).
     """
 
-    def __init__(self, mode: str):
+    def __init__(self, mode: str, batch_size: int = 500, mapping_collection = None, cache: ArchiverCache = None, max_concurrent_lookups: int = 8, verification: str = "always", verification_sample_rate: float = 0.05, run_store: RunStore = None, retry_queue: RetryQueue = None):
         """Instantiating the class.
 
         Args:
             mode (str): which MongoDB to connect to - must be "local" or "production"
+            batch_size (int, optional): the maximum number of datasets/metadata inserted with one API request - defaults to 500
+            mapping_collection (optional): an existing "datasets.mappings" collection used instead of connecting to a MongoDB, e.g. a mongomock collection for testing - defaults to None
+            cache (ArchiverCache, optional): a local cache of Archiver IDs that is checked before requesting the Archiver API - defaults to None
+            max_concurrent_lookups (int, optional): the maximum number of API requests checking datasets that run at the same time - defaults to 8
+            verification (str, optional): when newly added mappings are read back from the MongoDB to verify them - must be "always", "sampled" (a random fraction of them) or "deferred" (all of them in bulk at the end of a portal, see verify_deferred()) - defaults to "always"
+            verification_sample_rate (float, optional): the fraction of newly added mappings verified if the verification is "sampled" - defaults to 0.05
+            run_store (RunStore, optional): the database recording the handled datasets of each crawl run - defaults to None
+            retry_queue (RetryQueue, optional): the durable queue the failed datasets are pushed to, so that they are retried later - defaults to None
         """      
 
         # Loading environment variables 
@@ -27,6 +42,27 @@ class ArchiverConnector:
         # Setting Archiver API variables
         self.archiver_base_url = config["ARCHIVER_BASE_URL"]
         self.archiver_password = config["ARCHIVER_PASSWORD"]
+        self.batch_size = batch_size
+        self.cache = cache
+        self.run_store = run_store
+        self.retry_queue = retry_queue
+
+        # Setting the verification policy
+        if verification not in ("always", "sampled", "deferred"):
+            raise ValueError("The verification must be \"always\", \"sampled\" or \"deferred\".")
+        self.verification = verification
+        self.verification_sample_rate = verification_sample_rate
+
+        # Creating the worker threads for concurrent dataset checks and a dictionary of the checks currently running, so that identical checks are merged
+        self.lookup_executor = ThreadPoolExecutor(max_workers = max_concurrent_lookups)
+        self.lookups_in_flight = {}
+        self.lookups_lock = threading.Lock()
+
+        # Using the given mapping collection instead of connecting to the MongoDB
+        if mapping_collection is not None:
+            self.mapping_collection = mapping_collection
+            self.mongodb_ensure_indexes()
+            return
 
         # Connecting to the MongoDB
         print("Connecting to MongoDB...")
@@ -37,6 +73,7 @@ class ArchiverConnector:
             with pymongo.timeout(5):
                 self.mapping_collection.find_one({"dataset_id": "12345"})
                 print("Successfully connected.")
+            self.mongodb_ensure_indexes()
 
         if mode == "local":
             try:
@@ -57,8 +94,25 @@ class ArchiverConnector:
                     except:
                         print("Connection failed.")
 
+    def mongodb_ensure_indexes(self) -> dict:
+        """Creating the indexes of the "datasets.mappings" collection if they don't exist yet: a unique compound index on "dataset_id" and "metadata_id" (which also supports queries by "dataset_id" alone) and an index on "metadata_id".
+
+        Returns:
+            dict: {"indexes_ready" = whether both indexes exist, \n
+                "message" = success message or failure message with details about the error}
+        """
+
+        try:
+            self.mapping_collection.create_index([("dataset_id", pymongo.ASCENDING), ("metadata_id", pymongo.ASCENDING)], unique = True, name = "dataset_id_metadata_id_unique")
+            self.mapping_collection.create_index([("metadata_id", pymongo.ASCENDING)], name = "metadata_id")
+            return {"indexes_ready": True, "message": "Success!"}
+        # Creating the indexes failed, e.g. because the collection contains duplicate mappings that have to be removed first
+        except Exception as exception:
+            print("Creating the indexes of the mapping collection failed: " + str(exception))
+            return {"indexes_ready": False, "message": "Exception: " + str(exception)}
+
     def api_get_dataset(self, dataset_url: str) -> dict:
-        """Performing an API request to check if a dataset is indexed by the Archiver.
+        """Performing an API request to check if a dataset is indexed by the Archiver. If a cache is used, datasets found in it are not requested and datasets found via the API are added to it.
 
         Args:
             dataset_url (str): the URL of the dataset
@@ -70,11 +124,14 @@ class ArchiverConnector:
                 "message" = success message or failure message with details about the error}
         """
 
-        # Encoding the dataset URL
-        dataset_url = quote(dataset_url, safe = "")
+        # Checking the cache before requesting the API
+        if self.cache is not None:
+            cached_id = self.cache.get(dataset_url)
+            if cached_id is not None:
+                return {"request_success": True, "dataset_found": True, "dataset_id": cached_id, "message": "Success! (cached)"}
 
-        # Building the request URL and defining the HTTP headers
-        archiver_request_url = self.archiver_base_url + 'api/v1/get/dataset/' + dataset_url
+        # Building the request URL with the encoded dataset URL and defining the HTTP headers
+        archiver_request_url = self.archiver_base_url + 'api/v1/get/dataset/' + quote(dataset_url, safe = "")
 
         headers = {
             'accept': 'application/json',
@@ -83,13 +140,16 @@ class ArchiverConnector:
         # Making the API call
         try:
             # Getting the response
-            response = requests.get(url = archiver_request_url, headers = headers)
+            response = http_client.get(url = archiver_request_url, headers = headers)
 
             # The request succeeded
             if(response.status_code == 200):
-                # The dataset was found
+                # The dataset was found, saving its ID to the cache
                 try:
-                    return {"request_success": True, "dataset_found": True, "dataset_id": json.loads(response.content)["_id"], "message": "Success!"}
+                    dataset_id = json.loads(response.content)["_id"]
+                    if self.cache is not None:
+                        self.cache.put(dataset_url, dataset_id)
+                    return {"request_success": True, "dataset_found": True, "dataset_id": dataset_id, "message": "Success!"}
                 # The dataset was not found (an exception occurred when accessing the "_id" value)
                 except Exception as exception:
                     return {"request_success": True, "dataset_found": False, "message": "Exception: " + str(exception)}
@@ -100,20 +160,75 @@ class ArchiverConnector:
         except Exception as exception:
             return {"request_success": False, "dataset_found": False, "message": "Exception: " + str(exception)}
         
-    def api_add_dataset(self, dataset_url: str, source_url: str) -> dict:
-        """Performing an API request to add a dataset to the Archiver.
+    def api_get_dataset_async(self, dataset_url: str, share: bool = True) -> Future:
+        """Starting an API request in the background to check if a dataset is indexed by the Archiver. If the same dataset is already being checked, no new request is made and the running check is shared instead.
+
+        Checks made after inserting a dataset must not share a check that may have been started before the insertion, so they always make a new request, which replaces the running check for later callers.
 
         Args:
             dataset_url (str): the URL of the dataset
-            source_url (str): the URL of the dataset's source
+            share (bool, optional): whether a running check of the same dataset may be shared - defaults to True
 
         Returns:
-            dict: {"request_success" = whether the request was successful, \n
-                "dataset_inserted" = whether the dataset was inserted}, \n
-                "message" = success message or failure message with details about the error}
+            Future: the running check, whose result() is the return value of api_get_dataset()
+        """
+
+        with self.lookups_lock:
+            # Sharing the check that is still running for this URL (a finished check may be outdated and is only removed by its callback after its result was set)
+            running_lookup = self.lookups_in_flight.get(dataset_url)
+            if share and running_lookup is not None and not running_lookup.done():
+                return running_lookup
+
+            # Starting a new check and removing it from the running checks once it is finished
+            lookup = self.lookup_executor.submit(self.api_get_dataset, dataset_url)
+            self.lookups_in_flight[dataset_url] = lookup
+
+        lookup.add_done_callback(lambda _: self.forget_lookup(dataset_url, lookup))
+        return lookup
+
+    def forget_lookup(self, dataset_url: str, lookup: Future):
+        """Removing a finished check from the running checks, unless it was already replaced by a newer one.
+
+        Args:
+            dataset_url (str): the URL of the dataset
+            lookup (Future): the finished check
+        """
+
+        with self.lookups_lock:
+            if self.lookups_in_flight.get(dataset_url) is lookup:
+                del self.lookups_in_flight[dataset_url]
+
+    def api_get_datasets(self, dataset_urls: list, share: bool = True) -> dict:
+        """Checking concurrently if multiple datasets are indexed by the Archiver, requesting each distinct URL only once.
+
+        Args:
+            dataset_urls (list): the URLs of the datasets
+            share (bool, optional): whether running checks of the same datasets may be shared, which must be False when checking datasets after inserting them - defaults to True
+
+        Returns:
+            dict: {URL of the dataset: the return value of api_get_dataset()}
+        """
+
+        # Starting all checks before waiting for the first result
+        lookups = {dataset_url: self.api_get_dataset_async(dataset_url, share) for dataset_url in dict.fromkeys(dataset_urls)}
+
+        return {dataset_url: lookup.result() for dataset_url, lookup in lookups.items()}
+
+    def api_add_datasets(self, datasets: list) -> dict:
+        """Performing API requests to add multiple datasets to the Archiver, sending them in chunks of "batch_size" datasets per request.
+
+        The API only reports the number of inserted datasets per request. If it is lower than the size of the chunk (including zero), the datasets of the chunk are checked individually to find out which ones were not inserted.
+
+        Args:
+            datasets (list): the datasets to be added as dictionaries {"href" = the URL of the dataset, "source" = the URL of the dataset's source}
+
+        Returns:
+            dict: {URL of the dataset: {"request_success" = whether the request was successful, \n
+                "dataset_inserted" = whether the dataset was inserted, \n
+                "message" = success message or failure message with details about the error}}
         """
 
-        # Building the request URL and defining the HTTP headers, parameters and data
+        # Building the request URL and defining the HTTP headers and parameters
         archiver_request_url = self.archiver_base_url + 'api/v1/post/resource'
 
         headers = {
@@ -125,99 +240,224 @@ class ArchiverConnector:
             ('secret', self.archiver_password),
         )
 
-        data = json.dumps([{"href": str(dataset_url), "source": str(source_url)}])
+        results = {}
 
-        # Making the API call
-        try:
-            # Getting the response
-            response = requests.post(url = archiver_request_url, headers = headers, params = params, data = data)
-            inserted = json.loads(response.content)[0]["insertedDatasets"]
+        # Sending the datasets in chunks
+        for chunk_start in range(0, len(datasets), self.batch_size):
+            chunk = datasets[chunk_start:chunk_start + self.batch_size]
+            data = json.dumps([{"href": str(dataset["href"]), "source": str(dataset["source"])} for dataset in chunk])
 
-            # The request succeeded
-            if response.status_code == 200:
-                # The dataset was inserted
-                if inserted == 1:
-                    return {"request_success": True, "dataset_inserted": True, "message": "Success!"}
-                # The dataset was not inserted
-                elif inserted == 0:
-                    return {"request_success": True, "dataset_inserted": False, "message": "Dataset not inserted!"}
-            # The request failed (the response code is not 200)
+            # Making the API call
+            try:
+                # Getting the response
+                response = http_client.post(url = archiver_request_url, headers = headers, params = params, data = data)
+
+                # The request failed (the response code is not 200), so none of the datasets was inserted
+                if response.status_code != 200:
+                    for dataset in chunk:
+                        results[dataset["href"]] = {"request_success": False, "dataset_inserted": False, "message": "Response code: " + str(response.status_code)}
+                    continue
+
+                inserted = json.loads(response.content)[0]["insertedDatasets"]
+            # The request failed (an exception occurred when making the request), so none of the datasets was inserted
+            except Exception as exception:
+                for dataset in chunk:
+                    results[dataset["href"]] = {"request_success": False, "dataset_inserted": False, "message": "Exception: " + str(exception)}
+                continue
+
+            # All datasets of the chunk were inserted
+            if inserted == len(chunk):
+                for dataset in chunk:
+                    results[dataset["href"]] = {"request_success": True, "dataset_inserted": True, "message": "Success!"}
+            # Only some or none of the datasets of the chunk were reported as inserted, checking which ones are indexed by the Archiver now (e.g. inserted concurrently by another crawl)
             else:
-                return {"request_success": False, "dataset_inserted": False, "message": "Response code: " + str(response.status_code)}
-        # The request failed (an exception occurred when making the request)
-        except Exception as exception:
-            return {"request_success": False, "dataset_inserted": False, "message": "Exception: " + str(exception)}
-    
-    def mongodb_get_mapping(self, dataset_id: str, metadata_id: str) -> dict:
-        """Checking if there is an existing mapping between a dataset and its metadata in the "datasets.mappings" collection.
+                checks = self.api_get_datasets([dataset["href"] for dataset in chunk], share = False)
+                for dataset in chunk:
+                    if checks[dataset["href"]]["dataset_found"] == True:
+                        results[dataset["href"]] = {"request_success": True, "dataset_inserted": True, "message": "Success!"}
+                    else:
+                        results[dataset["href"]] = {"request_success": True, "dataset_inserted": False, "message": "Dataset not inserted! " + str(inserted) + "/" + str(len(chunk)) + " datasets of the batch were inserted."}
+
+        return results
+
+    def mongodb_reconcile_mappings(self, mappings: list) -> dict:
+        """Ensuring that mappings exist for multiple dataset/metadata pairs in the "datasets.mappings" collection, using one query to find the existing mappings and one unordered bulk upsert for the missing ones per chunk of "batch_size" pairs.
 
         Args:
-            dataset_id (str): the ID of the dataset in the Archiver
-            metadata_id (str): the ID of the metadata in the Archiver
+            mappings (list): the (dataset ID, metadata ID) pairs to be reconciled
 
         Returns:
-            dict: {"query_success" = whether the query was successful, \n
-                "dataset_found" = whether the dataset was found in any mapping, \n
-                "metadata_found" = whether the metadata was found in any mapping, \n
-                "mapping_found" = whether a mapping between the dataset and the metadata was found, \n
-                "message" = success message or failure message with details about the error}
+            dict: {(dataset ID, metadata ID): {"query_success" = whether the queries for the pair were successful, \n
+                "mapping_found" = whether the mapping existed already, \n
+                "mapping_added" = whether the mapping was added, \n
+                "message" = success message or failure message with details about the error}}
         """
 
-        # Executing queries to determine if the dataset and metadata exist in the collection and if they are mapped to each other
-        try:
-            if self.mapping_collection.find_one({"dataset_id": dataset_id}) is None:
-                dataset_found = False
-            else:
-                dataset_found = True
+        results = {}
 
-            if self.mapping_collection.find_one({"metadata_id": metadata_id}) is None:
-                metadata_found = False
-            else:
-                metadata_found = True
+        # Removing duplicate pairs while keeping their order
+        mappings = list(dict.fromkeys(mappings))
 
-            if self.mapping_collection.find_one({"dataset_id": dataset_id, "metadata_id": metadata_id}) is None:
-                mapping_found = False
-            else:
-                mapping_found = True
+        for chunk_start in range(0, len(mappings), self.batch_size):
+            chunk = mappings[chunk_start:chunk_start + self.batch_size]
 
-            return {"query_success": True, "dataset_found": dataset_found, "metadata_found": metadata_found, "mapping_found": mapping_found, "message": "Success!"}
-        # The query failed, returning error details
-        except Exception as exception:
-            return {"query_success": False, "message": "Exception: " + str(exception)}
+            # Finding all existing mappings of the chunk with a single query
+            try:
+                existing_mappings = set()
+                query = {"$or": [{"dataset_id": dataset_id, "metadata_id": metadata_id} for dataset_id, metadata_id in chunk]}
+                for document in self.mapping_collection.find(query, {"_id": 0, "dataset_id": 1, "metadata_id": 1}):
+                    existing_mappings.add((document["dataset_id"], document["metadata_id"]))
+            # The query failed, returning error details for the whole chunk
+            except Exception as exception:
+                for mapping in chunk:
+                    results[mapping] = {"query_success": False, "mapping_found": False, "mapping_added": False, "message": "Exception: " + str(exception)}
+                continue
+
+            for mapping in chunk:
+                if mapping in existing_mappings:
+                    results[mapping] = {"query_success": True, "mapping_found": True, "mapping_added": False, "message": "Success!"}
+
+            # Adding the missing mappings with an unordered bulk upsert, which is idempotent thanks to the unique index
+            missing_mappings = [mapping for mapping in chunk if mapping not in existing_mappings]
+            if len(missing_mappings) == 0:
+                continue
+
+            added = datetime.now().isoformat()
+            operations = [UpdateOne({"dataset_id": dataset_id, "metadata_id": metadata_id}, {"$setOnInsert": {"dataset_id": dataset_id, "metadata_id": metadata_id, "added": added}}, upsert = True) for dataset_id, metadata_id in missing_mappings]
 
-    def mongodb_add_mapping(self, dataset_id: str, metadata_id: str) -> dict:
-        """Adding a mapping entry for the dataset and metadata in the Archiver MongoDB.
+            try:
+                upserted_indices = set(self.mapping_collection.bulk_write(operations, ordered = False).upserted_ids.keys())
+                errors = {}
+            # Some of the upserts failed, mapping the errors back to the individual pairs
+            except BulkWriteError as exception:
+                upserted_indices = set(upserted["index"] for upserted in exception.details.get("upserted", []))
+                errors = {error["index"]: error for error in exception.details.get("writeErrors", [])}
+            # The bulk upsert failed completely
+            except Exception as exception:
+                for mapping in missing_mappings:
+                    results[mapping] = {"query_success": False, "mapping_found": False, "mapping_added": False, "message": "Exception: " + str(exception)}
+                continue
+
+            for index, mapping in enumerate(missing_mappings):
+                # The mapping was added
+                if index in upserted_indices:
+                    results[mapping] = {"query_success": True, "mapping_found": False, "mapping_added": True, "message": "Success!"}
+                # The upsert failed for another reason than a mapping that was added by another crawler in the meantime (duplicate key error)
+                elif index in errors and errors[index].get("code") != 11000:
+                    results[mapping] = {"query_success": False, "mapping_found": False, "mapping_added": False, "message": "Exception: " + str(errors[index].get("errmsg"))}
+                # Another crawler added the mapping in the meantime, so it was matched instead of added
+                else:
+                    results[mapping] = {"query_success": True, "mapping_found": True, "mapping_added": False, "message": "Success!"}
+
+        return results
+
+    def mongodb_verify_mappings(self, mappings: list) -> dict:
+        """Reading mappings back from the "datasets.mappings" collection to verify that they were written, using one query per chunk of "batch_size" pairs.
 
         Args:
-            dataset_id (str): the ID of the dataset in the Archiver
-            metadata_id (str): the ID of the metadata in the Archiver
+            mappings (list): the (dataset ID, metadata ID) pairs to be verified
 
         Returns:
-            dict: {"inserted" = whether the mapping was inserted, \n
-                "mapping_id" = the ID of the mapping document or None, \n
-                "message" = success message or failure message with details about the error}
+            dict: {(dataset ID, metadata ID): {"query_success" = whether the query for the pair was successful, \n
+                "mapping_found" = whether the mapping was found, \n
+                "message" = success message or failure message with details about the error}}
         """
 
-        # Creating the dictionary to be inserted as a document
-        document = {"dataset_id": dataset_id, "metadata_id": metadata_id, "added": datetime.now().isoformat()}
+        results = {}
 
-        # Inserting the mapping document into the collection
-        try:
-            insert_status = self.mapping_collection.insert_one(document)
-            return {"inserted": insert_status.acknowledged, "mapping_id": insert_status.inserted_id, "message": "Success!"}
-        # The insertion failed, returning error details
-        except Exception as exception:
-            return {"inserted": False, "message": "Exception: " + str(exception)}
-        
-    def handle_dataset(self, dataset_url: str, metadata_url: str, source_url: str, log_file_success: str, log_file_fail: str) -> dict:
+        # Removing duplicate pairs while keeping their order
+        mappings = list(dict.fromkeys(mappings))
+
+        for chunk_start in range(0, len(mappings), self.batch_size):
+            chunk = mappings[chunk_start:chunk_start + self.batch_size]
+
+            # Finding all mappings of the chunk with a single query
+            try:
+                found_mappings = set()
+                query = {"$or": [{"dataset_id": dataset_id, "metadata_id": metadata_id} for dataset_id, metadata_id in chunk]}
+                for document in self.mapping_collection.find(query, {"_id": 0, "dataset_id": 1, "metadata_id": 1}):
+                    found_mappings.add((document["dataset_id"], document["metadata_id"]))
+            # The query failed, returning error details for the whole chunk
+            except Exception as exception:
+                for mapping in chunk:
+                    results[mapping] = {"query_success": False, "mapping_found": False, "message": "Exception: " + str(exception)}
+                continue
+
+            for mapping in chunk:
+                results[mapping] = {"query_success": True, "mapping_found": mapping in found_mappings, "message": "Success!" if mapping in found_mappings else "Mapping not found!"}
+
+        return results
+
+    def select_for_verification(self, mappings: list) -> list:
+        """Choosing which of the newly added mappings are verified immediately: all of them or, if the verification is "sampled", a random fraction of them.
+
+        Args:
+            mappings (list): the newly added (dataset ID, metadata ID) pairs
+
+        Returns:
+            list: the pairs to be verified
+        """
+
+        if self.verification == "sampled":
+            return [mapping for mapping in mappings if random() < self.verification_sample_rate]
+
+        return list(mappings)
+
+    def verify_deferred(self, deferred_verifications: list, report_file: str) -> dict:
+        """Verifying the mappings whose verification was deferred by handle_datasets() in bulk, e.g. at the end of a portal, and saving the result of each mapping to a reconciliation report. The list is emptied afterwards.
+
+        Args:
+            deferred_verifications (list): the deferred mappings collected by handle_datasets()
+            report_file (str): the path of a log file (".csv" or ".jsonl.gz") logging the result of each verified mapping
+
+        Returns:
+            dict: {"verified" = the number of mappings found, \n
+                "missing" = the number of mappings not found, \n
+                "failed" = the number of mappings whose query failed}
+        """
+
+        summary = {"verified": 0, "missing": 0, "failed": 0}
+
+        if len(deferred_verifications) == 0:
+            return summary
+
+        # Verifying all deferred mappings with bulk queries
+        checks = self.mongodb_verify_mappings([(entry["dataset_id"], entry["metadata_id"]) for entry in deferred_verifications])
+
+        # Getting the current timestamp
+        current_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        # Building the report and counting the results
+        report = []
+        for entry in deferred_verifications:
+            check_mapping = checks[(entry["dataset_id"], entry["metadata_id"])]
+            if check_mapping["query_success"] == False:
+                summary["failed"] += 1
+            elif check_mapping["mapping_found"] == True:
+                summary["verified"] += 1
+            else:
+                summary["missing"] += 1
+            report.append({"timestamp": current_timestamp, "dataset_url": entry["dataset_url"], "metadata_url": entry["metadata_url"], "source_url": entry["source_url"], "dataset_id": entry["dataset_id"], "metadata_id": entry["metadata_id"], "mapping_found": check_mapping["mapping_found"], "message": check_mapping["message"]})
+
+        # Saving the report to the buffered log, which writes it to a new file or appends it to an existing one
+        get_log_writer(report_file).write_many(report)
+
+        # Printing the summary
+        print("Deferred verification: " + str(summary["verified"]) + " mappings verified, " + str(summary["missing"]) + " missing, " + str(summary["failed"]) + " failed")
+
+        deferred_verifications.clear()
+        return summary
+
+    def handle_dataset(self, dataset_url: str, metadata_url: str, source_url: str, log_file_success: str, log_file_fail: str, metadata_memo: dict = None) -> dict:
         """Checking if a dataset and its metadata are both indexed by the Archiver and have a mapping that describes their relation. Any missing indexing or mapping is added.
 
         Args:
             dataset_url (str): the URL of the dataset
             metadata_url (str): the URL of the dataset's metadata
             source_url (str): the URL of the dataset's source
-            log_file_success (str): the path of a CSV file logging successfully handled datasets
-            log_file_fail (str): the path of a CSV file logging datasets for which an exception occurred
+            log_file_success (str): the path of a log file (".csv" or ".jsonl.gz") logging successfully handled datasets
+            log_file_fail (str): the path of a log file (".csv" or ".jsonl.gz") logging datasets for which an exception occurred
+            metadata_memo (dict, optional): {metadata URL: metadata ID} of the metadata already resolved during the current run, which is used instead of checking the metadata again and extended with newly resolved metadata - defaults to None
 
         Returns:
             dict: {"success" = whether the process was successfully completed, \n
@@ -230,114 +470,198 @@ class ArchiverConnector:
 
         """
 
+        return self.handle_datasets([{"dataset_url": dataset_url, "metadata_url": metadata_url, "source_url": source_url}], log_file_success, log_file_fail, metadata_memo)[0]
+
+    def handle_datasets(self, datasets: list, log_file_success: str = None, log_file_fail: str = None, metadata_memo: dict = None, deferred_verifications: list = None, run_id: int = None, portal_url: str = None) -> list:
+        """Checking for multiple datasets if each dataset and its metadata are both indexed by the Archiver and have a mapping that describes their relation. Any missing indexing or mapping is added.
+
+        Each distinct URL is only checked once, all missing datasets/metadata are inserted with batched API requests (see api_add_datasets()) and all mappings are reconciled in bulk (see mongodb_reconcile_mappings()). Newly added mappings are verified according to the verification policy of the connector.
+
+        Args:
+            datasets (list): the datasets to be handled as dictionaries {"dataset_url" = the URL of the dataset, "metadata_url" = the URL of the dataset's metadata, "source_url" = the URL of the dataset's source}
+            log_file_success (str, optional): the path of a log file (".csv" or ".jsonl.gz") logging successfully handled datasets - defaults to None (no log file)
+            log_file_fail (str, optional): the path of a log file (".csv" or ".jsonl.gz") logging datasets for which an exception occurred - defaults to None (no log file)
+            metadata_memo (dict, optional): {metadata URL: metadata ID} of the metadata already resolved during the current run, which is used instead of checking the metadata again and extended with newly resolved metadata - defaults to None
+            deferred_verifications (list, optional): a list collecting the newly added mappings if the verification is "deferred", which is passed to verify_deferred() later - without it, the mappings are verified immediately - defaults to None
+            run_id (int, optional): the ID of the crawl run under which the results are saved to the run store of the connector - defaults to None (not saved)
+            portal_url (str, optional): the URL of the portal the datasets belong to, which is saved to the run store - defaults to None
+
+        Returns:
+            list: the result of each dataset in the same order as the input list - see handle_dataset() for details
+        """
+
+        # Failing fast while the circuit of the Archiver is open, instead of requesting the Archiver for each dataset
+        if circuit_breaker.is_open(self.archiver_base_url):
+            return self.skip_datasets(datasets, log_file_fail, run_id, portal_url)
+
+        # Counting the requests rejected by the circuit breaker so far, so that datasets failing because of requests rejected in the meantime can be retried
+        rejections = circuit_breaker.get_rejections(self.archiver_base_url)
+
         # Getting the current timestamp
         current_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        # Waiting - adjust this in case of problems with excessive requests to the Archiver API!
-        sleep(1)
-
-        # Creating a dataframe in case the dataset can be handled successfully
-        completed_dataset = pd.DataFrame([(None, None, None, None, None, None, None, None, None, None)], columns = ["timestamp", "dataset_url", "metadata_url", "source_url", "dataset_id", "metadata_id", "dataset_added", "metadata_added", "mapping_added", "message"])
-        completed_datasets_filename = log_file_success
-
-        # Creating a dataframe in case the dataset cannot be handled successfully
-        failed_dataset = pd.DataFrame([(None, None, None, None, None, None, None, None)], columns = ["timestamp", "dataset_url", "metadata_url", "source_url", "dataset_added", "metadata_added", "mapping_added", "message"])
-        failed_datasets_filename = log_file_fail
-
-        # Initially setting the variables that log whether an error or certain relevant actions occurred to False
-        failed = False
-        dataset_added = False
-        metadata_added = False
-        mapping_added = False
-
-        # Creating a list containing the dataset URL and metadata URL
-        data_list = [{"url": dataset_url, "type": "dataset"}, 
-                     {"url": metadata_url, "type": "metadata"}]
-
-        # For dataset and metadata, checking if the Archiver is indexing it already and adding it if necessary
-        for data in data_list:
-            # Checking if the dataset/metadata is indexed by the Archiver
-            check_data = self.api_get_dataset(data["url"])
-
-            # The request to check the dataset/metadata failed, the loop stops
-            if check_data["request_success"] == False:
-                failed = True
-                fail_reason = "Initially getting the " + data["type"] + " via the Archiver API failed."
-                break
-            # The dataset/metadata was not found
-            elif check_data["dataset_found"] == False:
-                # Adding the dataset/metadata to the Archiver
-                add_data = self.api_add_dataset(data["url"], source_url)
-
-                # The request to add the dataset/metadata failed or it wasn't inserted, the loop stops
-                if add_data["dataset_inserted"] == False:
-                    failed = True
-                    fail_reason = "Adding the " + data["type"] + " via the Archiver API failed."
+        # Using the metadata IDs resolved earlier during the current run
+        checks = {}
+        if metadata_memo is not None:
+            for dataset in datasets:
+                if dataset["metadata_url"] in metadata_memo:
+                    checks[dataset["metadata_url"]] = {"request_success": True, "dataset_found": True, "dataset_id": metadata_memo[dataset["metadata_url"]], "message": "Success! (memoized)"}
+
+        # Checking concurrently and once for each remaining distinct dataset/metadata URL if the Archiver is indexing it already
+        checks.update(self.api_get_datasets([url for dataset in datasets for url in (dataset["dataset_url"], dataset["metadata_url"]) if url not in checks]))
+
+        # Buffering the datasets/metadata that were not found, so that they can be added with batched requests
+        insertion_buffer = []
+        buffered_urls = set()
+        for dataset in datasets:
+            for url in (dataset["dataset_url"], dataset["metadata_url"]):
+                if checks[url]["request_success"] == True and checks[url]["dataset_found"] == False and url not in buffered_urls:
+                    insertion_buffer.append({"href": url, "source": dataset["source_url"]})
+                    buffered_urls.add(url)
+
+        # Adding the buffered datasets/metadata to the Archiver
+        insertions = self.api_add_datasets(insertion_buffer)
+
+        # Checking again (concurrently and without sharing checks started before the insertion) if the inserted datasets/metadata are indexed by the Archiver, which also provides their IDs
+        checks.update(self.api_get_datasets([url for url, insertion in insertions.items() if insertion["dataset_inserted"] == True], share = False))
+
+        # Evaluating for each dataset if the dataset and its metadata are indexed by the Archiver (already or after adding them)
+        states = []
+        for dataset in datasets:
+            # Initially setting the variables that log whether an error or certain relevant actions occurred to False
+            state = {"failed": False, "fail_reason": None, "dataset_added": False, "metadata_added": False, "mapping_added": False, "ids": {}}
+            states.append(state)
+
+            for data_type in ("dataset", "metadata"):
+                url = dataset[data_type + "_url"]
+                check_data = checks[url]
+
+                # The request to check the dataset/metadata failed, the loop stops
+                if url not in insertions and check_data["request_success"] == False:
+                    state["failed"] = True
+                    state["fail_reason"] = "Initially getting the " + data_type + " via the Archiver API failed."
                     break
-                # The dataset/metadata was inserted
-                elif add_data["dataset_inserted"] == True:
-                    # Checking again if the dataset/metadata is indexed by the Archiver
-                    check_data = self.api_get_dataset(data["url"])
-
-                    # The request to check the dataset/metadata failed or it wasn't found, the loop stops
-                    if check_data["dataset_found"] == False:
-                        failed = True
-                        fail_reason = "After successfully adding the " + data["type"] + ", getting it via the Archiver API failed."
+                # The dataset/metadata was not found and had to be added
+                elif url in insertions:
+                    # The request to add the dataset/metadata failed or it wasn't inserted, the loop stops
+                    if insertions[url]["dataset_inserted"] == False:
+                        state["failed"] = True
+                        state["fail_reason"] = "Adding the " + data_type + " via the Archiver API failed."
+                        break
+                    # The request to check the dataset/metadata again failed or it wasn't found, the loop stops
+                    elif check_data["dataset_found"] == False:
+                        state["failed"] = True
+                        state["fail_reason"] = "After successfully adding the " + data_type + ", getting it via the Archiver API failed."
                         break
                     # Logging the successful and verified insertion of the dataset/metadata
-                    elif check_data["dataset_found"] == True:
-                        if data["type"] == "dataset":
-                            dataset_added = True
-                        elif data["type"] == "metadata":
-                            metadata_added = True
-
-            # The dataset/metadata was found (either directly or after adding it)
-            if check_data["dataset_found"] == True:
-                # Saving the dataset ID
-                if data["type"] == "dataset":
-                    dataset_id = check_data["dataset_id"]
-                # Saving the metadata ID
-                elif data["type"] == "metadata":
-                    metadata_id = check_data["dataset_id"]
-
-        # No error occurred so far
-        if failed == False:
-            # Checking the dataset/metadata mapping
-            check_mapping = self.mongodb_get_mapping(dataset_id, metadata_id)
-
-            # The query to check the dataset/metadata mapping failed
-            if check_mapping["query_success"] == False:
-                failed = True
-                fail_reason = "Initially getting the dataset/metadata mapping via the Archiver MongoDB failed."
-            # The query succeeded, checking if the mapping exists already and adding it if necessary
-            elif check_mapping["query_success"] == True:
-                # The mapping already exists
-                if check_mapping["mapping_found"] == True:
-                    mapping_added = False
-                # The mapping doesn't exist yet, so it is now added
-                elif check_mapping["mapping_found"] == False:
-                    add_mapping = self.mongodb_add_mapping(dataset_id, metadata_id)
-
-                    # The query to add the dataset/metadata mapping failed or it wasn't inserted
-                    if add_mapping["inserted"] == False:
-                        failed = True
-                        fail_reason = "Adding the mapping via the Archiver MongoDB failed."
-                    # Logging the successful insertion of the mapping
-                    elif add_mapping["inserted"] == True:
-                            mapping_added = True
-
-                # Checking the dataset/metadata mapping again
-                check_mapping = self.mongodb_get_mapping(dataset_id, metadata_id)
-                if check_mapping["mapping_found"] == False:
-                    failed = True
-                    fail_reason = "After successfully adding the dataset/metadata mapping, getting it via the Archiver MongoDB failed."
-
-        # Saving the completed / failed dataset to the dataframe, then saving it to a new CSV file or appending it to an existing one
-        if failed == True:
-            failed_dataset.iloc[0,] = {"timestamp": current_timestamp, "dataset_url": dataset_url, "metadata_url": metadata_url, "source_url": source_url, "dataset_added": dataset_added, "metadata_added": metadata_added, "mapping_added": mapping_added, "message": "Failed: " + fail_reason}
-            failed_dataset.to_csv(failed_datasets_filename, mode = "a", index = False, header = not os.path.isfile(failed_datasets_filename))
-            return {"success": False, "dataset_added": dataset_added, "metadata_added": metadata_added, "mapping_added": mapping_added, "message": "Failed: " + fail_reason}
-        elif failed == False:
-            completed_dataset.iloc[0,] = {"timestamp": current_timestamp, "dataset_url": dataset_url, "metadata_url": metadata_url, "source_url": source_url, "dataset_id": dataset_id, "metadata_id": metadata_id, "dataset_added": dataset_added, "metadata_added": metadata_added, "mapping_added": mapping_added, "message": "Success! Data and mapping complete!"}
-            completed_dataset.to_csv(completed_datasets_filename, mode = "a", index = False, header = not os.path.isfile(completed_datasets_filename))
-            return {"success": True, "dataset_added": dataset_added, "metadata_added": metadata_added, "mapping_added": mapping_added, "dataset_id": dataset_id, "metadata_id": metadata_id, "message": "Success! Data and mapping complete!"}
+                    else:
+                        state[data_type + "_added"] = True
+
+                # Saving the dataset/metadata ID
+                state["ids"][data_type] = check_data["dataset_id"]
+
+            # Remembering the resolved metadata ID for the rest of the run
+            if metadata_memo is not None and "metadata" in state["ids"]:
+                metadata_memo[dataset["metadata_url"]] = state["ids"]["metadata"]
+
+        # Checking and adding the dataset/metadata mappings of all datasets without errors in bulk
+        mappings = self.mongodb_reconcile_mappings([(state["ids"]["dataset"], state["ids"]["metadata"]) for state in states if state["failed"] == False])
+
+        for state in states:
+            if state["failed"] == False:
+                check_mapping = mappings[(state["ids"]["dataset"], state["ids"]["metadata"])]
+
+                # The query to check or add the dataset/metadata mapping failed
+                if check_mapping["query_success"] == False:
+                    state["failed"] = True
+                    state["fail_reason"] = "Getting or adding the dataset/metadata mapping via the Archiver MongoDB failed."
+                # Logging the successful insertion of the mapping
+                else:
+                    state["mapping_added"] = check_mapping["mapping_added"]
+
+        # Verifying the newly added mappings according to the verification policy
+        verifications = {}
+        if self.verification == "deferred" and deferred_verifications is not None:
+            for dataset, state in zip(datasets, states):
+                if state["failed"] == False and state["mapping_added"] == True:
+                    deferred_verifications.append({"dataset_url": dataset["dataset_url"], "metadata_url": dataset["metadata_url"], "source_url": dataset["source_url"], "dataset_id": state["ids"]["dataset"], "metadata_id": state["ids"]["metadata"]})
+        else:
+            verifications = self.mongodb_verify_mappings(self.select_for_verification([(state["ids"]["dataset"], state["ids"]["metadata"]) for state in states if state["failed"] == False and state["mapping_added"] == True]))
+
+        # The mapping was added, but reading it back failed or it wasn't found
+        for state in states:
+            if state["failed"] == False and verifications.get((state["ids"]["dataset"], state["ids"]["metadata"]), {"mapping_found": True})["mapping_found"] == False:
+                state["failed"] = True
+                state["fail_reason"] = "After successfully adding the dataset/metadata mapping, getting it via the Archiver MongoDB failed."
+
+        results = []
+
+        # Logging the result of each dataset
+        for dataset, state in zip(datasets, states):
+            if state["failed"] == False:
+                dataset_id = state["ids"]["dataset"]
+                metadata_id = state["ids"]["metadata"]
+
+            dataset_added = state["dataset_added"]
+            metadata_added = state["metadata_added"]
+            mapping_added = state["mapping_added"]
+
+            # Saving the completed / failed dataset to the buffered log, which writes it to a new file or appends it to an existing one
+            if state["failed"] == True:
+                fail_reason = state["fail_reason"]
+                if log_file_fail is not None:
+                    get_log_writer(log_file_fail).write({"timestamp": current_timestamp, "dataset_url": dataset["dataset_url"], "metadata_url": dataset["metadata_url"], "source_url": dataset["source_url"], "dataset_added": dataset_added, "metadata_added": metadata_added, "mapping_added": mapping_added, "message": "Failed: " + fail_reason})
+                results.append({"success": False, "dataset_added": dataset_added, "metadata_added": metadata_added, "mapping_added": mapping_added, "message": "Failed: " + fail_reason})
+            else:
+                if log_file_success is not None:
+                    get_log_writer(log_file_success).write({"timestamp": current_timestamp, "dataset_url": dataset["dataset_url"], "metadata_url": dataset["metadata_url"], "source_url": dataset["source_url"], "dataset_id": dataset_id, "metadata_id": metadata_id, "dataset_added": dataset_added, "metadata_added": metadata_added, "mapping_added": mapping_added, "message": "Success! Data and mapping complete!"})
+                results.append({"success": True, "dataset_added": dataset_added, "metadata_added": metadata_added, "mapping_added": mapping_added, "dataset_id": dataset_id, "metadata_id": metadata_id, "message": "Success! Data and mapping complete!"})
+
+        # Saving the results to the run store
+        if self.run_store is not None and run_id is not None:
+            self.run_store.add_datasets(run_id, portal_url, [dict(result, timestamp = current_timestamp, **dataset) for dataset, result in zip(datasets, results)])
+
+        # Pushing the failed datasets to the retry queue, one entry per fail reason, marking them if the circuit of the Archiver opened or rejected requests while they were handled, since they most likely failed because the Archiver was unavailable
+        if self.retry_queue is not None:
+            circuit_open = not circuit_breaker.is_closed(self.archiver_base_url) or circuit_breaker.get_rejections(self.archiver_base_url) > rejections
+            failed_datasets = {}
+            for dataset, result in zip(datasets, results):
+                if result["success"] == False:
+                    failed_datasets.setdefault(result["message"], []).append(dataset)
+            for message, failed in failed_datasets.items():
+                self.retry_queue.push("datasets", message, datasets = failed, run_id = run_id, portal_url = portal_url, circuit_open = circuit_open)
+
+        return results
+
+    def skip_datasets(self, datasets: list, log_file_fail: str = None, run_id: int = None, portal_url: str = None) -> list:
+        """Skipping multiple datasets without requesting the Archiver because its circuit is open, logging them as failed and pushing them to the retry queue of the connector.
+
+        Args:
+            datasets (list): the datasets to be skipped as dictionaries {"dataset_url" = the URL of the dataset, "metadata_url" = the URL of the dataset's metadata, "source_url" = the URL of the dataset's source}
+            log_file_fail (str, optional): the path of a log file (".csv" or ".jsonl.gz") logging datasets for which an exception occurred - defaults to None (no log file)
+            run_id (int, optional): the ID of the crawl run under which the results are saved to the run store of the connector - defaults to None (not saved)
+            portal_url (str, optional): the URL of the portal the datasets belong to, which is saved to the run store - defaults to None
+
+        Returns:
+            list: the result of each dataset in the same order as the input list - see handle_dataset() for details
+        """
+
+        # Getting the current timestamp
+        current_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        fail_reason = "The circuit of the Archiver is open, the dataset was skipped."
+        results = [{"success": False, "dataset_added": False, "metadata_added": False, "mapping_added": False, "message": "Failed: " + fail_reason} for dataset in datasets]
+
+        # Saving the skipped datasets to the buffered log
+        if log_file_fail is not None:
+            get_log_writer(log_file_fail).write_many([{"timestamp": current_timestamp, "dataset_url": dataset["dataset_url"], "metadata_url": dataset["metadata_url"], "source_url": dataset["source_url"], "dataset_added": False, "metadata_added": False, "mapping_added": False, "message": "Failed: " + fail_reason} for dataset in datasets])
+
+        # Saving the results to the run store
+        if self.run_store is not None and run_id is not None:
+            self.run_store.add_datasets(run_id, portal_url, [dict(result, timestamp = current_timestamp, **dataset) for dataset, result in zip(datasets, results)])
+
+        # Pushing the datasets to the retry queue
+        if self.retry_queue is not None:
+            self.retry_queue.push("datasets", "Failed: " + fail_reason, datasets = list(datasets), run_id = run_id, portal_url = portal_url, circuit_open = True)
+
+        return results
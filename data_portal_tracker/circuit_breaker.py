@@ -0,0 +1,207 @@
+# Importing required libraries
+import threading
+from time import monotonic
+from url_helpers import get_host
+
+
+class CircuitOpenError(Exception):
+    """An exception raised instead of making a request while the circuit of the host is open.
+    """
+
+    def __init__(self, host: str, retry_seconds: float):
+        """Instantiating the class.
+
+        Args:
+            host (str): the host whose circuit is open
+            retry_seconds (float): the number of seconds until the next probe request to the host is allowed
+        """
+
+        super().__init__("The circuit of " + host + " is open, retrying in " + str(round(retry_seconds)) + " seconds.")
+        self.host = host
+        self.retry_seconds = retry_seconds
+
+
+class HostCircuitBreaker:
+    """A class that stops requests to hosts that keep failing, e.g. a portal or the Archiver that is down, so that the crawlers fail fast instead of waiting for timeouts and retries.
+
+    The circuit of a host opens after a number of consecutive failures (exceptions or server errors). While it is open, requests fail immediately with a CircuitOpenError. Once the open period has passed, the circuit is half-open and lets a limited number of probe requests through: a successful probe closes the circuit, a failed probe opens it again for twice as long.
+    """
+
+    # Response codes that count as a failure of the host (for every attempt of the HTTP client)
+    failure_response_codes = (500, 502, 503, 504)
+
+    def __init__(self, failure_threshold: int = 5, open_seconds: float = 30, maximum_open_seconds: float = 600, half_open_probes: int = 1):
+        """Instantiating the class.
+
+        Args:
+            failure_threshold (int, optional): the number of consecutive failures of a host that open its circuit - defaults to 5
+            open_seconds (float, optional): the number of seconds the circuit stays open before the first probe request - defaults to 30
+            maximum_open_seconds (float, optional): the maximum number of seconds the circuit stays open after repeatedly failed probes - defaults to 600
+            half_open_probes (int, optional): the maximum number of probe requests to a host at the same time while its circuit is half-open - defaults to 1
+        """
+
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.maximum_open_seconds = maximum_open_seconds
+        self.half_open_probes = half_open_probes
+
+        # Creating a dictionary for the state of each host and a lock that protects it
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def get_state(self, host: str) -> dict:
+        """Getting the current state of a host, creating it on the first request - must be called while holding the lock.
+
+        Args:
+            host (str): the host, e.g. "data.gv.at"
+
+        Returns:
+            dict: {"state" = "closed", "open" or "half_open", "failures", "open_seconds", "open_until", "probes", "rejections"}
+        """
+
+        if host not in self.hosts:
+            self.hosts[host] = {"state": "closed", "failures": 0, "open_seconds": self.open_seconds, "open_until": 0.0, "probes": 0, "rejections": 0}
+        return self.hosts[host]
+
+    def before_request(self, url: str) -> bool:
+        """Checking whether a request to the host of the URL is allowed, reserving a probe if the circuit is half-open.
+
+        Args:
+            url (str): the URL to be requested
+
+        Returns:
+            bool: whether the request is a probe request, which has to be reported with "probe = True"
+
+        Raises:
+            CircuitOpenError: if the circuit of the host is open or all probes are already running
+        """
+
+        host = get_host(url)
+
+        with self.lock:
+            state = self.get_state(host)
+            now = monotonic()
+
+            if state["state"] == "closed":
+                return False
+
+            # Half-opening the circuit once the open period has passed
+            if state["state"] == "open":
+                if now < state["open_until"]:
+                    state["rejections"] += 1
+                    raise CircuitOpenError(host, state["open_until"] - now)
+                state["state"] = "half_open"
+                state["probes"] = 0
+
+            # Letting a limited number of probe requests through
+            if state["probes"] >= self.half_open_probes:
+                state["rejections"] += 1
+                raise CircuitOpenError(host, 0.0)
+            state["probes"] += 1
+            return True
+
+    def report(self, url: str, success: bool, probe: bool = False):
+        """Recording the outcome of a request, closing or opening the circuit of the host.
+
+        Args:
+            url (str): the requested URL
+            success (bool): whether the host answered the request, i.e. without an exception or a server error
+            probe (bool, optional): whether the request was a probe request - defaults to False
+        """
+
+        host = get_host(url)
+
+        with self.lock:
+            state = self.get_state(host)
+
+            if probe:
+                state["probes"] = max(0, state["probes"] - 1)
+
+            # The host answered: closing the circuit
+            if success:
+                if state["state"] != "closed":
+                    print("The circuit of " + host + " is closed again")
+                state.update({"state": "closed", "failures": 0, "open_seconds": self.open_seconds})
+                return
+
+            state["failures"] += 1
+
+            # A failed probe opens the circuit again for twice as long
+            if state["state"] == "half_open" and probe:
+                state["open_seconds"] = min(self.maximum_open_seconds, state["open_seconds"] * 2)
+                self.open(host, state)
+            # Too many consecutive failures open the circuit
+            elif state["state"] == "closed" and state["failures"] >= self.failure_threshold:
+                self.open(host, state)
+
+    def open(self, host: str, state: dict):
+        """Opening the circuit of a host - must be called while holding the lock.
+
+        Args:
+            host (str): the host
+            state (dict): the state of the host
+        """
+
+        state["state"] = "open"
+        state["open_until"] = monotonic() + state["open_seconds"]
+        print("The circuit of " + host + " is open after " + str(state["failures"]) + " consecutive failures, failing fast for " + str(round(state["open_seconds"])) + " seconds")
+
+    def is_open(self, url: str) -> bool:
+        """Checking whether requests to the host of the URL currently fail fast (without reserving a probe).
+
+        Args:
+            url (str): the URL
+
+        Returns:
+            bool: whether the circuit of the host is open and its open period hasn't passed yet
+        """
+
+        with self.lock:
+            state = self.get_state(get_host(url))
+            return state["state"] == "open" and monotonic() < state["open_until"]
+
+    def is_closed(self, url: str) -> bool:
+        """Checking whether requests to the host of the URL are made normally, i.e. its circuit is neither open nor half-open.
+
+        Args:
+            url (str): the URL
+
+        Returns:
+            bool: whether the circuit of the host is closed
+        """
+
+        with self.lock:
+            return self.get_state(get_host(url))["state"] == "closed"
+
+    def get_rejections(self, url: str) -> int:
+        """Getting the number of requests to the host of the URL that were rejected because its circuit was open or half-open, e.g. to find out whether requests made in the meantime were rejected.
+
+        Args:
+            url (str): the URL
+
+        Returns:
+            int: the number of rejected requests since the first request to the host
+        """
+
+        with self.lock:
+            return self.get_state(get_host(url))["rejections"]
+
+    def get_retry_seconds(self, url: str) -> float:
+        """Getting the number of seconds until a request to the host of the URL is allowed again.
+
+        Args:
+            url (str): the URL
+
+        Returns:
+            float: the number of seconds until the circuit of the host half-opens (0 if it isn't open)
+        """
+
+        with self.lock:
+            state = self.get_state(get_host(url))
+            if state["state"] != "open":
+                return 0.0
+            return max(0.0, state["open_until"] - monotonic())
+
+
+# Creating the circuit breaker shared by all modules
+circuit_breaker = HostCircuitBreaker()
@@ -0,0 +1,109 @@
+# Loading required packages
+import argparse
+import pandas as pd
+from time import sleep
+from dotenv import dotenv_values
+from crawl_engine import get_portal_sizes
+from portal_adapters import portal_adapters, get_supported_portal_urls
+from work_queue import WorkQueue, SqliteWorkQueue
+
+
+def create_crawl_job(work_queue: WorkQueue, adapter_class, portal_list: pd.DataFrame, statistics_file: str, max_workers_per_host: int = 1) -> int:
+    """Creating a sharded crawl job, which turns the portals on the list that are supported by a portal adapter into work items of the work queue. The portals are then leased and crawled by the workers on all nodes ("python3 portal_crawler.py <API> --job <job ID>").
+
+    Args:
+        ``work_queue (WorkQueue):`` the work queue shared by the coordinator and the workers - must be an instance of a subclass of "WorkQueue" in the work queue module
+
+        ``adapter_class (type):`` the adapter of the portal software - must be a subclass of "PortalAdapter" in the portal adapters, e.g. "CkanAdapter"
+
+        ``portal_list (pd.DataFrame):`` the final portal list - must be a file created previously by "extract_working_apis()" in the portal handler
+
+        ``statistics_file (str):`` the path of the CSV file containing the statistics of the previous crawl, so that the largest portals are leased first
+
+        ``max_workers_per_host (int, optional):`` the maximum number of portals crawled at the same time on the same host by all workers together - defaults to 1
+
+    Returns:
+        int: the ID of the job
+    """
+
+    # Getting the portals supported by the adapter
+    api_base_urls = get_supported_portal_urls(adapter_class, portal_list)
+
+    # Creating the job, leasing the largest portals of the previous crawl first
+    job_id = work_queue.create_job(adapter_class.api, api_base_urls, get_portal_sizes(statistics_file), max_workers_per_host)
+    print("Created job " + str(job_id) + " with " + str(len(api_base_urls)) + " portals supporting " + adapter_class.description)
+
+    return job_id
+
+
+def print_progress(work_queue: WorkQueue, job_id: int):
+    """Printing the progress of a sharded crawl job and the workers currently crawling its portals.
+
+    Args:
+        work_queue (WorkQueue): the work queue containing the job
+        job_id (int): the ID of the job
+    """
+
+    progress = work_queue.get_progress(job_id)
+    print("Job " + str(job_id) + ": " + ", ".join(str(progress[state]) + " " + state for state in ("pending", "leased", "expired", "done", "failed")))
+    for worker_id, seconds in progress["workers"].items():
+        print("    " + worker_id + ": last heartbeat " + str(round(seconds)) + " seconds ago")
+
+
+def wait_for_job(work_queue: WorkQueue, job_id: int, interval: float = 60):
+    """Printing the progress of a sharded crawl job regularly until all its portals were crawled or failed.
+
+    Args:
+        work_queue (WorkQueue): the work queue containing the job
+        job_id (int): the ID of the job
+        interval (float, optional): the number of seconds between two progress reports - defaults to 60
+    """
+
+    while not work_queue.is_finished(job_id):
+        print_progress(work_queue, job_id)
+        sleep(interval)
+
+    print_progress(work_queue, job_id)
+
+
+# Coordinating a sharded crawl from the command line, e.g. "python3 crawl_coordinator.py create ckan --wait" (from the script path) and "python3 portal_crawler.py ckan --job <job ID>" on each node
+if __name__ == "__main__":
+    # Defining the command line arguments
+    parser = argparse.ArgumentParser(description = "Coordinating a crawl sharded across the workers on several nodes, which lease the portals from a shared work queue.")
+    parser.add_argument("--work-queue", help = "the SQLite file of the work queue shared by the coordinator and the workers (defaults to data/work_queue.sqlite)")
+    subparsers = parser.add_subparsers(dest = "command", required = True)
+    create_parser = subparsers.add_parser("create", help = "create a job for all portals of an API on the portal list")
+    create_parser.add_argument("api", choices = list(portal_adapters), help = "the API of the portals to be crawled")
+    create_parser.add_argument("--test", action = "store_true", help = "create the job for the test subset of the portal list")
+    create_parser.add_argument("--max-workers-per-host", type = int, default = 1, help = "the maximum number of portals crawled at the same time on the same host by all workers together")
+    create_parser.add_argument("--wait", action = "store_true", help = "print the progress of the job until it is finished")
+    status_parser = subparsers.add_parser("status", help = "print the progress of a job")
+    status_parser.add_argument("job", type = int, help = "the ID of the job")
+    status_parser.add_argument("--wait", action = "store_true", help = "print the progress of the job until it is finished")
+    arguments = parser.parse_args()
+
+    # Loading environment variables
+    config = dotenv_values("../.env")
+
+    # Getting the project path
+    project_path = config["PATH"]
+
+    # Opening the work queue
+    work_queue = SqliteWorkQueue(arguments.work_queue if arguments.work_queue is not None else project_path + "data_portal_tracker/data/work_queue.sqlite")
+
+    # Creating a job from the portal list (both Opendatasoft APIs share one statistics file)
+    if arguments.command == "create":
+        portal_list = pd.read_csv(project_path + "data_portal_tracker/data/" + ("portals_test_subset.csv" if arguments.test else "portals.csv"))
+        statistics_file = project_path + "data_portal_tracker/data/portal_statistics_" + arguments.api.split("_")[0] + ("_test" if arguments.test else "") + ".csv"
+        job_id = create_crawl_job(work_queue, portal_adapters[arguments.api], portal_list, statistics_file, arguments.max_workers_per_host)
+        print("Start the workers on each node with: python3 portal_crawler.py " + arguments.api + " --job " + str(job_id))
+    else:
+        job_id = arguments.job
+        if work_queue.get_job(job_id) is None:
+            parser.error("the work queue doesn't contain a job " + str(job_id))
+
+    # Printing the progress of the job
+    if arguments.wait:
+        wait_for_job(work_queue, job_id)
+    else:
+        print_progress(work_queue, job_id)
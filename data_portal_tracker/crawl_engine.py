@@ -0,0 +1,159 @@
+# Importing required libraries
+import threading
+from time import sleep
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from url_helpers import get_host
+from helpers import read_latest_statistics
+
+
+def get_portal_sizes(statistics_file: str) -> dict:
+    """Reading the number of datasets (or resources) per portal from a statistics file written by a previous crawl
+
+    Args:
+        statistics_file (str): the path of a CSV file created by one of the crawl functions in the portal crawler
+
+    Returns:
+        dict: {portal URL: number of datasets or resources found during the latest crawl} - empty if the file doesn't exist yet
+    """
+
+    # Using the number of resources for CKAN portals, since resources are the unit that is handled by the Archiver
+    size_columns = ["number_of_resources", "number_of_datasets"]
+
+    return {url: int(next(row[column] for column in size_columns if column in row)) for url, row in read_latest_statistics(statistics_file, size_columns).items()}
+
+
+def crawl_concurrently(crawl_portal, api_base_urls: list, max_workers: int = 8, max_workers_per_host: int = 1, portal_sizes: dict = None) -> dict:
+    """Crawling many portals at once with a bounded pool of worker threads, while limiting the number of portals crawled at the same time on each host.
+
+    Portals with the most datasets in the previous crawl are started first, so that the total crawl time is determined by the largest portal instead of the sum of all portals.
+
+    Args:
+        crawl_portal (function): the function that crawls a single portal - is called with the index of the portal in "api_base_urls"
+        api_base_urls (list): the base URLs of all portals to be crawled
+        max_workers (int, optional): the maximum number of portals crawled at the same time - defaults to 8
+        max_workers_per_host (int, optional): the maximum number of portals crawled at the same time on the same host - defaults to 1
+        portal_sizes (dict, optional): {portal URL: number of datasets} used to start the largest portals first - defaults to None
+
+    Returns:
+        dict: {index of the portal: return value of "crawl_portal" or None if an exception occurred}
+    """
+
+    # Sorting the portal indices by their size in the previous crawl (largest first), unknown portals keep their order at the end
+    if portal_sizes is None:
+        portal_sizes = {}
+    pending_portals = sorted(range(len(api_base_urls)), key = lambda i: portal_sizes.get(api_base_urls[i], 0), reverse = True)
+
+    # Keeping track of the running crawls and the number of running crawls per host
+    running_crawls = {}
+    crawls_per_host = {}
+    results = {}
+
+    with ThreadPoolExecutor(max_workers = max_workers) as executor:
+        while pending_portals or running_crawls:
+            # Starting as many pending portals as the global and per-host limits allow
+            for i in list(pending_portals):
+                if len(running_crawls) >= max_workers:
+                    break
+                host = get_host(api_base_urls[i])
+                if crawls_per_host.get(host, 0) < max_workers_per_host:
+                    pending_portals.remove(i)
+                    crawls_per_host[host] = crawls_per_host.get(host, 0) + 1
+                    running_crawls[executor.submit(crawl_portal, i)] = (i, host)
+
+            # Waiting until at least one of the running crawls is finished
+            finished_crawls, _ = wait(running_crawls, return_when = FIRST_COMPLETED)
+
+            # Freeing the slots of the finished crawls and collecting their results
+            for crawl in finished_crawls:
+                i, host = running_crawls.pop(crawl)
+                crawls_per_host[host] -= 1
+                try:
+                    results[i] = crawl.result()
+                except Exception as exception:
+                    print("An exception occurred while crawling " + api_base_urls[i] + ": " + repr(exception))
+                    results[i] = None
+
+    return results
+
+
+def crawl_leased_portals(crawl_portal, work_queue, job_id: int, worker_id: str, max_workers: int = 8, poll_seconds: float = 10) -> dict:
+    """Crawling the portals of a sharded crawl job, which are leased one at a time from a work queue shared with the workers on other nodes, with a bounded pool of worker threads.
+
+    The leases of the worker are renewed by heartbeats in the background. Once no portal can be leased, the threads wait for portals that become available (e.g. because the lease of a dead worker expired) until the whole job is finished.
+
+    Args:
+        crawl_portal (function): the function that crawls a single portal and returns whether it was crawled without errors - is called with the lease of the portal (see "lease()" of the work queue)
+        work_queue (WorkQueue): the work queue containing the job - must be an instance of a subclass of "WorkQueue" in the work queue module
+        job_id (int): the ID of the job
+        worker_id (str): the ID of the worker holding the leases
+        max_workers (int, optional): the maximum number of portals crawled at the same time by this worker - defaults to 8
+        poll_seconds (float, optional): the number of seconds a thread waits before trying to lease a portal again - defaults to 10
+
+    Returns:
+        dict: {"done" = the number of portals crawled by this worker, \n
+            "failed" = the number of portals whose crawl failed or raised an exception, which are leased again until the maximum number of attempts has been reached, \n
+            "lost" = the number of portals whose lease expired and was taken over by another worker during the crawl}
+    """
+
+    summary = {"done": 0, "failed": 0, "lost": 0}
+    summary_lock = threading.Lock()
+
+    # Renewing the leases of the worker in the background, three times per lease period
+    stopped = threading.Event()
+    def send_heartbeats():
+        while not stopped.wait(work_queue.lease_seconds / 3):
+            try:
+                work_queue.heartbeat(worker_id)
+            # A failed heartbeat is repeated with the next one, the leases only expire after the whole lease period
+            except Exception as exception:
+                print("Sending the heartbeat of " + worker_id + " failed: " + repr(exception))
+    heartbeat_thread = threading.Thread(target = send_heartbeats, daemon = True)
+    heartbeat_thread.start()
+
+    # Defining the function run by each worker thread, which leases and crawls portals until the job is finished
+    def work():
+        while True:
+            lease = work_queue.lease(job_id, worker_id)
+
+            # No portal can be leased right now: stopping if the job is finished, otherwise waiting for portals of other hosts or expired leases
+            if lease is None:
+                if work_queue.is_finished(job_id):
+                    return
+                sleep(poll_seconds)
+                continue
+
+            if lease["attempts"] > 1:
+                print("\n" + "Taking over " + lease["url"] + " (attempt " + str(lease["attempts"]) + ")")
+
+            # Crawling the portal
+            try:
+                crawled = crawl_portal(lease)
+                reason = "The crawl of the portal failed."
+            except Exception as exception:
+                print("An exception occurred while crawling " + lease["url"] + ": " + repr(exception))
+                crawled = False
+                reason = repr(exception)
+
+            # Reporting the outcome, which is only accepted while the worker still holds the lease (a failed portal is given back, so that it is leased again)
+            if crawled:
+                outcome = "done"
+                lease_held = work_queue.complete(lease["item_id"], worker_id)
+            else:
+                outcome = "failed"
+                lease_held = work_queue.fail(lease["item_id"], worker_id, reason)
+
+            if not lease_held:
+                print("The lease of " + lease["url"] + " expired and was taken over by another worker")
+                outcome = "lost"
+
+            with summary_lock:
+                summary[outcome] += 1
+
+    try:
+        with ThreadPoolExecutor(max_workers = max_workers) as executor:
+            for thread in [executor.submit(work) for _ in range(max_workers)]:
+                thread.result()
+    finally:
+        stopped.set()
+
+    return summary
@@ -1,5 +1,11 @@
+import os
 import requests
-from time import sleep
+import threading
+import pandas as pd
+from http_client import http_client
+
+# Creating a lock that prevents concurrently running crawls from writing to the same CSV file at the same time
+csv_lock = threading.Lock()
 
 
 def check_url(url: str) -> dict:
@@ -15,8 +21,8 @@ def check_url(url: str) -> dict:
     """
     
     try:
-        # Requesting the URL and getting the status code of the response
-        response = requests.get(url, timeout = 15)
+        # Requesting the URL (through the shared HTTP client) and getting the status code of the response
+        response = http_client.get(url, timeout = 15, maximum_retries = 0)
         response_code = response.status_code
 
         # Response indicates success
@@ -65,8 +71,6 @@ def check_protocol(url: str, show_details: bool = True) -> str:
     if (https_request["request_success"] == True):
         url = https_url
     else:
-        # Waiting 1 second
-        sleep(1)
         # Requesting the HTTP URL
         http_request = check_url(http_url)
         if show_details == True:
@@ -111,3 +115,63 @@ def remove_double_slashes(url: str) -> str:
     # Returning the modified URL
     return url
 
+
+def append_to_csv(dataframe: pd.DataFrame, file: str):
+    """Saving a dataframe to a new CSV file or appending it to an existing one - safe to use from multiple threads
+
+    The columns are aligned with the header of an existing file. If the dataframe contains columns that the file doesn't have yet, the file is rewritten once with the extended header (the new columns are empty for the existing rows).
+
+    Args:
+        dataframe (pd.DataFrame): the rows to be saved
+        file (str): the path of the CSV file to be created or extended
+    """
+
+    # Writing while no other thread is writing
+    with csv_lock:
+        # Creating a new file with a header
+        if not os.path.isfile(file):
+            dataframe.to_csv(file, index = False)
+            return
+
+        columns = pd.read_csv(file, nrows = 0).columns.tolist()
+
+        # Rewriting the file with the extended header if the dataframe contains new columns (reading the values as text, so that they are written unchanged)
+        if any(column not in columns for column in dataframe.columns):
+            pd.concat([pd.read_csv(file, dtype = str, keep_default_na = False), dataframe.astype(object)]).to_csv(file, index = False)
+        # Appending the rows in the order of the existing columns
+        else:
+            dataframe.reindex(columns = columns).to_csv(file, mode = "a", index = False, header = False)
+
+
+def read_latest_statistics(statistics_file: str, columns: list, dtype: dict = None) -> dict:
+    """Reading the latest entry of each portal from a statistics file written by a previous crawl
+
+    Args:
+        statistics_file (str): the path of a CSV file created by one of the crawl functions in the portal crawler
+        columns (list): alternative columns, of which the first one contained in the file must have a value (entries without a value are ignored)
+        dtype (dict, optional): {column: type} of the columns whose type should not be inferred - defaults to None
+
+    Returns:
+        dict: {portal URL: the latest entry of the portal with a value as a dictionary} - empty if the file doesn't exist yet, contains none of the columns or can't be read
+    """
+
+    # Without a previous crawl, there are no statistics
+    if not os.path.isfile(statistics_file):
+        return {}
+
+    try:
+        statistics = pd.read_csv(statistics_file, dtype = dtype)
+
+        # Using the first of the columns contained in the file
+        column = next((column for column in columns if column in statistics.columns), None)
+        if column is None:
+            return {}
+
+        # Keeping only the latest entry with a value of each portal
+        statistics = statistics.dropna(subset = [column]).drop_duplicates(subset = "url", keep = "last")
+
+        return {row["url"]: row for row in statistics.to_dict("records")}
+    # A broken statistics file should not prevent the crawl from starting
+    except Exception as exception:
+        print("Reading the statistics file " + statistics_file + " failed: " + repr(exception))
+        return {}
@@ -0,0 +1,115 @@
+# Importing required libraries
+import requests
+from requests.adapters import HTTPAdapter
+from url_helpers import get_host
+from rate_limiter import HostRateLimiter, rate_limiter, parse_retry_after
+from circuit_breaker import HostCircuitBreaker, circuit_breaker
+
+
+class HttpClient:
+    """A class that performs all HTTP requests of the project through one session, which keeps connections to each host alive, requests compressed responses, applies timeouts and retries transient failures.
+
+    Every attempt is rate limited per host and reported to the circuit breaker. Requests answered with 429 or 503 are repeated after the pause set by the rate limiter, as are idempotent requests that failed with a connection error, a timeout or the response codes 500, 502 and 504. Requests to hosts that keep failing are stopped by the circuit breaker, which raises a CircuitOpenError instead of making them.
+    """
+
+    # Methods whose requests can be repeated safely after a connection error or a server error
+    idempotent_methods = ("GET", "HEAD")
+
+    def __init__(self, rate_limiter: HostRateLimiter, circuit_breaker: HostCircuitBreaker = None, connect_timeout: float = 10, read_timeout: float = 60, pool_connections: int = 100, pool_maxsize: int = 16):
+        """Instantiating the class.
+
+        Args:
+            rate_limiter (HostRateLimiter): the rate limiter deciding when a request to a host is allowed
+            circuit_breaker (HostCircuitBreaker, optional): the circuit breaker stopping the requests to failing hosts - defaults to None (no circuit breaker)
+            connect_timeout (float, optional): the number of seconds to wait for a connection to be established - defaults to 10
+            read_timeout (float, optional): the number of seconds to wait for the server to send data - defaults to 60
+            pool_connections (int, optional): the number of hosts for which a connection pool is kept - defaults to 100
+            pool_maxsize (int, optional): the maximum number of open connections per host - defaults to 16
+        """
+
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = circuit_breaker
+        self.timeout = (connect_timeout, read_timeout)
+
+        # Creating the session with a connection pool per host (without retries of its own, since every attempt has to pass the rate limiter and the circuit breaker)
+        adapter = HTTPAdapter(pool_connections = pool_connections, pool_maxsize = pool_maxsize, max_retries = 0)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # Requesting compressed responses, which are decompressed transparently by requests
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate"})
+
+    def request(self, method: str, url: str, maximum_retries: int = None, **kwargs) -> requests.Response:
+        """Performing a rate limited HTTP request, which is repeated with backoff if the server responds with 429 or 503 or, for idempotent requests, fails with a connection error, a timeout or a server error, failing fast while the circuit of the host is open.
+
+        Args:
+            method (str): the HTTP method, e.g. "GET" or "POST"
+            url (str): the URL to be requested
+            maximum_retries (int, optional): the maximum number of retries of the request, e.g. 0 for a single attempt - defaults to None (the "maximum_retries" of the host in the rate limits)
+            **kwargs: further arguments passed on to "requests.Session.request()", e.g. "params", "headers", "stream" or "timeout"
+
+        Returns:
+            requests.Response: the last response - exceptions of the last attempt are raised after being reported to the rate limiter and the circuit breaker
+
+        Raises:
+            CircuitOpenError: if the circuit of the host is open, without making the (next) attempt
+        """
+
+        # Using the default timeouts unless the caller sets its own
+        kwargs.setdefault("timeout", self.timeout)
+
+        if maximum_retries is None:
+            maximum_retries = self.rate_limiter.get_limits(get_host(url))["maximum_retries"]
+
+        # Only repeating requests that failed with a connection error or a server error if they can be repeated safely
+        idempotent = method.upper() in self.idempotent_methods
+
+        for attempt_number in range(maximum_retries + 1):
+            last_attempt = attempt_number == maximum_retries
+
+            # Failing fast if the circuit of the host is open (which it may become during the retries), otherwise noting whether the attempt probes a half-open circuit
+            probe = self.circuit_breaker.before_request(url) if self.circuit_breaker is not None else False
+
+            # Waiting for a free slot of the host
+            self.rate_limiter.wait(url)
+
+            # Making the request, pausing the host and retrying the request if it failed due to connection problems
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except Exception as exception:
+                self.rate_limiter.report(url)
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.report(url, False, probe)
+                if last_attempt or not idempotent or not isinstance(exception, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)) or isinstance(exception, requests.exceptions.SSLError):
+                    raise
+                continue
+
+            # Reporting the outcome of the attempt to the rate limiter, which pauses the host after throttling or server errors, and to the circuit breaker, for which server errors count as failures of the host
+            self.rate_limiter.report(url, response.status_code, parse_retry_after(response.headers.get("Retry-After")))
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.report(url, response.status_code not in self.circuit_breaker.failure_response_codes, probe)
+
+            # Retrying throttled requests and idempotent requests answered with a server error (after the pause set by the rate limiter) until the maximum number of retries is reached
+            retry = response.status_code in self.rate_limiter.throttling_response_codes or (idempotent and response.status_code in self.rate_limiter.server_error_response_codes)
+            if not retry or last_attempt:
+                return response
+
+            # Releasing the connection of the discarded response
+            response.close()
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Performing a GET request - see request() for details.
+        """
+
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """Performing a POST request - see request() for details.
+        """
+
+        return self.request("POST", url, **kwargs)
+
+
+# Creating the HTTP client shared by all modules
+http_client = HttpClient(rate_limiter, circuit_breaker)
@@ -0,0 +1,195 @@
+# Importing required libraries
+import queue
+import threading
+from time import monotonic
+from collections import deque
+
+
+class PageTicket:
+    """A class that tracks the datasets of one page handed to the pipeline, so that the page can be completed once all of its datasets have been handled.
+    """
+
+    def __init__(self, number_of_datasets: int, on_done, sequence_key: str, handle_arguments: dict):
+        """Instantiating the class.
+
+        Args:
+            number_of_datasets (int): the number of datasets of the page
+            on_done (function): the function called without arguments once all datasets of the page (and of all previous pages with the same sequence key) have been handled, or None
+            sequence_key (str): the key of the sequence of pages the page belongs to, e.g. the portal URL
+            handle_arguments (dict): the keyword arguments passed on to "handle_datasets()" together with the datasets of the page
+        """
+
+        self.remaining = number_of_datasets
+        self.on_done = on_done
+        self.sequence_key = sequence_key
+        self.handle_arguments = handle_arguments
+        self.exception = None
+
+
+class IngestPipeline:
+    """A class that decouples fetching the portals' pages from inserting their datasets into the Archiver: the crawlers put the datasets (dataset, metadata and source URL) into a bounded queue, which is drained by separate Archiver worker threads in batches.
+
+    A full queue blocks the crawlers until the workers catch up (backpressure). The pages of a portal are completed in the order they were submitted, so that the checkpoint of a portal only advances over pages whose datasets have all been handled.
+    """
+
+    def __init__(self, archiver, workers: int = 4, max_queue_size: int = 5000, report_seconds: float = 30):
+        """Instantiating the class and starting the Archiver worker threads.
+
+        Args:
+            archiver (ArchiverConnector): the Archiver connector whose "handle_datasets()" inserts the datasets
+            workers (int, optional): the number of Archiver worker threads - defaults to 4
+            max_queue_size (int, optional): the maximum number of datasets waiting in the queue before the crawlers are blocked - defaults to 5000
+            report_seconds (float, optional): the minimum number of seconds between two reports of the queue depth - defaults to 30
+        """
+
+        self.archiver = archiver
+        self.queue = queue.Queue(maxsize = max_queue_size)
+        self.report_seconds = report_seconds
+
+        # Creating the dictionaries of the pages that have not been completed yet and of the first exception of each sequence {sequence key: ...}
+        self.pending_pages = {}
+        self.exceptions = {}
+        self.condition = threading.Condition()
+
+        # Setting the variables for reporting the queue depth
+        self.maximum_depth = 0
+        self.last_report = monotonic()
+
+        # Starting the Archiver worker threads
+        self.workers = [threading.Thread(target = self.work, daemon = True) for _ in range(workers)]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, datasets: list, on_done = None, sequence_key: str = None, **handle_arguments):
+        """Putting the datasets of a page into the queue, blocking while the queue is full.
+
+        Args:
+            datasets (list): the datasets as dictionaries {"dataset_url": ..., "metadata_url": ..., "source_url": ...}
+            on_done (function, optional): the function called without arguments once all datasets of the page (and of all previous pages with the same sequence key) have been handled successfully - defaults to None
+            sequence_key (str, optional): the key of the sequence of pages the page belongs to, e.g. the portal URL - defaults to None
+            **handle_arguments: further arguments passed on to "handle_datasets()", e.g. "metadata_memo", "run_id" or "portal_url"
+        """
+
+        ticket = PageTicket(len(datasets), on_done, sequence_key, handle_arguments)
+
+        with self.condition:
+            self.pending_pages.setdefault(sequence_key, deque()).append(ticket)
+
+        # Completing a page without datasets right away (after the previous pages of its sequence)
+        if len(datasets) == 0:
+            self.complete(ticket, 0)
+            return
+
+        for dataset in datasets:
+            self.queue.put((dataset, ticket))
+
+        self.report()
+
+    def work(self):
+        """Draining the queue in batches of the Archiver connector's batch size until the pipeline is closed - runs in each worker thread.
+        """
+
+        while True:
+            # Waiting for the next dataset and collecting the datasets that are already waiting into a batch
+            item = self.queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stop = False
+            while len(batch) < self.archiver.batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            # Grouping the batch by page, since the datasets of each page are handled with the arguments of the page
+            pages = {}
+            for dataset, ticket in batch:
+                pages.setdefault(ticket, []).append(dataset)
+
+            for ticket, datasets in pages.items():
+                try:
+                    self.archiver.handle_datasets(datasets, **ticket.handle_arguments)
+                except Exception as exception:
+                    print("Handling a batch of datasets failed: " + repr(exception))
+                    ticket.exception = ticket.exception or exception
+                self.complete(ticket, len(datasets))
+
+            if stop:
+                return
+
+    def complete(self, ticket: PageTicket, number_of_datasets: int):
+        """Counting handled datasets of a page and completing the pages of its sequence whose datasets have all been handled, in the order they were submitted.
+
+        Args:
+            ticket (PageTicket): the page of the handled datasets
+            number_of_datasets (int): the number of handled datasets
+        """
+
+        with self.condition:
+            ticket.remaining -= number_of_datasets
+            pending_pages = self.pending_pages[ticket.sequence_key]
+
+            while len(pending_pages) > 0 and pending_pages[0].remaining == 0:
+                page = pending_pages.popleft()
+
+                # After a failed page, the following pages of the sequence are not completed, so that e.g. a checkpoint doesn't skip the failed page
+                if page.exception is not None:
+                    self.exceptions.setdefault(page.sequence_key, page.exception)
+                elif page.sequence_key not in self.exceptions and page.on_done is not None:
+                    try:
+                        page.on_done()
+                    except Exception as exception:
+                        self.exceptions.setdefault(page.sequence_key, exception)
+
+            if len(pending_pages) == 0:
+                del self.pending_pages[ticket.sequence_key]
+                self.condition.notify_all()
+
+    def join(self, sequence_key: str = None):
+        """Waiting until all submitted pages of a sequence have been completed.
+
+        Args:
+            sequence_key (str, optional): the key of the sequence, e.g. the portal URL - defaults to None
+
+        Returns:
+            Exception: the first exception raised while handling the pages of the sequence or None
+        """
+
+        with self.condition:
+            while sequence_key in self.pending_pages:
+                self.condition.wait()
+            return self.exceptions.pop(sequence_key, None)
+
+    def depth(self) -> int:
+        """Getting the number of datasets waiting in the queue.
+
+        Returns:
+            int: the number of waiting datasets
+        """
+
+        return self.queue.qsize()
+
+    def report(self):
+        """Printing the depth of the queue if the last report is long enough ago.
+        """
+
+        depth = self.depth()
+        self.maximum_depth = max(self.maximum_depth, depth)
+
+        if monotonic() - self.last_report >= self.report_seconds:
+            self.last_report = monotonic()
+            print("Archiver queue: " + str(depth) + "/" + str(self.queue.maxsize) + " datasets waiting (maximum so far: " + str(self.maximum_depth) + ")")
+
+    def close(self):
+        """Waiting until all datasets in the queue have been handled and stopping the worker threads.
+        """
+
+        for _ in self.workers:
+            self.queue.put(None)
+        for worker in self.workers:
+            worker.join()
@@ -0,0 +1,270 @@
+# Importing required libraries
+import re
+import json
+import codecs
+import requests
+
+# Patterns finding the characters that change the nesting of a JSON value outside and inside of strings
+structure_pattern = re.compile(r'["\[\]{}]')
+string_end_pattern = re.compile(r'["\\]')
+
+# Pattern finding the delimiters that can follow a number, true, false or null
+scalar_end_pattern = re.compile(r'[\s,\]}:]')
+
+
+def iter_json_lines(response: requests.Response):
+    """Parsing a JSON lines response (one JSON value per line) incrementally, so that only the current line is kept in memory.
+
+    Args:
+        response (requests.Response): a response requested with "stream = True"
+
+    Yields:
+        the deserialized JSON value of each non-empty line
+    """
+
+    for line in response.iter_lines():
+        if line.strip():
+            yield json.loads(line)
+
+
+class JsonStreamReader:
+    """A class that reads the text of a streamed JSON response chunk by chunk, only keeping the text that has not been parsed yet in memory.
+    """
+
+    def __init__(self, response: requests.Response, chunk_size: int = 65536):
+        """Instantiating the class.
+
+        Args:
+            response (requests.Response): a response requested with "stream = True"
+            chunk_size (int, optional): the number of bytes read from the response at once - defaults to 65536
+        """
+
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors = "replace")
+        self.chunks = response.iter_content(chunk_size = chunk_size)
+
+        # The text that has been read but not parsed yet and the current position in it
+        self.buffer = ""
+        self.position = 0
+
+        # Whether all chunks of the response have been read
+        self.finished = False
+
+        # The nesting of the value currently being read: the depth of its arrays and objects, whether the scan is inside a string and whether the next character is escaped
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    def read_text(self) -> str:
+        """Reading and decoding the next chunk of the response.
+
+        Returns:
+            str: the text of the chunk or None if the response has been read completely
+        """
+
+        if self.finished:
+            return None
+
+        try:
+            return self.text_decoder.decode(next(self.chunks))
+        except StopIteration:
+            self.finished = True
+            return self.text_decoder.decode(b"", final = True)
+
+    def read_chunk(self) -> bool:
+        """Appending the next chunk of the response to the unparsed text.
+
+        Returns:
+            bool: whether a chunk was read, False if the response has been read completely
+        """
+
+        text = self.read_text()
+        if text is None:
+            return False
+
+        # Dropping the parsed text from the buffer
+        self.buffer = self.buffer[self.position:] + text
+        self.position = 0
+
+        return True
+
+    def scan(self, text: str, position: int = 0) -> bool:
+        """Following the nesting of the array, object or string being read through a piece of its text, continuing with the nesting of the previous pieces, so that each chunk is only scanned once instead of deserializing the incomplete value again after every chunk.
+
+        Args:
+            text (str): the next piece of the value's text
+            position (int, optional): the position in the text at which the piece starts - defaults to 0
+
+        Returns:
+            bool: whether the value ends in the piece
+        """
+
+        # Skipping the character escaped by a backslash at the end of the previous piece
+        if self.escaped and position < len(text):
+            self.escaped = False
+            position += 1
+
+        while not self.escaped:
+            # Jumping to the end of the string or to the next escape sequence in it
+            if self.in_string:
+                match = string_end_pattern.search(text, position)
+                if match is None:
+                    return False
+                if match.group() == "\\":
+                    self.escaped = match.end() == len(text)
+                    position = match.end() + 1
+                    continue
+                self.in_string = False
+                position = match.end()
+                if self.depth == 0:
+                    return True
+            # Jumping to the next string, array or object boundary
+            else:
+                match = structure_pattern.search(text, position)
+                if match is None:
+                    return False
+                position = match.end()
+                if match.group() == '"':
+                    self.in_string = True
+                elif match.group() in "[{":
+                    self.depth += 1
+                else:
+                    self.depth -= 1
+                    if self.depth == 0:
+                        return True
+
+        return False
+
+    def peek(self) -> str:
+        """Skipping whitespace and returning the next character without consuming it.
+
+        Returns:
+            str: the next character
+
+        Raises:
+            ValueError: if the response ends before the next character
+        """
+
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position].isspace():
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.read_chunk():
+                raise ValueError("The response ended before the JSON value was complete.")
+
+    def expect(self, character: str):
+        """Consuming the next character, which must be the given one.
+
+        Args:
+            character (str): the expected character, e.g. "[" or ":"
+
+        Raises:
+            ValueError: if the next character is a different one
+        """
+
+        if self.peek() != character:
+            raise ValueError("Expected \"" + character + "\" at position " + str(self.position) + " of the JSON response.")
+        self.position += 1
+
+    def read_value(self):
+        """Deserializing the next complete JSON value, reading further chunks while the value is incomplete.
+
+        Returns:
+            the deserialized JSON value
+        """
+
+        # Reading the chunks of an array, object or string that isn't complete in the buffer until its nesting shows that it is complete, then deserializing it once
+        if self.peek() in "[{\"":
+            try:
+                value, self.position = self.decoder.raw_decode(self.buffer, self.position)
+                return value
+            except json.JSONDecodeError:
+                pass
+
+            self.depth, self.in_string, self.escaped = 0, False, False
+            if not self.scan(self.buffer, self.position):
+                # Collecting the chunks and joining them once, instead of extending the buffer with every chunk
+                parts = [self.buffer[self.position:]]
+                while True:
+                    text = self.read_text()
+                    if text is None:
+                        raise ValueError("The response ended before the JSON value was complete.")
+                    parts.append(text)
+                    if self.scan(text):
+                        break
+                self.buffer = "".join(parts)
+                self.position = 0
+
+            value, self.position = self.decoder.raw_decode(self.buffer, self.position)
+            return value
+
+        # Reading the chunks of a number, true, false or null until it is followed by a delimiter, since a number cut by a chunk, e.g. "-2500." and "0", would otherwise be deserialized too early
+        while scalar_end_pattern.search(self.buffer, self.position) is None and self.read_chunk():
+            pass
+
+        value, self.position = self.decoder.raw_decode(self.buffer, self.position)
+        return value
+
+
+def iter_json_array(response: requests.Response, path: tuple = (), values: dict = None, chunk_size: int = 65536):
+    """Parsing a JSON array response, or a JSON array nested in objects, incrementally, so that only the current chunk and the current element are kept in memory instead of the whole text and the whole parsed response.
+
+    Args:
+        response (requests.Response): a response requested with "stream = True"
+        path (tuple, optional): the keys of the nested objects leading to the array, e.g. ("result", "results") - defaults to (), i.e. the response is the array
+        values (dict, optional): a dictionary that is filled with the other values of the objects on the path {key: value}, e.g. {"count": ...} - values following the array are only added once all elements have been parsed - defaults to None
+        chunk_size (int, optional): the number of bytes read from the response at once - defaults to 65536
+
+    Yields:
+        the deserialized JSON value of each element of the array
+
+    Raises:
+        ValueError: if the response doesn't contain an array at the path or ends before the array is closed
+    """
+
+    yield from iter_json_value(JsonStreamReader(response, chunk_size), tuple(path), values)
+
+
+def iter_json_value(reader: JsonStreamReader, path: tuple, values: dict = None):
+    """Parsing the array at the path of the next JSON value of a reader incrementally - see iter_json_array() for details.
+    """
+
+    # Yielding the elements of the array one by one
+    if len(path) == 0:
+        reader.expect("[")
+        if reader.peek() == "]":
+            reader.expect("]")
+            return
+        while True:
+            yield reader.read_value()
+            if reader.peek() == ",":
+                reader.expect(",")
+            else:
+                reader.expect("]")
+                return
+
+    # Descending into the object, keeping its other values
+    reader.expect("{")
+    path_found = False
+    if reader.peek() == "}":
+        reader.expect("}")
+    else:
+        while True:
+            key = reader.read_value()
+            reader.expect(":")
+            if key == path[0] and not path_found:
+                path_found = True
+                yield from iter_json_value(reader, path[1:], values)
+            else:
+                value = reader.read_value()
+                if values is not None:
+                    values[key] = value
+            if reader.peek() == ",":
+                reader.expect(",")
+            else:
+                reader.expect("}")
+                break
+
+    if not path_found:
+        raise ValueError("The JSON response doesn't contain the key \"" + str(path[0]) + "\".")
@@ -0,0 +1,153 @@
+# Importing required libraries
+import os
+import csv
+import gzip
+import json
+import atexit
+import threading
+from time import monotonic
+
+
+class BufferedLogWriter:
+    """A class that collects log rows in memory and writes them to the log file in batches, instead of opening the file for every single row.
+
+    The buffered rows are written when the buffer is full, when the oldest buffered row exceeds the time threshold and when the program exits. Files ending with ".csv" are written as CSV (with a header if the file is new, whose columns the rows are aligned with), files ending with ".jsonl.gz" as gzip-compressed JSON lines.
+    """
+
+    def __init__(self, file: str, max_rows: int = 1000, max_seconds: float = 30):
+        """Instantiating the class.
+
+        Args:
+            file (str): the path of the log file to be created or extended - must end with ".csv" or ".jsonl.gz"
+            max_rows (int, optional): the number of buffered rows after which the buffer is written to the file - defaults to 1000
+            max_seconds (float, optional): the number of seconds after which a buffered row is written to the file at the latest (checked whenever a row is added) - defaults to 30
+        """
+
+        # Choosing the file format according to the file extension
+        if file.endswith(".csv"):
+            self.file_format = "csv"
+        elif file.endswith(".jsonl.gz"):
+            self.file_format = "jsonl.gz"
+        else:
+            raise ValueError("The log file must end with \".csv\" or \".jsonl.gz\".")
+
+        self.file = file
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+
+        # Creating the buffer, which is shared by all threads and protected by a lock
+        self.rows = []
+        self.columns = None
+        self.oldest_row_time = None
+        self.lock = threading.Lock()
+
+    def write(self, row: dict):
+        """Adding a row to the buffer, which is written to the file if one of the thresholds is reached.
+
+        Args:
+            row (dict): {column: value} - columns that a CSV file doesn't have yet are added to its header
+        """
+
+        self.write_many([row])
+
+    def write_many(self, rows: list):
+        """Adding multiple rows to the buffer, which is written to the file if one of the thresholds is reached.
+
+        Args:
+            rows (list): the rows as dictionaries {column: value}
+        """
+
+        with self.lock:
+            if len(self.rows) == 0:
+                self.oldest_row_time = monotonic()
+            self.rows.extend(rows)
+
+            # Writing the buffer if it is full or the oldest row has waited long enough
+            if len(self.rows) >= self.max_rows or monotonic() - self.oldest_row_time >= self.max_seconds:
+                self.flush_buffer()
+
+    def flush(self):
+        """Writing all buffered rows to the file.
+        """
+
+        with self.lock:
+            self.flush_buffer()
+
+    def flush_buffer(self):
+        """Writing all buffered rows to the file - must be called while holding the lock. The buffer is only emptied if writing succeeded.
+        """
+
+        if len(self.rows) == 0:
+            return
+
+        if self.file_format == "csv":
+            # Reading the header of an existing file once, so that the rows are aligned with its columns, and writing the header only if the file is new or empty
+            write_header = not os.path.isfile(self.file) or os.path.getsize(self.file) == 0
+            if write_header:
+                self.columns = []
+            elif self.columns is None:
+                with open(self.file, newline = "", encoding = "utf-8") as file:
+                    self.columns = next(csv.reader(file))
+
+            # Rewriting an existing file once with the extended header if the rows contain new columns (the new columns are empty for the existing rows)
+            new_columns = [column for column in dict.fromkeys(column for row in self.rows for column in row) if column not in self.columns]
+            if len(new_columns) > 0 and not write_header:
+                with open(self.file, newline = "", encoding = "utf-8") as file, open(self.file + ".tmp", "w", newline = "", encoding = "utf-8") as temporary_file:
+                    writer = csv.DictWriter(temporary_file, fieldnames = self.columns + new_columns, restval = "")
+                    writer.writeheader()
+                    writer.writerows(csv.DictReader(file))
+                os.replace(self.file + ".tmp", self.file)
+            self.columns = self.columns + new_columns
+
+            with open(self.file, "a", newline = "", encoding = "utf-8") as file:
+                writer = csv.DictWriter(file, fieldnames = self.columns, restval = "")
+                if write_header:
+                    writer.writeheader()
+                writer.writerows(self.rows)
+        else:
+            # Appending a new gzip member, which is read as one continuous stream when decompressing
+            with gzip.open(self.file, "at", encoding = "utf-8") as file:
+                for row in self.rows:
+                    file.write(json.dumps(row, default = str) + "\n")
+
+        self.rows = []
+
+
+# Creating a dictionary of the log writers (one per file), so that all threads logging to the same file share one buffer
+log_writers = {}
+log_writers_lock = threading.Lock()
+
+
+def get_log_writer(file: str) -> BufferedLogWriter:
+    """Getting the log writer of a file, creating it on the first call.
+
+    Args:
+        file (str): the path of the log file - must end with ".csv" or ".jsonl.gz"
+
+    Returns:
+        BufferedLogWriter: the log writer shared by all callers logging to the file
+    """
+
+    with log_writers_lock:
+        if file not in log_writers:
+            log_writers[file] = BufferedLogWriter(file)
+        return log_writers[file]
+
+
+def flush_log_writers():
+    """Writing the buffered rows of all log writers to their files, e.g. at the end of a crawl.
+    """
+
+    with log_writers_lock:
+        writers = list(log_writers.values())
+
+    for writer in writers:
+        try:
+            writer.flush()
+        # A broken log file should not prevent the other logs from being written
+        except Exception as exception:
+            print("Writing the log file " + writer.file + " failed: " + repr(exception))
+
+
+# Writing the remaining buffered rows when the program exits
+atexit.register(flush_log_writers)
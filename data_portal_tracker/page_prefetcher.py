@@ -0,0 +1,71 @@
+# Importing required libraries
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PagePrefetcher:
+    """A class that fetches the following pages of a portal with a known number of datasets concurrently, while the crawler still processes the pages one after the other in the order of their offsets.
+
+    Only a limited number of pages is fetched ahead, so that the memory stays bounded, and all requests pass through the HTTP client, whose rate limiter keeps the requests to the portal's host within its politeness budget.
+    """
+
+    def __init__(self, fetch_page, max_workers: int = 4, window: int = None):
+        """Instantiating the class.
+
+        Args:
+            fetch_page (function): the function fetching a page, called as fetch_page(start, rows) in the worker threads
+            max_workers (int, optional): the maximum number of pages fetched at the same time - defaults to 4
+            window (int, optional): the maximum number of pages fetched ahead of the current page - defaults to twice the maximum number of workers
+        """
+
+        self.fetch_page = fetch_page
+        self.window = window if window is not None else 2 * max_workers
+        self.executor = ThreadPoolExecutor(max_workers = max_workers)
+
+        # Creating a dictionary of the pages fetched ahead {(start, rows): Future}
+        self.pages = {}
+
+    def get(self, start: int, rows: int, total: int = None):
+        """Getting a page, waiting for it if it is already being fetched, otherwise fetching it in the calling thread, and fetching the following pages ahead up to the total number of datasets.
+
+        Args:
+            start (int): the offset of the page
+            rows (int): the number of datasets requested for the page - pages fetched ahead are only used if they were requested with the same number
+            total (int, optional): the total number of datasets on the portal, no pages are fetched ahead if it is unknown - defaults to None
+
+        Returns:
+            the return value of fetch_page(start, rows) - its exceptions are raised
+        """
+
+        # Discarding the pages that will not be requested anymore, e.g. after a page was shorter than expected
+        for key in list(self.pages.keys()):
+            if key[0] < start or key[1] != rows:
+                self.pages.pop(key).cancel()
+
+        page = self.pages.pop((start, rows), None)
+
+        # Fetching the following pages ahead
+        if total is not None:
+            next_start = start + rows
+            while next_start < total and len(self.pages) < self.window:
+                if (next_start, rows) not in self.pages:
+                    self.pages[(next_start, rows)] = self.executor.submit(self.fetch_page, next_start, rows)
+                next_start += rows
+
+        if page is None:
+            return self.fetch_page(start, rows)
+        return page.result()
+
+    def clear(self):
+        """Discarding all pages fetched ahead, e.g. after the request parameters changed.
+        """
+
+        for page in self.pages.values():
+            page.cancel()
+        self.pages = {}
+
+    def close(self):
+        """Discarding all pages fetched ahead and stopping the worker threads.
+        """
+
+        self.clear()
+        self.executor.shutdown(wait = True, cancel_futures = True)
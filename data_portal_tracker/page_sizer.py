@@ -0,0 +1,59 @@
+class AdaptivePageSize:
+    """A class that chooses the number of datasets requested per page of a portal's API, detecting the largest page size the server actually returns and growing or shrinking the page size depending on how long the pages take and how large they are.
+
+    A page that is shorter than requested although it is not the last page shows that the server caps the page size, which is then never exceeded again. Fast and small pages double the page size, slow or large pages halve it.
+    """
+
+    def __init__(self, initial_size: int = 800, minimum_size: int = 100, maximum_size: int = 5000, target_seconds: float = 10, maximum_bytes: int = 20 * 1024 * 1024):
+        """Instantiating the class.
+
+        Args:
+            initial_size (int, optional): the page size of the first request - defaults to 800
+            minimum_size (int, optional): the smallest page size the page size is shrunk to - defaults to 100
+            maximum_size (int, optional): the largest page size the page size is grown to - defaults to 5000
+            target_seconds (float, optional): the number of seconds a page should take at most, pages taking less than half of it let the page size grow - defaults to 10
+            maximum_bytes (int, optional): the number of bytes (as transferred) a page should have at most, pages smaller than half of it let the page size grow - defaults to 20 MB
+        """
+
+        self.size = initial_size
+        self.minimum_size = minimum_size
+        self.maximum_size = maximum_size
+        self.target_seconds = target_seconds
+        self.maximum_bytes = maximum_bytes
+
+        # The largest page size returned by the server, known once a page has been capped
+        self.server_maximum_size = None
+
+    def update(self, requested_size: int, returned_size: int, seconds: float, response_bytes: int, last_page: bool) -> int:
+        """Adjusting the page size after a page has been received.
+
+        Args:
+            requested_size (int): the number of datasets requested for the page
+            returned_size (int): the number of datasets returned on the page
+            seconds (float): the number of seconds the page took, including reading and parsing the response
+            response_bytes (int): the size of the response in bytes (as transferred)
+            last_page (bool): whether the page is the last page of the portal, e.g. according to the total number of datasets reported by the API
+
+        Returns:
+            int: the page size of the next request
+        """
+
+        # Detecting the server's maximum page size, which explains a short page that is not the last page
+        if 0 < returned_size < requested_size and not last_page:
+            if self.server_maximum_size != returned_size:
+                print("The server returns at most " + str(returned_size) + " datasets per page, using this page size")
+            self.server_maximum_size = returned_size
+            self.size = returned_size
+            return self.size
+
+        # The largest page size that may be requested
+        largest_size = self.maximum_size if self.server_maximum_size is None else min(self.maximum_size, self.server_maximum_size)
+
+        # Shrinking the page size if the page was too slow or too large
+        if seconds > self.target_seconds or response_bytes > self.maximum_bytes:
+            self.size = min(largest_size, max(self.minimum_size, self.size // 2))
+        # Growing the page size if a full page was fast and small
+        elif returned_size == requested_size and seconds < self.target_seconds / 2 and response_bytes < self.maximum_bytes / 2:
+            self.size = min(largest_size, self.size * 2)
+
+        return self.size
@@ -0,0 +1,554 @@
+# Importing required libraries
+import json
+from time import monotonic
+from urllib.parse import quote, urlsplit, parse_qs
+from collections import namedtuple
+from helpers import remove_double_slashes
+from http_client import http_client
+from json_stream import iter_json_array, iter_json_lines
+
+
+# Creating a compact record for the items returned by the portals' APIs (CKAN: packages, otherwise datasets), keeping only what the crawl driver uses instead of the full metadata
+PortalItem = namedtuple("PortalItem", ["id", "modification", "datasets", "count"])
+
+
+class PortalAdapter:
+    """A base class describing how the API of a portal software is crawled - how its pages are requested and which items, datasets and modifications they contain. The crawl driver "crawl_portals()" in the portal crawler handles everything else (retries, checkpoints, page sizes, concurrency, the Archiver and statistics) in the same way for all portal softwares.
+
+    An adapter is created for each crawled portal and keeps the request parameters of the portal, which it changes itself if the portal rejects them.
+
+    Supporting a new portal software only requires a subclass that sets the class attributes and implements "is_supported()", "get_item()" and "fetch_page()".
+    """
+
+    # The key of the API in the run store, the portal probe and the log files, e.g. "ckan"
+    api = None
+
+    # The portal software as saved in the statistics and the run store, e.g. "CKAN"
+    api_software = None
+
+    # The name of the portal software and API printed when the crawl starts
+    description = None
+
+    # The statistics column counting the datasets of the items besides the number of items, e.g. "number_of_resources"
+    statistics_column = "number_of_supported_datasets"
+
+    # The name of the dataset URL column in the exported failed API requests
+    dataset_column = "dataset_url"
+
+    # The position of the first page, e.g. its offset or page number
+    first_position = 0
+
+    # The number of datasets requested per page if the page size is fixed, None if the whole catalog is requested at once
+    datasets_per_request = None
+
+    # Whether the page size is adapted to the server's maximum page size and the response time and size (only for offset-based pagination)
+    adaptive_page_size = False
+
+    # Whether the following pages can be fetched ahead once the total number of datasets is known (only for offset-based pagination)
+    prefetchable = False
+
+    # Whether an interrupted crawl of a portal can continue after the last page recorded in its checkpoint
+    resumable = True
+
+    # Whether the API only returns the items modified since the high-water mark, otherwise the unchanged items are skipped by the crawl driver
+    filters_by_modification = True
+
+    def __init__(self, api_base_url: str, high_water_mark = None, parallel_requests: int = 1):
+        """Instantiating the class for a portal.
+
+        Args:
+            api_base_url (str): the base URL of the portal
+            high_water_mark (optional): the newest modification seen by the previous crawl if only the items modified since then should be crawled - defaults to None
+            parallel_requests (int, optional): the number of pages fetched at the same time, which may need a stable sort order - defaults to 1
+        """
+
+        self.api_base_url = api_base_url
+        self.high_water_mark = high_water_mark
+        self.parallel_requests = parallel_requests
+
+        # Setting the variable indicating whether only the fields used by the crawler are requested (switched off if the portal rejects the field list)
+        self.field_projection = True
+
+        # Creating a dictionary of further arguments passed on to "handle_datasets()" with the datasets of the portal
+        self.handle_arguments = {}
+
+    @staticmethod
+    def is_supported(api_software: str, api_version: str) -> bool:
+        """Checking whether a portal on the portal list is crawled with the adapter.
+
+        Args:
+            api_software (str): the API software of the portal on the portal list
+            api_version (str): the API versions of the portal on the portal list
+
+        Returns:
+            bool: whether the portal is crawled with the adapter
+        """
+
+        raise NotImplementedError
+
+    @staticmethod
+    def parse_modification(modification):
+        """Converting a high-water mark saved in the run store (as text) to the type of the items' modifications.
+
+        Args:
+            modification: the saved high-water mark
+
+        Returns:
+            the high-water mark comparable with the items' modifications
+        """
+
+        return modification
+
+    def get_item(self, metadata: dict) -> PortalItem:
+        """Extracting the item of the metadata returned by the API, building its dataset, metadata and source URLs.
+
+        Args:
+            metadata (dict): the metadata of an item as returned by the API
+
+        Returns:
+            PortalItem: the ID, the newest modification (or None), the datasets as dictionaries {"dataset_url": ..., "metadata_url": ..., "source_url": ...} and the number counted in the statistics column of the item
+        """
+
+        raise NotImplementedError
+
+    def build_api_request_url(self, position: int, rows: int) -> str:
+        """Building the API request URL of a page.
+
+        Args:
+            position (int): the position of the page
+            rows (int): the number of datasets requested for the page
+
+        Returns:
+            str: the API request URL
+        """
+
+        raise NotImplementedError
+
+    def parse_api_request_url(self, api_request_url: str) -> tuple:
+        """Getting the position and the number of requested datasets of a page from its API request URL, e.g. to retry a failed request logged by an earlier crawl.
+
+        Args:
+            api_request_url (str): the API request URL of the page
+
+        Returns:
+            tuple: (the position of the page, the number of datasets requested for the page)
+        """
+
+        # Offset-based pagination: "start" and "rows" parameters
+        parameters = parse_qs(urlsplit(api_request_url).query)
+        return int(parameters.get("start", [self.first_position])[0]), int(parameters["rows"][0]) if "rows" in parameters else self.datasets_per_request
+
+    def fetch_page(self, position: int, rows: int) -> dict:
+        """Requesting a page, measuring the duration and size of the response - called in worker threads if the pages are fetched ahead.
+
+        Args:
+            position (int): the position of the page
+            rows (int): the number of datasets requested for the page
+
+        Returns:
+            dict: {"parameters_changed" = whether the portal rejected the request parameters, which were changed, so that the page has to be requested again, \n
+                "items" = the items of the page (PortalItem), \n
+                "total" = the total number of items on the portal reported by the API or None, \n
+                "seconds" = the number of seconds the page took, \n
+                "bytes" = the size of the response in bytes}
+        """
+
+        raise NotImplementedError
+
+    def next_position(self, position: int, number_of_items: int) -> int:
+        """Getting the position of the page following a page.
+
+        Args:
+            position (int): the position of the page
+            number_of_items (int): the number of items on the page
+
+        Returns:
+            int: the position of the next page
+        """
+
+        return position + number_of_items
+
+    def is_last_page(self, position: int, number_of_items: int, total: int = None) -> bool:
+        """Checking whether no further page has to be requested after a page.
+
+        Args:
+            position (int): the position of the next page
+            number_of_items (int): the number of items on the page
+            total (int, optional): the total number of items on the portal reported by the API - defaults to None
+
+        Returns:
+            bool: whether the page is the last page - a page with less items than requested may only be capped by the server, so the crawl only stops after an empty page or once the total is reached
+        """
+
+        return number_of_items == 0 or (total is not None and position >= total)
+
+
+class OpendatasoftV1Adapter(PortalAdapter):
+    """An adapter for the Opendatasoft API v1.0, which is paged by offsets and reports the total number of datasets.
+    """
+
+    api = "opendatasoft_v1"
+    api_software = "Opendatasoft"
+    description = "Opendatasoft v1.0"
+    adaptive_page_size = True
+    prefetchable = True
+
+    @staticmethod
+    def is_supported(api_software: str, api_version: str) -> bool:
+        return api_software == "OpenDataSoft" and "v1.0" in str(api_version)
+
+    def get_item(self, metadata: dict) -> PortalItem:
+        # Getting the ID of the dataset
+        dataset_id = str(metadata["datasetid"])
+
+        # Getting the newest modification of the dataset's data or metadata
+        modifications = [timestamp for timestamp in (metadata.get("metas", {}).get("modified"), metadata.get("metas", {}).get("metadata_processed")) if timestamp is not None]
+
+        # Building the metadata URL and dataset URL
+        metadata_url = remove_double_slashes(self.api_base_url + "/api/datasets/1.0/") + dataset_id
+        dataset_url = remove_double_slashes(self.api_base_url + "/api/records/1.0/download?dataset=") + dataset_id + "&format=csv"
+
+        """
+        # Optional: If the portal is the Opendatasoft data hub, building the URL of the original data source (= different site than the data hub) using the metadata.
+        if (search("https://data.opendatasoft.com", self.api_base_url)):
+            # Checking the protocol, adding the protocol prefix and building the original source URL (requests to the same portal are spaced by the rate limiter)
+            original_source_url = check_protocol(remove_double_slashes(metadata["metas"]["source_domain_address"] + "/explore/dataset/") + metadata["metas"]["source_dataset"], show_details = False)
+        """
+
+        # Building the source URL using the API base url
+        source_url = remove_double_slashes(self.api_base_url + "/explore/dataset/") + dataset_id
+
+        return PortalItem(dataset_id, max(modifications) if len(modifications) > 0 else None, [{"dataset_url": dataset_url, "metadata_url": metadata_url, "source_url": source_url}], 1)
+
+    def build_api_request_url(self, position: int, rows: int) -> str:
+        api_request_url = remove_double_slashes(self.api_base_url + "/api/datasets/1.0/search/?" + "rows=" + str(rows) + "&start=" + str(position))
+
+        # Only requesting the datasets whose data or metadata were modified since the day of the high-water mark (the query language of API v1.0 compares dates), sorted by their modification (ascending) so that the pagination stays stable
+        if self.high_water_mark is not None:
+            api_request_url += "&q=" + quote("modified>=" + self.high_water_mark[:10] + " OR metadata_processed>=" + self.high_water_mark[:10]) + "&sort=-modified"
+
+        # Only requesting the dataset ID and the modification timestamps instead of all metadata
+        if self.field_projection:
+            api_request_url += "&fields=" + quote("datasetid,modified,metadata_processed")
+
+        return api_request_url
+
+    def fetch_page(self, position: int, rows: int) -> dict:
+        request_start = monotonic()
+        response = http_client.get(self.build_api_request_url(position, rows))
+
+        # The portal rejects the field list, requesting all metadata instead
+        if response.status_code == 400 and self.field_projection:
+            print("Requesting selected fields is not supported, requesting all metadata")
+            self.field_projection = False
+            return {"parameters_changed": True}
+
+        # Deserializing the JSON response string
+        page = json.loads(response.text)
+
+        return {"parameters_changed": False, "items": [self.get_item(metadata) for metadata in page["datasets"]], "total": page["nhits"], "seconds": monotonic() - request_start, "bytes": len(response.content)}
+
+
+class OpendatasoftV2Adapter(PortalAdapter):
+    """An adapter for the Opendatasoft API v2.1, whose catalog is exported with a single streamed request instead of pages.
+    """
+
+    api = "opendatasoft_v2"
+    api_software = "Opendatasoft"
+    description = "Opendatasoft v2.1"
+    resumable = False
+
+    def __init__(self, api_base_url: str, high_water_mark = None, parallel_requests: int = 1):
+        super().__init__(api_base_url, high_water_mark, parallel_requests)
+
+        # Setting the format of the catalog export - JSON lines are parsed line by line, the JSON export (parsed element by element) is used if the portal doesn't support JSON lines
+        self.export_format = "jsonl"
+
+    @staticmethod
+    def is_supported(api_software: str, api_version: str) -> bool:
+        return api_software == "OpenDataSoft" and "v2.1" in str(api_version)
+
+    def get_item(self, metadata: dict) -> PortalItem:
+        # Getting the ID of the dataset
+        dataset_id = str(metadata["dataset_id"])
+
+        # Getting the newest modification of the dataset's data or metadata (selected fields are returned at the top level, all metadata nested in "metas")
+        modifications = [timestamp for timestamp in (metadata.get("modified"), metadata.get("metadata_processed"), metadata.get("metas", {}).get("default", {}).get("modified"), metadata.get("metas", {}).get("default", {}).get("metadata_processed")) if timestamp is not None]
+
+        """
+        # Optional: Checking the available export formats of the dataset
+
+        dataset_formats_url = remove_double_slashes(self.api_base_url + "/api/explore/v2.1/catalog/datasets/") + dataset_id + "/exports"
+        dataset_formats = json.loads(http_client.get(dataset_formats_url).text)
+
+        # Choosing CSV if available, else JSON (this list could be extended, check the URL above for options!)
+        for link in dataset_formats["links"]:
+            if "csv" in link.values():
+                dataset_format = "csv"
+                break
+            elif "json" in link.values():
+                dataset_format = "json"
+                break
+
+        # Returning the dataset as unsupported if it isn't available in one of the specified formats
+        if dataset_format not in ["csv", "json"]:
+            return PortalItem(dataset_id, None, [], 0)
+
+        # If the optional code is used, swap the used dataset_url line below (comment / uncomment)
+        """
+
+        # Building the metadata URL, dataset URL and source URL
+        metadata_url = remove_double_slashes(self.api_base_url + "/api/explore/v2.1/catalog/datasets/") + dataset_id
+        dataset_url = remove_double_slashes(self.api_base_url + "/api/explore/v2.1/catalog/datasets/") + dataset_id + "/exports/" + "csv"
+        # dataset_url = remove_double_slashes(self.api_base_url + "/api/explore/v2.1/catalog/datasets/") + dataset_id + "/exports/" + dataset_format
+        source_url = remove_double_slashes(self.api_base_url + "/explore/dataset/") + dataset_id
+
+        return PortalItem(dataset_id, max(modifications) if len(modifications) > 0 else None, [{"dataset_url": dataset_url, "metadata_url": metadata_url, "source_url": source_url}], 1)
+
+    def build_api_request_url(self, position: int, rows: int) -> str:
+        api_request_url = remove_double_slashes(self.api_base_url + "/api/explore/v2.1/catalog/exports/" + self.export_format)
+
+        # Building the query parameters of the export
+        parameters = []
+
+        # Only exporting the dataset ID and the modification timestamps instead of all metadata
+        if self.field_projection:
+            parameters.append("select=" + quote("dataset_id, modified, metadata_processed"))
+
+        # Only exporting the datasets whose data or metadata were modified since the high-water mark
+        if self.high_water_mark is not None:
+            parameters.append("where=" + quote("modified >= date'" + self.high_water_mark + "' OR metadata_processed >= date'" + self.high_water_mark + "'"))
+
+        if len(parameters) > 0:
+            api_request_url += "?" + "&".join(parameters)
+
+        return api_request_url
+
+    def fetch_page(self, position: int, rows: int) -> dict:
+        request_start = monotonic()
+
+        # Making the API request, streaming the response so that the catalog is never held in memory as a whole
+        response = http_client.get(self.build_api_request_url(position, rows), stream = True)
+
+        # The portal doesn't support the JSON lines export, exporting the catalog as JSON instead
+        if response.status_code == 404 and self.export_format == "jsonl":
+            response.close()
+            print("The JSON lines export is not supported, exporting the catalog as JSON")
+            self.export_format = "json"
+            return {"parameters_changed": True}
+
+        # The portal rejects the field list, exporting all metadata instead
+        if response.status_code == 400 and self.field_projection:
+            response.close()
+            print("Selecting fields is not supported, exporting all metadata")
+            self.field_projection = False
+            return {"parameters_changed": True}
+
+        # The portal rejects the filter of the incremental crawl, exporting the whole catalog instead
+        if response.status_code == 400 and self.high_water_mark is not None:
+            response.close()
+            print("Filtering by modification is not supported, exporting the whole catalog")
+            self.high_water_mark = None
+            return {"parameters_changed": True}
+
+        # Raising an exception if the export failed
+        response.raise_for_status()
+
+        # Parsing the metadata of the datasets one at a time while they are iterated by the crawl driver
+        def iter_items():
+            with response:
+                for metadata in (iter_json_lines(response) if self.export_format == "jsonl" else iter_json_array(response)):
+                    yield self.get_item(metadata)
+
+        return {"parameters_changed": False, "items": iter_items(), "total": None, "seconds": monotonic() - request_start, "bytes": None}
+
+    def parse_api_request_url(self, api_request_url: str) -> tuple:
+        # The catalog is exported as a whole
+        return self.first_position, None
+
+    def is_last_page(self, position: int, number_of_items: int, total: int = None) -> bool:
+        # The catalog is exported as a whole
+        return True
+
+
+class CkanAdapter(PortalAdapter):
+    """An adapter for the CKAN API v2.x, which is paged by offsets, reports the total number of datasets (CKAN term: packages) and returns multiple datasets (CKAN term: resources) per package.
+    """
+
+    api = "ckan"
+    api_software = "CKAN"
+    description = "CKAN"
+    statistics_column = "number_of_resources"
+    dataset_column = "resource_url"
+    adaptive_page_size = True
+    prefetchable = True
+
+    def __init__(self, api_base_url: str, high_water_mark = None, parallel_requests: int = 1):
+        super().__init__(api_base_url, high_water_mark, parallel_requests)
+
+        # Creating a memo of the metadata IDs resolved on this portal, so that the metadata of a dataset/package with multiple resources is only resolved once
+        self.handle_arguments = {"metadata_memo": {}}
+
+    @staticmethod
+    def is_supported(api_software: str, api_version: str) -> bool:
+        return api_software == "CKAN"
+
+    def get_item(self, metadata: dict) -> PortalItem:
+        # Getting the package ID
+        dataset_id = metadata["id"]
+
+        # Building the metadata URL and source URL once for all resources (we are using the metadata and source of the dataset/package!)
+        metadata_url = remove_double_slashes(self.api_base_url + "/api/3/action/package_show?id=") + dataset_id
+        source_url = remove_double_slashes(self.api_base_url + "/dataset/") + dataset_id
+
+        # Getting the resource URLs from the selected fields or, if the portal ignores the field list, from the full package
+        resource_urls = metadata.get("res_url", []) if "resources" not in metadata else [resource["url"] for resource in metadata["resources"]]
+
+        # Getting the number of resources, counting the resource URLs if the portal doesn't return it (it is indexed, but not necessarily stored by Solr)
+        number_of_resources = metadata.get("num_resources", len(resource_urls))
+
+        return PortalItem(dataset_id, metadata.get("metadata_modified"), [{"dataset_url": resource_url, "metadata_url": metadata_url, "source_url": source_url} for resource_url in resource_urls], number_of_resources)
+
+    def build_api_request_url(self, position: int, rows: int) -> str:
+        api_request_url = remove_double_slashes(self.api_base_url + "/api/3/action/package_search?" + "rows=" + str(rows) + "&start=" + str(position))
+
+        # Only requesting the packages modified since the high-water mark (Solr needs a UTC timestamp ending with "Z"), sorted by their modification so that the pagination stays stable
+        if self.high_water_mark is not None:
+            api_request_url += "&fq=" + quote("metadata_modified:[" + self.high_water_mark.rstrip("Z") + "Z TO *]") + "&sort=" + quote("metadata_modified asc, id asc")
+        # Sorting the packages by their ID if the pages are fetched concurrently, so that modified packages don't move between the pages
+        elif self.parallel_requests > 1:
+            api_request_url += "&sort=" + quote("id asc")
+
+        # Only requesting the package ID, the number of resources, the modification and the resource URLs (as indexed by Solr) instead of the full packages
+        if self.field_projection:
+            api_request_url += "&fl=" + quote("id,num_resources,metadata_modified,res_url")
+
+        return api_request_url
+
+    def fetch_page(self, position: int, rows: int) -> dict:
+        # Creating a dictionary for the values of the response besides the packages, e.g. the total number of datasets
+        response_values = {}
+
+        # Remembering whether the page is requested with the selected fields, which may be switched off by another page in the meantime
+        field_projection = self.field_projection
+
+        request_start = monotonic()
+        with http_client.get(self.build_api_request_url(position, rows), stream = True) as response:
+            # The portal rejects the field list, requesting the full packages instead
+            if response.status_code in (400, 409) and field_projection:
+                print("Requesting selected fields is not supported, requesting the full packages")
+                self.field_projection = False
+                return {"parameters_changed": True}
+
+            # Raising an exception for any other failed request, which is repeated by the crawl driver
+            response.raise_for_status()
+
+            # Parsing the packages one by one while the response is streamed, keeping only the compact item of each package and noting whether the number of resources is missing
+            items = []
+            number_of_resources_missing = False
+            for package in iter_json_array(response, ("result", "results"), response_values):
+                number_of_resources_missing = number_of_resources_missing or "num_resources" not in package
+                items.append(self.get_item(package))
+            response_bytes = response.raw.tell()
+
+        # The portal doesn't return the number of resources or a resource URL for every resource with the selected fields, so that the resource URLs cannot be checked, requesting the full packages instead
+        if field_projection and (number_of_resources_missing or any(len(item.datasets) != item.count for item in items)):
+            print("The selected fields don't contain all resource URLs, requesting the full packages")
+            self.field_projection = False
+            return {"parameters_changed": True}
+
+        return {"parameters_changed": False, "items": items, "total": response_values["count"], "seconds": monotonic() - request_start, "bytes": response_bytes}
+
+
+class SocrataAdapter(PortalAdapter):
+    """An adapter for the Socrata API, which is paged by page numbers, reports no total number of datasets and cannot filter by modification.
+    """
+
+    api = "socrata"
+    api_software = "Socrata"
+    description = "Socrata"
+
+    # Socrata pagination starts with 1
+    first_position = 1
+
+    # The page size is fixed, because the pagination counts pages instead of datasets
+    datasets_per_request = 800
+
+    filters_by_modification = False
+
+    @staticmethod
+    def is_supported(api_software: str, api_version: str) -> bool:
+        return api_software == "Socrata"
+
+    @staticmethod
+    def parse_modification(modification):
+        # The modifications are Unix timestamps
+        return int(modification)
+
+    def get_item(self, metadata: dict) -> PortalItem:
+        # Getting the dataset ID and asset type
+        dataset_id = metadata["id"]
+        asset_type = metadata["assetType"]
+
+        # Getting the dataset URL if the asset type is supported, otherwise skipping the dataset
+        if asset_type == "dataset":
+            dataset_url = remove_double_slashes(self.api_base_url + "/api/views/") + dataset_id + "/rows.csv?accessType=DOWNLOAD"
+        # After TESTING if the asset types "chart", "datalens", "filter" also always work with the method above, replace the if-statement above with ---> if asset_type == "dataset" or asset_type == "chart" or asset_type == "datalens" or asset_type == "filter": <---
+        elif asset_type == "file":
+            dataset_url = remove_double_slashes(self.api_base_url + "/download/") + dataset_id
+        else:
+            return PortalItem(dataset_id, None, [], 0)
+
+        # Building the metadata URL
+        metadata_url = remove_double_slashes(self.api_base_url + "/api/views/metadata/v1/") + dataset_id
+
+        # Building the source URL
+        source_url = remove_double_slashes(self.api_base_url + "/d/") + dataset_id
+
+        # Getting the newest modification of the dataset's data or metadata
+        modification = max(metadata.get("rowsUpdatedAt") or 0, metadata.get("viewLastModified") or 0)
+
+        return PortalItem(dataset_id, modification, [{"dataset_url": dataset_url, "metadata_url": metadata_url, "source_url": source_url}], 1)
+
+    def build_api_request_url(self, position: int, rows: int) -> str:
+        return remove_double_slashes(self.api_base_url + "/api/views") + "?limit=" + str(rows) + "&page=" + str(position)
+
+    def fetch_page(self, position: int, rows: int) -> dict:
+        # Making the API request and deserializing the JSON response string
+        request_start = monotonic()
+        response = http_client.get(self.build_api_request_url(position, rows))
+        metadata = json.loads(response.text)
+
+        return {"parameters_changed": False, "items": [self.get_item(view) for view in metadata], "total": None, "seconds": monotonic() - request_start, "bytes": len(response.content)}
+
+    def next_position(self, position: int, number_of_items: int) -> int:
+        # Increasing the number of the page to be requested
+        return position + 1
+
+    def parse_api_request_url(self, api_request_url: str) -> tuple:
+        # Page-based pagination: "page" and "limit" parameters
+        parameters = parse_qs(urlsplit(api_request_url).query)
+        return int(parameters.get("page", [self.first_position])[0]), int(parameters.get("limit", [self.datasets_per_request])[0])
+
+
+def get_supported_portal_urls(adapter_class, portal_list) -> list:
+    """Getting the portals on the portal list that have a working API and are crawled with an adapter.
+
+    Args:
+        adapter_class (type): the adapter of the portal software - must be a subclass of "PortalAdapter"
+        portal_list (pd.DataFrame): the final portal list - must be a file created previously by "extract_working_apis()" in the portal handler
+
+    Returns:
+        list: the API base URLs of the portals in the order of the portal list
+    """
+
+    api_base_urls = []
+    for i in range(len(portal_list)):
+        if (portal_list["api_working"][i] == True) and adapter_class.is_supported(portal_list["api_software"][i], portal_list["api_version"][i]):
+            api_base_urls.append(portal_list["url"][i])
+
+    return api_base_urls
+
+
+# Creating a dictionary of the adapters of all supported APIs {API key: adapter class}
+portal_adapters = {adapter.api: adapter for adapter in [OpendatasoftV1Adapter, OpendatasoftV2Adapter, CkanAdapter, SocrataAdapter]}
@@ -1,26 +1,40 @@
 # Loading required packages
-import os
-import json
-import requests
+import argparse
 import pandas as pd
-from re import search
 from time import sleep
-from statistics import mean
 from datetime import datetime
 from dotenv import dotenv_values
-from helpers import check_protocol, remove_double_slashes
+from helpers import append_to_csv
 from archiver_connector import ArchiverConnector
+from archiver_cache import ArchiverCache
+from crawl_engine import crawl_concurrently, crawl_leased_portals, get_portal_sizes
+from log_writer import flush_log_writers
+from run_store import RunStore
+from page_sizer import AdaptivePageSize
+from page_prefetcher import PagePrefetcher
+from ingest_pipeline import IngestPipeline
+from portal_probe import probe_portal, get_portal_fingerprints, is_unchanged
+from portal_adapters import portal_adapters, get_supported_portal_urls, OpendatasoftV1Adapter, OpendatasoftV2Adapter, CkanAdapter, SocrataAdapter
+from circuit_breaker import CircuitOpenError, circuit_breaker
+from retry_queue import RetryQueue
+from work_queue import WorkQueue, SqliteWorkQueue, get_worker_id
 
 # Loading environment variables
 config = dotenv_values("../.env")
 
-# Calling the Archiver connector
-archiver = ArchiverConnector(mode = "local")
-# archiver = ArchiverConnector(mode = "production")
-
 # Getting the project path
 project_path = config["PATH"]
 
+# Opening the database recording all crawl runs
+run_store = RunStore(project_path + "data_portal_tracker/data/crawl_runs.sqlite")
+
+# Opening the durable queue of the failed pages and datasets, which are retried by the retry worker
+retry_queue = RetryQueue(project_path + "data_portal_tracker/data/retry_queue.sqlite")
+
+# Calling the Archiver connector, using a local cache of the Archiver IDs that were confirmed in previous runs
+archiver = ArchiverConnector(mode = "local", cache = ArchiverCache(project_path + "data_portal_tracker/data/archiver_cache.sqlite"), run_store = run_store, retry_queue = retry_queue)
+# archiver = ArchiverConnector(mode = "production", cache = ArchiverCache(project_path + "data_portal_tracker/data/archiver_cache.sqlite"), verification = "sampled", run_store = run_store, retry_queue = retry_queue)
+
 # Loading the portal list
 portal_list = pd.read_csv(project_path + "data_portal_tracker/data/portals.csv")
 
@@ -28,232 +42,160 @@ portal_list = pd.read_csv(project_path + "data_portal_tracker/data/portals.csv")
 portal_list_test = pd.read_csv(project_path + "data_portal_tracker/data/portals_test_subset.csv")
 
 
-def crawl_opendatasoft_v1(portal_list: str, statistics_file: str):
-    """Crawling all portals on the list that support the Opendatasoft API v1.0, inserting all datasets and metadata of each portal into the Archiver and saving statistics.
+def crawl_portals(adapter_class, portal_list: str, statistics_file: str, max_workers: int = 8, max_workers_per_host: int = 1, resume: bool = False, incremental: bool = False, skip_unchanged: bool = False, parallel_requests: int = 1, archiver_workers: int = 4, work_queue: WorkQueue = None, job_id: int = None):
+    """Crawling all portals on the list that are supported by a portal adapter, inserting all datasets and metadata of each portal into the Archiver and saving statistics.
+
+    The adapter describes the API of the portal software (its pagination, the items on its pages and their URLs), while the retries, checkpoints, page sizes, concurrent requests, the Archiver workers and the statistics are handled here in the same way for all portal softwares.
 
     Args:
+        ``adapter_class (type):`` the adapter of the portal software - must be a subclass of "PortalAdapter" in the portal adapters, e.g. "CkanAdapter"
+
         ``portal_list (str):`` the path of the CSV input file containing the final portal list - must be a file created previously by "extract_working_apis()" in the portal handler
         
         ``statistics_file (str):`` the path of the CSV file to be created or extended, containing the statistics for the crawled portals
-    """
 
-    # Getting the current timestamp
-    current_timestamp = datetime.now().strftime("%Y-%m-%d_%H_%M_%S")
+        ``max_workers (int, optional):`` the maximum number of portals crawled at the same time - defaults to 8
 
-    # Creating a dataframe to log failed API requests
-    failed_api_requests = pd.DataFrame([(None, None, None, None, None, None)], columns = ["timestamp", "api_request_url", "dataset_url", "metadata_url", "source_url", "exception"])
-    failed_api_requests_filename = project_path + "data_portal_tracker/logs/crawl_opendatasoft_v1_" + current_timestamp + "_fail.csv"
+        ``max_workers_per_host (int, optional):`` the maximum number of portals crawled at the same time on the same host - defaults to 1
 
-    # Setting file paths for the log files to be created by handle_dataset()
-    log_file_success = project_path +  "data_portal_tracker/logs/handle_dataset_opendatasoft_v1_" + current_timestamp + "_success.csv"
-    log_file_fail = project_path + "data_portal_tracker/logs/handle_dataset_opendatasoft_v1_" + current_timestamp + "_fail.csv"
+        ``resume (bool, optional):`` whether the latest crawl run should be continued where it stopped if it was interrupted, skipping the portals that were already crawled - defaults to False
 
-    # Creating lists for the API base URLs and API method URLs
-    api_base_urls = []
-    api_method_urls = []
+        ``incremental (bool, optional):`` whether only the datasets modified since the previous crawl of each portal (its high-water mark) should be requested instead of all datasets - the portal statistics are only saved by complete crawls - defaults to False
 
-    # Creating a list of portals that use Opendatasoft v1.0 and have a working API
-    for i in range(len(portal_list)):
-        if ((portal_list["api_software"][i] == "OpenDataSoft") & ("v1.0" in portal_list["api_version"][i]) & (portal_list["api_working"][i] == True)):
-            api_base_url = portal_list["url"][i]
-            api_base_urls.append(api_base_url)
-            api_method_urls.append(api_base_url + "/api/datasets/1.0/search/?")
+        ``skip_unchanged (bool, optional):`` whether portals should be skipped if their fingerprint (number of datasets and newest modification, saved in the statistics file) didn't change since the previous crawl - defaults to False
 
-    # Printing information
-    print("Crawling portals supporting Opendatasoft v1.0")
+        ``parallel_requests (int, optional):`` the number of pages of a portal fetched at the same time once its total number of datasets is known, only used by the adapters whose pages can be fetched ahead (the pages are still handled in order, the rate limiter keeps the requests within the host's limits) - defaults to 1
 
-    # Looping through the Opendatasoft v1.0 portals
-    for i in range(len(api_method_urls)):
+        ``archiver_workers (int, optional):`` the number of threads inserting the datasets into the Archiver while the portals' pages are fetched, the crawls are blocked while their bounded queue is full - defaults to 4
 
-        # Creating a dataframe for the portal statistics
-        portal_statistics = pd.DataFrame([(None, None, None, None, None)], columns = ["url", "api_software", "number_of_datasets", "number_of_supported_datasets", "timestamp"])
+        ``work_queue (WorkQueue, optional):`` the work queue of a sharded crawl, from which the portals of the job are leased one at a time instead of crawling the whole portal list, so that the job can be crawled by workers on several nodes - defaults to None
 
-        # Setting the variable indicating if there are still unseen datasets on the portal
-        datasets_available = True
+        ``job_id (int, optional):`` the ID of the job in the work queue, created by the crawl coordinator - defaults to None
+    """
 
-        # Setting the number of datasets to be returned for each request
-        datasets_per_request = 800
+    # Getting the key of the API, e.g. "ckan"
+    api = adapter_class.api
 
-        # Setting the index of the first dataset to be returned
-        index_of_current_dataset = 0
+    # Continuing the latest crawl run if it was interrupted and should be resumed, otherwise recording the start of a new crawl run
+    run_id = run_store.get_unfinished_run(api) if resume else None
+    if run_id is None:
+        run_id = run_store.start_run(api)
 
-        # Resetting the number of datasets counted in the response to the current request
-        datasets_in_current_response = 0
+    # Getting the checkpoints of the portals crawled before the run was interrupted (empty for a new run)
+    checkpoints = run_store.get_checkpoints(run_id)
 
-        # Resetting dataset, metadata and source variables for error logging purposes
-        dataset_url = None
-        metadata_url = None
-        source_url = None
-        metadata = None
+    # Getting the high-water marks of the portals, i.e. the newest modification of their datasets seen by previous crawls
+    high_water_marks = run_store.get_high_water_marks(api)
 
-        # Setting the maximum number of attempts in case of an exception before skipping the portal
-        maximum_attempts = 3
+    # Getting the fingerprints and statistics of the portals saved by previous crawls
+    fingerprints = get_portal_fingerprints(statistics_file)
 
-        # Setting the number of the current attempt
-        attempt_number = 1
+    # Getting the current timestamp
+    current_timestamp = datetime.now().strftime("%Y-%m-%d_%H_%M_%S")
 
-        # Printing the portal
-        print("\n" + "Portal " + str(i+1) + "/" + str(len(api_method_urls)) + ": " + api_base_urls[i])
+    # Setting the file path for the failed API requests, which are exported from the run store at the end of the crawl
+    failed_api_requests_filename = project_path + "data_portal_tracker/logs/crawl_" + api + "_" + current_timestamp + "_fail.csv"
 
-        # Iterating over all datasets on the portal in batches of 800 until we run out of datasets
-        while datasets_available:
-            # Building the API request URL
-            api_request_url = remove_double_slashes(api_method_urls[i] + "rows=" + str(datasets_per_request) + "&start=" + str(index_of_current_dataset))
+    # Setting file paths for the log files exported from the run store at the end of the crawl and the report created by verify_deferred()
+    log_file_success = project_path +  "data_portal_tracker/logs/handle_dataset_" + api + "_" + current_timestamp + "_success.csv"
+    log_file_fail = project_path + "data_portal_tracker/logs/handle_dataset_" + api + "_" + current_timestamp + "_fail.csv"
+    log_file_verification = project_path + "data_portal_tracker/logs/handle_dataset_" + api + "_" + current_timestamp + "_verification.csv"
 
-            # Waiting before each request in order not to flood the API with requests
-            sleep(2)
-            
-            try:
-                # Making the API request and deserializing the JSON response string
-                response = json.loads(requests.get(api_request_url).text)
+    # Creating a list of the API base URLs of the portals that are supported by the adapter and have a working API (for a sharded crawl, the portals of the job, which were selected by the crawl coordinator)
+    if work_queue is not None:
+        job = work_queue.get_job(job_id)
+        if job is None or job["api"] != api:
+            raise ValueError("The work queue doesn't contain a job " + str(job_id) + " for " + api + ".")
+        api_base_urls = job["portal_urls"]
+    else:
+        api_base_urls = get_supported_portal_urls(adapter_class, portal_list)
 
-                # Getting the total number of datasets on the portal
-                total_number_of_datasets = response["nhits"]
+    # Creating a dictionary of the leases of the portals crawled by this worker {portal URL: lease} and the ID of the worker (only for a sharded crawl)
+    leases = {}
+    worker_id = get_worker_id()
 
-                # During the first iteration / request (so only once)
-                if(index_of_current_dataset == 0):
-                    # Printing the total number of datasets
-                    print("Total number of datasets: " + str(total_number_of_datasets))
+    # Printing information
+    print("Crawling portals supporting " + adapter_class.description)
 
-                    # Saving information to the statistics dataframe
-                    portal_statistics.loc[0, "url"] = api_base_urls[i]
-                    portal_statistics.loc[0, "api_software"] = "Opendatasoft"
-                    portal_statistics.loc[0, "number_of_datasets"] = int(total_number_of_datasets)
-                    portal_statistics.loc[0, "timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    # Defining the function that crawls a single portal and returns whether it was crawled without errors, so that multiple portals can be crawled concurrently
+    def crawl_portal(i: int) -> bool:
+        api_base_url = api_base_urls[i]
 
-                    # Export statistics to a CSV file
-                    portal_statistics.to_csv(statistics_file, mode = "a", index = False, header = not os.path.isfile(statistics_file))
+        # Getting the checkpoint of the portal and skipping it if it was completely crawled before the run was interrupted
+        checkpoint = checkpoints.get(api_base_url)
+        if checkpoint is not None and checkpoint["finished"]:
+            print("\n" + "Portal " + str(i+1) + "/" + str(len(api_base_urls)) + ": " + api_base_url + " was already crawled, skipping it")
+            return True
 
-                # Printing the current API request URL
-                print("\n" + "Currently crawling: " + api_request_url + "\n")
+        # Probing the portal's fingerprint (number of datasets and newest modification) and skipping the portal if it didn't change since the previous crawl (otherwise the fingerprint is taken from the crawl itself, saving the extra requests)
+        fingerprint = probe_portal(api, api_base_url) if skip_unchanged else None
+        if fingerprint is not None and is_unchanged(fingerprint, fingerprints.get(api_base_url)):
+            print("\n" + "Portal " + str(i+1) + "/" + str(len(api_base_urls)) + ": " + api_base_url + " didn't change since the previous crawl, skipping it")
 
-                # Extracting the metadata from the current response
-                metadata = response["datasets"]
-
-                # Counting the number of datasets in the metadata
-                datasets_in_current_response = len(metadata)
-                
-                # Iterating over all the metadata of the current response
-                for j in range(datasets_in_current_response):
-                    # Getting the ID of each dataset
-                    dataset_id = str(metadata[j]["datasetid"])
-
-                    # Building the metadata URL and dataset URL
-                    metadata_url = remove_double_slashes(api_base_urls[i] + "/api/datasets/1.0/") + dataset_id
-                    dataset_url = remove_double_slashes(api_base_urls[i] + "/api/records/1.0/download?dataset=") + dataset_id + "&format=csv"
-
-                    """
-                    # Optional: If the portal is the Opendatasoft data hub, building the URL of the original data source (= different site than the data hub) using the metadata.
-                    if (search("https://data.opendatasoft.com", api_base_urls[i])):
-                        # Starting from the second iteration, comparing the domain of the current and previous original source
-                        if j != 0:
-                            previous_domain = remove_double_slashes(metadata[j-1]["metas"]["source_domain_address"])
-                        else:
-                            previous_domain = None
-                        current_domain = remove_double_slashes(metadata[j]["metas"]["source_domain_address"])
-
-                        # Wait 2 seconds between two requests to the same portal
-                        if current_domain == previous_domain:
-                            sleep(2)
-                        
-                        # Checking the protocol, adding the protocol prefix and building the original source URL
-                        original_source_url = check_protocol(remove_double_slashes(metadata[j]["metas"]["source_domain_address"] + "/explore/dataset/") + metadata[j]["metas"]["source_dataset"], show_details = False)
-                    """
-                    
-                    # Building the source URL using the API base url
-                    source_url = remove_double_slashes(api_base_urls[i] + "/explore/dataset/") + dataset_id
-
-                    # Calling the Archiver connector to insert data into the Archiver
-                    archiver.handle_dataset(dataset_url, metadata_url, source_url, log_file_success, log_file_fail)
-
-                    # Printing dataset information
-                    print("Dataset " + str(j + 1 + index_of_current_dataset) + "/" + str(total_number_of_datasets))
-                    # print("Dataset URL: " + dataset_url)
-                    # print("Metadata URL: " + metadata_url)
-                    # print("Source URL: " + source_url + "\n")
-                
-                # Setting the index of the next dataset to be returned
-                index_of_current_dataset += datasets_in_current_response 
-
-                # Stopping the loop after this iteration if less than 800 datasets are returned (meaning that these are the last available datasets)
-                if datasets_in_current_response != datasets_per_request:
-                    datasets_available = False
+            # Saving the statistics of the previous crawl again, so that the portal keeps its statistics and fingerprint
+            previous_statistics = dict(fingerprints[api_base_url], timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            append_to_csv(pd.DataFrame([previous_statistics]), statistics_file)
+            run_store.start_portal(run_id, api_base_url, adapter_class.api_software)
+            run_store.finish_portal(run_id, api_base_url, previous_statistics)
+            run_store.save_checkpoint(run_id, api_base_url, finished = True)
+            return True
 
-                # Stopping the loop after this iteration if the index of the next requested dataset would exceed the index of the last available dataset
-                if index_of_current_dataset >= total_number_of_datasets:
-                    datasets_available = False
-            except Exception as exception:
-                # Saving the failed API requests to the dataframe, then saving them to a new CSV file or appending them to an existing one
-                failed_api_requests.loc[0, "timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                failed_api_requests.loc[0, "api_request_url"] = api_request_url
-                failed_api_requests.loc[0, "exception"] = repr(exception)
-                try:
-                    failed_api_requests.loc[0, "dataset_url"] = dataset_url
-                    failed_api_requests.loc[0, "metadata_url"] = metadata_url
-                    failed_api_requests.loc[0, "source_url"] = source_url
-                except NameError:
-                    pass
-                failed_api_requests.to_csv(failed_api_requests_filename, mode = "a", index = False, header = not os.path.isfile(failed_api_requests_filename))
-                print("An exception occurred!")
+        # Recording the start of the portal's crawl
+        run_store.start_portal(run_id, api_base_url, adapter_class.api_software)
 
-                # If the maximum number of attempts has been reached, skipping the portal 
-                if attempt_number == maximum_attempts:
-                    datasets_available = False
-                # Otherwise, increasing the number of attempts by 1
-                else:
-                    attempt_number += 1
-                    sleep(2)
+        # Getting the portal's high-water mark, which is raised to the newest modification seen during this crawl, and only requesting the datasets modified since then if the crawl is incremental
+        newest_modification = adapter_class.parse_modification(high_water_marks[api_base_url]) if api_base_url in high_water_marks else None
 
+        # Creating the adapter of the portal, which keeps its request parameters
+        adapter = adapter_class(api_base_url, newest_modification if incremental else None, parallel_requests)
 
-def crawl_opendatasoft_v2(portal_list: str, statistics_file: str):
-    """Crawling all portals on the list that support the Opendatasoft API v2.1, inserting all datasets and metadata of each portal into the Archiver and saving statistics.
+        # Setting the modification up to which the datasets are skipped if the API cannot filter by modification
+        skipped_modification = adapter.high_water_mark if not adapter.filters_by_modification else None
 
-    Args:
-        ``portal_list (str):`` the path of the CSV input file containing the final portal list - must be a file created previously by "extract_working_apis()" in the portal handler
-        
-        ``statistics_file (str):`` the path of the CSV file to be created or extended, containing the statistics for the crawled portals
-    """
-        
-    # Getting the current timestamp
-    current_timestamp = datetime.now().strftime("%Y-%m-%d_%H_%M_%S")
+        # Ignoring the checkpoint if the crawl of the portal cannot be continued after its last page
+        if not adapter.resumable:
+            checkpoint = None
 
-    # Creating a dataframe to log failed API requests
-    failed_api_requests = pd.DataFrame([(None, None, None, None, None, None)], columns = ["timestamp", "api_request_url", "dataset_url", "metadata_url", "source_url", "exception"])
-    failed_api_requests_filename = project_path + "data_portal_tracker/logs/crawl_opendatasoft_v2_" + current_timestamp + "_fail.csv"
+        # Creating a list collecting the newly added mappings whose verification is deferred to the end of the portal
+        deferred_verifications = []
 
-    # Setting file paths for the log files to be created by handle_dataset()
-    log_file_success = project_path +  "data_portal_tracker/logs/handle_dataset_opendatasoft_v2_" + current_timestamp + "_success.csv"
-    log_file_fail = project_path + "data_portal_tracker/logs/handle_dataset_opendatasoft_v2_" + current_timestamp + "_fail.csv"
+        # Creating the function called by the Archiver workers once all datasets of a page have been handled, recording the page in the run store and saving the checkpoint of the portal (so that an interrupted run continues with the next page)
+        def page_handled(api_request_url: str, number_of_datasets: int, position: int, counters: dict = None):
+            def on_done():
+                run_store.add_page(run_id, api_base_url, api_request_url, number_of_datasets)
+                run_store.save_checkpoint(run_id, api_base_url, position, counters)
 
-    # Creating lists for the API base URLs and API method URLs
-    api_base_urls = []
-    api_method_urls = []
+                # Saving the checkpoint to the work queue as well, so that another worker can continue after it if the lease expires
+                if api_base_url in leases:
+                    work_queue.save_checkpoint(leases[api_base_url]["item_id"], worker_id, {"position": position, "counters": counters})
+            return on_done
 
-    # Creating a list of portals that use Opendatasoft v2.1 and have a working API
-    for i in range(len(portal_list)):
-        if ((portal_list["api_software"][i] == "OpenDataSoft") & ("v2.1" in portal_list["api_version"][i]) & (portal_list["api_working"][i] == True)):
-            api_base_url = portal_list["url"][i]
-            api_base_urls.append(api_base_url)
-            api_method_urls.append(api_base_url + "/api/explore/v2.1")
+        # Creating a dataframe for the portal statistics
+        portal_statistics = pd.DataFrame([(None, None, None, None, None, None, None)], columns = ["url", "api_software", "number_of_datasets", adapter.statistics_column, "timestamp", "fingerprint_number_of_datasets", "fingerprint_newest_modification"])
 
-    # Printing information
-    print("Crawling portals supporting Opendatasoft v2.1")
+        # Setting the variable indicating if there are still unseen datasets on the portal
+        datasets_available = True
 
-    # Looping through the Opendatasoft v2.1 portals
-    for i in range(len(api_method_urls)):
+        # Creating the adaptive page size, which sets the number of datasets to be returned for each request, if the adapter's page size isn't fixed
+        page_size = AdaptivePageSize() if adapter.adaptive_page_size else None
 
-        # Creating a dataframe for the portal statistics
-        portal_statistics = pd.DataFrame([(None, None, None, None, None)], columns = ["url", "api_software", "number_of_datasets", "number_of_supported_datasets", "timestamp"])
+        # Setting the position of the first page to be requested (continuing after the checkpoint if the run is resumed)
+        position = checkpoint["position"] if checkpoint is not None else adapter.first_position
 
-        # Resetting dataset, metadata and source variables for error logging purposes
-        dataset_url = None
-        metadata_url = None
-        source_url = None
-        metadata = None
+        # Setting the variables counting the items and the datasets of the statistics column on the portal (continuing the counts of the checkpoint if the run is resumed)
+        counters = {"number_of_datasets": 0, adapter.statistics_column: 0}
+        if checkpoint is not None:
+            counters.update({key: checkpoint["counters"].get(key, 0) for key in counters})
+
+        # Resetting the total number of datasets reported by the API, which is known after the first successful request
+        total_number_of_datasets = None
+
+        # Setting the newest modification of the datasets seen during this crawl, which is used for the fingerprint if the portal wasn't probed
+        crawled_modification = None
+
+        # Resetting the last dataset for error logging purposes
+        dataset = {"dataset_url": None, "metadata_url": None, "source_url": None}
 
-        # Setting the variable counting the number of supported datasets on the portal
-        number_of_supported_datasets = 0
-        
         # Setting the maximum number of attempts in case of an exception before skipping the portal
         maximum_attempts = 3
 
@@ -263,488 +205,389 @@ def crawl_opendatasoft_v2(portal_list: str, statistics_file: str):
         # Setting the error variable
         error = False
 
-        # Setting the variable that indicates whether the portal's catalog has been downloaded
-        catalog_exported = False
-
-        # Printing the portal
-        print("\n" + "Portal " + str(i+1) + "/" + str(len(api_method_urls)) + ": " + api_base_urls[i])
-
-        # Looping as long as the catalog has not been downloaded
-        while not catalog_exported:
-            # Building the API request URL
-            api_request_url = remove_double_slashes(api_method_urls[i] + "/catalog/exports/json")
-
-            try:
-                # Making the API request and deserializing the JSON response string
-                metadata = json.loads(requests.get(api_request_url).text)
+        # Setting the variable indicating whether the portal was skipped because the circuit of its host was open
+        circuit_open = False
 
-                # Indicating successful export
-                catalog_exported = True
+        # Setting the variable indicating whether a failed crawl of the portal is given back to the work queue, which leases it again and continues after its checkpoint, instead of being pushed to the retry queue (only for a sharded crawl before the lease's last attempt)
+        leased_again = api_base_url in leases and leases[api_base_url]["attempts"] < work_queue.maximum_attempts
 
-                # Getting the total number of datasets on the portal
-                total_number_of_datasets = len(metadata)
+        # Setting the variable indicating whether the current page is the first page crawled on the portal
+        first_page = True
 
-                # Comment this step out if the optional code below is used!
-                number_of_supported_datasets = total_number_of_datasets
-
-                # Printing the catalog API export URL
-                print("\n" + "Currently crawling: " + api_request_url + "\n")
-                
-                # Iterating over all the metadata of the response
-                for j in range(len(metadata)):
-                    # Getting the ID of each dataset
-                    dataset_id = str(metadata[j]["dataset_id"])
-
-                    """
-                    # Optional: Checking the available export formats of the dataset
-
-                    # Waiting before each request in order not to flood the API with requests
-                    # sleep(1)
-
-                    dataset_formats_url = remove_double_slashes(api_base_urls[i] + "/api/explore/v2.1/catalog/datasets/") + dataset_id + "/exports"
-                    dataset_formats = json.loads(requests.get(dataset_formats_url).text)
-
-                    # Choosing CSV if available, else JSON (this list could be extended, check the URL above for options!)
-                    for link in dataset_formats["links"]:
-                        if "csv" in link.values():
-                            dataset_format = "csv"
-                            break
-                        elif "json" in link.values():
-                            dataset_format = "json"
-                            break
-
-                    # Increasing the number of supported datasets if the dataset is available in one of the specified formats, else skipping the dataset
-                    if dataset_format in ["csv", "json"]:
-                        number_of_supported_datasets += 1
-                    else:
-                        break
-                        
-                    # If the optional code is used:
-                        # Swap the used dataset_url line below (comment / uncomment)
-                        # Comment out the "number_of_supported_datasets = total_number_of_datasets" step above
-                    """
-
-                    # Building the metadata URL, dataset URL and source URL
-                    metadata_url = remove_double_slashes(api_base_urls[i] + "/api/explore/v2.1/catalog/datasets/") + dataset_id
-                    dataset_url = remove_double_slashes(api_base_urls[i] + "/api/explore/v2.1/catalog/datasets/") + dataset_id + "/exports/" + "csv"
-                    # dataset_url = remove_double_slashes(api_base_urls[i] + "/api/explore/v2.1/catalog/datasets/") + dataset_id + "/exports/" + dataset_format
-                    source_url = remove_double_slashes(api_base_urls[i] + "/explore/dataset/") + dataset_id
-
-                    # Calling the Archiver connector to insert data into the Archiver
-                    archiver.handle_dataset(dataset_url, metadata_url, source_url, log_file_success, log_file_fail)
-
-                    # Printing dataset information
-                    print("Dataset " + str(j + 1) + "/" + str(total_number_of_datasets))
-                    # print("Dataset URL: " + dataset_url)
-                    # print("Metadata URL: " + metadata_url)
-                    # print("Source URL: " + source_url + "\n")
-                
-            except Exception as exception:
-                # Saving the failed API requests to the dataframe, then saving them to a new CSV file or appending them to an existing one
-                failed_api_requests.loc[0, "timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                failed_api_requests.loc[0, "api_request_url"] = api_request_url
-                failed_api_requests.loc[0, "exception"] = repr(exception)
-                try:
-                    failed_api_requests.loc[0, "dataset_url"] = dataset_url
-                    failed_api_requests.loc[0, "metadata_url"] = metadata_url
-                    failed_api_requests.loc[0, "source_url"] = source_url
-                except NameError:
-                    pass
-                failed_api_requests.to_csv(failed_api_requests_filename, mode = "a", index = False, header = not os.path.isfile(failed_api_requests_filename))
-                print("An exception occurred!")
+        # Creating the prefetcher, which fetches the following pages concurrently once the total number of datasets is known
+        prefetcher = PagePrefetcher(adapter.fetch_page, parallel_requests) if adapter.prefetchable and parallel_requests > 1 else None
 
-                # If the maximum number of attempts has been reached, skipping the portal 
-                if attempt_number == maximum_attempts:
-                    catalog_exported = True
-                    error = True
-                # Otherwise, increasing the number of attempts by 1
-                else:
-                    attempt_number += 1
-                    sleep(2)
+        # Creating a set of the IDs of the items seen on the portal, so that items moving between the pages during the crawl are only handled once
+        seen_item_ids = set()
 
-        # Printing the number of (total/supported) datasets
-        print("\n" + "Total number of datasets on " + api_base_urls[i] + " : " + str(total_number_of_datasets))
-        print("Number of supported datasets on " + api_base_urls[i] + " : " + str(number_of_supported_datasets) + "\n")
+        # Creating a set of the IDs of the items whose datasets were already handed to the Archiver workers, so that a page failing midway (e.g. a broken stream) doesn't submit them again when it is requested again
+        submitted_item_ids = set()
 
-        # Saving information to the statistics dataframe
-        portal_statistics.loc[0, "url"] = api_base_urls[i]
-        portal_statistics.loc[0, "api_software"] = "Opendatasoft"
-        if error is False:
-            portal_statistics.loc[0, "number_of_datasets"] = int(total_number_of_datasets)
-            portal_statistics.loc[0, "number_of_supported_datasets"] = int(number_of_supported_datasets)
-        portal_statistics.loc[0, "timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        # Export statistics to a CSV file
-        portal_statistics.to_csv(statistics_file, mode = "a", index = False, header = not os.path.isfile(statistics_file))
-
-                
-def crawl_ckan(portal_list: str, statistics_file: str):
-    """Crawling all portals on the list that support the CKAN API v2.x, inserting all datasets (CKAN term: resources) and metadata of each portal into the Archiver and saving statistics.
-
-    Args:
-        ``portal_list (str):`` the path of the CSV input file containing the final portal list - must be a file created previously by "extract_working_apis()" in the portal handler
-        
-        ``statistics_file (str):`` the path of the CSV file to be created or extended, containing the statistics for the crawled portals
-    """
-
-    # Getting the current timestamp
-    current_timestamp = datetime.now().strftime("%Y-%m-%d_%H_%M_%S")
-
-    # Creating a dataframe to log failed API requests
-    failed_api_requests = pd.DataFrame([(None, None, None, None, None, None)], columns = ["timestamp", "api_request_url", "resource_url", "metadata_url", "source_url", "exception"])
-    failed_api_requests_filename = project_path + "data_portal_tracker/logs/crawl_ckan_" + current_timestamp + "_fail.csv"
-
-    # Setting file paths for the log files to be created by handle_dataset()
-    log_file_success = project_path +  "data_portal_tracker/logs/handle_dataset_ckan_" + current_timestamp + "_success.csv"
-    log_file_fail = project_path + "data_portal_tracker/logs/handle_dataset_ckan_" + current_timestamp + "_fail.csv"
-
-    # Creating lists for the API base URLs and API method URLs
-    api_base_urls = []
-    api_method_urls = []
+        # Printing the portal
+        print("\n" + "Portal " + str(i+1) + "/" + str(len(api_base_urls)) + ": " + api_base_url)
 
-    # Creating a list of portals that use CKAN and have a working API
-    for i in range(len(portal_list)):
-        if ((portal_list["api_software"][i] == "CKAN") & (portal_list["api_working"][i] == True)):
-            api_base_url = portal_list["url"][i]
-            api_base_urls.append(api_base_url)
-            api_method_urls.append(api_base_url + "/api/3/action/package_search?")
+        # Iterating over all datasets on the portal in pages until we run out of datasets
+        while datasets_available:
+            # Setting the number of datasets to be returned for the current request
+            datasets_per_request = page_size.size if page_size is not None else adapter.datasets_per_request
 
-    # Printing information
-    print("Crawling portals supporting CKAN")
-    print("On CKAN portals, one dataset/package can contain multiple resources.")
-    print('The term "resource" on CKAN portals is mostly equivalent to the term "dataset" used in this project.')
+            # Building the API request URL
+            api_request_url = adapter.build_api_request_url(position, datasets_per_request)
 
-    # Looping through the CKAN portals
-    for i in range(len(api_method_urls)):
+            try:
+                # Getting the page, which may already have been fetched ahead
+                page = prefetcher.get(position, datasets_per_request, total_number_of_datasets) if prefetcher is not None else adapter.fetch_page(position, datasets_per_request)
 
-        # Creating a dataframe for the portal statistics
-        portal_statistics = pd.DataFrame([(None, None, None, None, None)], columns = ["url", "api_software", "number_of_datasets", "number_of_resources", "timestamp"])
+                # The portal rejected the request parameters, which the adapter changed, requesting the page again
+                if page["parameters_changed"]:
+                    if prefetcher is not None:
+                        prefetcher.clear()
+                    continue
 
-        # Setting the variable indicating if there are still unseen datasets on the portal
-        datasets_available = True
+                # Getting the total number of datasets on the portal if the API reports it
+                total_number_of_datasets = page["total"]
 
-        # Setting the number of datasets to be returned for each request
-        datasets_per_request = 800
+                # During the first iteration / request (so only once), printing the total number of datasets
+                if first_page and total_number_of_datasets is not None:
+                    print("Total number of datasets: " + str(total_number_of_datasets))
 
-        # Setting the index of the first dataset to be returned
-        index_of_current_dataset = 0
+                # Printing the current API request URL
+                print("\n" + "Currently crawling: " + api_request_url + "\n")
 
-        # Resetting the number of datasets counted in the response to the current request
-        datasets_in_current_response = 0
+                # Setting the variables counting the items of the current page (added to the counters once the page has been handled completely, so that a failed page is counted again)
+                number_of_items = 0
+                page_counters = {key: 0 for key in counters}
+                page_item_ids = set()
 
-        # Setting the variables counting the total number of datasets and resources on the portal
-        total_number_of_datasets = 0
-        total_number_of_resources = 0
+                # Creating a list for the datasets of the current page
+                datasets_to_handle = []
 
-        # Resetting resource, metadata and source variables for error logging purposes
-        resource_url = None
-        metadata_url = None
-        source_url = None
-        metadata = None
+                # Iterating over all items of the current page (parsed one at a time if the response is streamed)
+                for item in page["items"]:
+                    number_of_items += 1
 
-        # Setting the maximum number of attempts in case of an exception before skipping the portal
-        maximum_attempts = 3
+                    # Skipping the item if it has already been seen on a previous page
+                    if item.id in seen_item_ids or item.id in page_item_ids:
+                        print("A dataset already handled on a previous page was skipped")
+                        continue
+                    page_item_ids.add(item.id)
 
-        # Setting the number of the current attempt
-        attempt_number = 1
+                    # Counting the item and its datasets
+                    page_counters["number_of_datasets"] += 1
+                    page_counters[adapter.statistics_column] += item.count
 
-        # Setting the error variable
-        error = False
+                    # Printing the current dataset number
+                    print("Dataset " + str(counters["number_of_datasets"] + page_counters["number_of_datasets"]) + ("/" + str(total_number_of_datasets) if total_number_of_datasets is not None else ""))
 
-        # Printing the portal
-        print("\n" + "Portal " + str(i+1) + "/" + str(len(api_method_urls)) + ": " + api_base_urls[i])
+                    # Raising the newest modification seen on the portal
+                    if item.modification is not None:
+                        newest_modification = item.modification if newest_modification is None else max(newest_modification, item.modification)
+                        crawled_modification = item.modification if crawled_modification is None else max(crawled_modification, item.modification)
 
-        # Iterating over all datasets on the portal in batches of 800 until we run out of datasets
-        while datasets_available:
-            # Building the API request URL
-            api_request_url = remove_double_slashes(api_method_urls[i] + "rows=" + str(datasets_per_request) + "&start=" + str(index_of_current_dataset))
+                    # Skipping the item if it wasn't modified since the high-water mark (if the API has no filter, unchanged items are only skipped instead of not being requested)
+                    if skipped_modification is not None and item.modification is not None and item.modification <= skipped_modification:
+                        continue
 
-            # Waiting before each request in order not to flood the API with requests
-            sleep(2)
-            
-            try:
-                # Making the API request and deserializing the JSON response string
-                response = json.loads(requests.get(api_request_url).text)
+                    # Skipping the datasets of the item if they were handed to the Archiver workers before a previous attempt of the page failed
+                    if item.id in submitted_item_ids:
+                        continue
 
-                # Getting the total number of datasets on the portal
-                total_number_of_datasets = response["result"]["count"]
+                    # Adding the datasets of the item to the batch that is handed to the Archiver connector
+                    datasets_to_handle.extend(item.datasets)
+                    if len(item.datasets) > 0:
+                        dataset = item.datasets[-1]
 
-                # During the first iteration / request (so only once)
-                if(index_of_current_dataset == 0):
-                    # Printing the total number of datasets
-                    print("Total number of datasets: " + str(total_number_of_datasets))
+                    # Handing the batch to the Archiver workers as soon as it is full
+                    if len(datasets_to_handle) >= archiver.batch_size:
+                        pipeline.submit(datasets_to_handle, sequence_key = api_base_url, deferred_verifications = deferred_verifications, run_id = run_id, portal_url = api_base_url, **adapter.handle_arguments)
+                        submitted_item_ids.update(page_item_ids)
+                        datasets_to_handle = []
 
-                # Printing the current API request URL
-                print("\n" + "Currently crawling: " + api_request_url)
+                # Adding the items of the current page to the seen items and the counters
+                seen_item_ids.update(page_item_ids)
+                for key in counters:
+                    counters[key] += page_counters[key]
 
-                # Extracting the metadata from the current response
-                metadata = response["result"]["results"]
+                # Setting the position of the next page to be requested
+                position = adapter.next_position(position, number_of_items)
 
-                # Counting the number of datasets in the metadata
-                datasets_in_current_response = len(metadata)
-                
-                # Iterating over all the metadata of the current response
-                for j in range(datasets_in_current_response):
+                # Handing the remaining datasets of the current page to the Archiver workers, which insert them into the Archiver with batched requests, recording the page and saving the checkpoint once all datasets of the page have been handled
+                pipeline.submit(datasets_to_handle, on_done = page_handled(api_request_url, number_of_items, position, dict(counters)), sequence_key = api_base_url, deferred_verifications = deferred_verifications, run_id = run_id, portal_url = api_base_url, **adapter.handle_arguments)
 
-                    # Printing the current dataset number
-                    print("\n" + "Dataset " + str(j + 1 + index_of_current_dataset) + "/" + str(total_number_of_datasets))
-
-                    # Getting and printing the number of resources
-                    number_of_resources = metadata[j]["num_resources"]
-                    print("Number of resources: " + str(number_of_resources) + "\n")
-
-                    # Adding the number to the total resource number
-                    total_number_of_resources += number_of_resources
-
-                    # Iterating over all of the resources of a dataset, if any
-                    if number_of_resources != 0:
-                        for k, resource in enumerate(metadata[j]["resources"]):
-                            # Getting the dataset ID
-                            dataset_id = metadata[j]["id"]
-
-                            # Getting the resource URL
-                            resource_url = resource["url"]
-
-                            # Building the metadata URL (we are using the metadata of the dataset/package!)
-                            metadata_url = remove_double_slashes(api_base_urls[i] + "/api/3/action/package_show?id=") + dataset_id
- 
-                            # Building the source URL (we are using the source of the dataset/package!)
-                            source_url = remove_double_slashes(api_base_urls[i] + "/dataset/") + dataset_id
-
-                            # Calling the Archiver connector to insert data into the Archiver
-                            archiver.handle_dataset(resource_url, metadata_url, source_url, log_file_success, log_file_fail)
-
-                            # Printing resource information
-                            print("Resource " + str(k + 1) + "/" + str(number_of_resources))
-                            # print("Resource URL: " + resource_url)
-                            # print("Metadata URL: " + metadata_url)
-                            # print("Source URL: " + source_url + "\n")
-                    
-                # Setting the index of the next dataset to be returned
-                index_of_current_dataset += datasets_in_current_response 
-
-                # Stopping the loop after this iteration if less than 800 datasets are returned (meaning that these are the last available datasets)
-                if datasets_in_current_response != datasets_per_request:
+                # Stopping the loop after this iteration if the page is the last page
+                if adapter.is_last_page(position, number_of_items, total_number_of_datasets):
                     datasets_available = False
 
-                # Stopping the loop after this iteration if the index of the next requested dataset would exceed the index of the last available dataset
-                if index_of_current_dataset >= total_number_of_datasets:
-                    datasets_available = False
+                # Adjusting the page size of the next request to the server's maximum page size, the response time and the response size (only after the first page if the pages are fetched ahead, so that they stay valid)
+                if page_size is not None and (prefetcher is None or first_page):
+                    page_size.update(datasets_per_request, number_of_items, page["seconds"], page["bytes"], not datasets_available)
+                first_page = False
+
+                # Releasing the page as soon as it has been handed off, so that only the queued datasets are held in memory
+                page = None
+                datasets_to_handle = None
             except Exception as exception:
-                # Saving the failed API requests to the dataframe, then saving them to a new CSV file or appending them to an existing one
-                failed_api_requests.loc[0, "timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                failed_api_requests.loc[0, "api_request_url"] = api_request_url
-                failed_api_requests.loc[0, "exception"] = repr(exception)
-                try:
-                    failed_api_requests.loc[0, "resource_url"] = resource_url
-                    failed_api_requests.loc[0, "metadata_url"] = metadata_url
-                    failed_api_requests.loc[0, "source_url"] = source_url
-                except NameError:
-                    pass
-                failed_api_requests.to_csv(failed_api_requests_filename, mode = "a", index = False, header = not os.path.isfile(failed_api_requests_filename))
+                # Saving the failed API request to the run store
+                run_store.add_failure(run_id, api_base_url, {"timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "api_request_url": api_request_url, "dataset_url": dataset["dataset_url"], "metadata_url": dataset["metadata_url"], "source_url": dataset["source_url"], "exception": repr(exception)})
                 print("An exception occurred!")
 
-                # If the maximum number of attempts has been reached, skipping the portal 
-                if attempt_number == maximum_attempts:
+                # If the circuit of the portal's host is open, skipping the portal right away instead of repeating the request and pushing the page to the retry queue (unless the portal is leased again), from which the rest of the portal is crawled later
+                if isinstance(exception, CircuitOpenError):
+                    if not leased_again:
+                        retry_queue.push("page", repr(exception), api = api, run_id = run_id, portal_url = api_base_url, api_request_url = api_request_url, position = position, rows = datasets_per_request, high_water_mark = adapter.high_water_mark, circuit_open = True)
+                    datasets_available = False
+                    error = True
+                    circuit_open = True
+                # If the maximum number of attempts has been reached, skipping the portal and pushing the page to the retry queue (unless the portal is leased again), from which the retry worker crawls the rest of the portal starting with this page
+                elif attempt_number == maximum_attempts:
+                    if not leased_again:
+                        retry_queue.push("page", repr(exception), api = api, run_id = run_id, portal_url = api_base_url, api_request_url = api_request_url, position = position, rows = datasets_per_request, high_water_mark = adapter.high_water_mark, circuit_open = False)
                     datasets_available = False
                     error = True
                 # Otherwise, increasing the number of attempts by 1
                 else:
                     attempt_number += 1
                     sleep(2)
-        
-        # Printing the total number of resources
-        print("\n" + "Total number of resources on " + api_base_urls[i] + " : " + str(total_number_of_resources) + "\n")
 
-        # Saving information to the statistics dataframe
-        portal_statistics.loc[0, "url"] = api_base_urls[i]
-        portal_statistics.loc[0, "api_software"] = "CKAN"
-        if error is False:
-            portal_statistics.loc[0, "number_of_datasets"] = int(total_number_of_datasets)
-            portal_statistics.loc[0, "number_of_resources"] = int(total_number_of_resources)
-        portal_statistics.loc[0, "timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # Stopping the threads fetching pages ahead
+        if prefetcher is not None:
+            prefetcher.close()
 
-        # Export statistics to a CSV file
-        portal_statistics.to_csv(statistics_file, mode = "a", index = False, header = not os.path.isfile(statistics_file))
+        # Getting the number of datasets on the portal, as reported by the API or as counted during the crawl
+        number_of_datasets = total_number_of_datasets if total_number_of_datasets is not None else counters["number_of_datasets"]
 
+        # Printing the number of datasets and the datasets of the statistics column
+        print("\n" + "Total number of datasets on " + api_base_url + " : " + str(number_of_datasets))
+        print(adapter.statistics_column.replace("_", " ").capitalize() + " on " + api_base_url + " : " + str(counters[adapter.statistics_column]) + "\n")
 
-def crawl_socrata(portal_list: str, statistics_file: str):
-    """Crawling all portals on the list that support the Socrata API, inserting all datasets and metadata of each portal into the Archiver and saving statistics.
+        # Waiting until the Archiver workers have handled all datasets of the portal, marking the portal as failed if handling a batch failed
+        ingestion_exception = pipeline.join(api_base_url)
+        if ingestion_exception is not None:
+            run_store.add_failure(run_id, api_base_url, {"timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "api_request_url": None, "dataset_url": None, "metadata_url": None, "source_url": None, "exception": repr(ingestion_exception)})
+            error = True
+
+        # Taking the fingerprint from the crawl if the portal wasn't probed, which is only possible if all datasets were seen, i.e. if the crawl is complete and didn't continue after a checkpoint (the modifications are formatted like the probed ones)
+        if fingerprint is None:
+            complete_crawl = adapter.high_water_mark is None and checkpoint is None
+            fingerprint = {"number_of_datasets": int(number_of_datasets) if complete_crawl else None, "newest_modification": str(crawled_modification) if complete_crawl and crawled_modification is not None else None}
+
+        # Saving information to the statistics dataframe (the counts and the fingerprint only if the portal was crawled without errors)
+        portal_statistics.loc[0, "url"] = api_base_url
+        portal_statistics.loc[0, "api_software"] = adapter.api_software
+        if error is False:
+            portal_statistics.loc[0, "number_of_datasets"] = int(number_of_datasets)
+            portal_statistics.loc[0, adapter.statistics_column] = int(counters[adapter.statistics_column])
+            portal_statistics.loc[0, "fingerprint_number_of_datasets"] = fingerprint["number_of_datasets"]
+            portal_statistics.loc[0, "fingerprint_newest_modification"] = fingerprint["newest_modification"]
+        portal_statistics.loc[0, "timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        # Export statistics to a CSV file (only for complete crawls, an incremental crawl only counts the modified datasets)
+        if adapter.high_water_mark is None:
+            append_to_csv(portal_statistics, statistics_file)
+
+        # Saving the newest modification as the portal's new high-water mark if the portal was crawled without errors
+        if error is False and newest_modification is not None:
+            run_store.save_high_water_mark(api, api_base_url, newest_modification, run_id)
+
+        # Verifying the mappings whose verification was deferred during the crawl of the portal
+        archiver.verify_deferred(deferred_verifications, log_file_verification)
+
+        # Recording the end of the portal's crawl and its statistics (a portal skipped because of an open circuit keeps the checkpoint of its last handled page, so that it can be continued)
+        run_store.finish_portal(run_id, api_base_url, portal_statistics.loc[0].to_dict())
+        if not circuit_open:
+            run_store.save_checkpoint(run_id, api_base_url, finished = True)
+
+        return not error
+
+    # Starting the Archiver workers, which insert the datasets put into their queue by the crawls of the portals
+    pipeline = IngestPipeline(archiver, archiver_workers)
+
+    # Crawling the portals concurrently, starting with the largest portals of the previous crawl
+    if work_queue is None:
+        crawl_concurrently(crawl_portal, api_base_urls, max_workers, max_workers_per_host, get_portal_sizes(statistics_file))
+    # For a sharded crawl, crawling the portals leased from the work queue until the whole job is finished (the limit per host is enforced by the work queue for all workers together)
+    else:
+        def crawl_leased_portal(lease: dict) -> bool:
+            # Continuing after the checkpoint saved by the worker that held the lease before (or by this worker during a failed attempt)
+            if lease["checkpoint"] is not None:
+                checkpoints[lease["url"]] = dict(lease["checkpoint"], finished = False)
+            leases[lease["url"]] = lease
+            return crawl_portal(api_base_urls.index(lease["url"]))
+
+        summary = crawl_leased_portals(crawl_leased_portal, work_queue, job_id, worker_id, max_workers)
+        print("\n" + "Job " + str(job_id) + " finished, " + worker_id + " crawled " + str(summary["done"]) + " portals (" + str(summary["failed"]) + " failed, " + str(summary["lost"]) + " taken over by other workers)")
+
+    # Crawling the portals skipped because the circuit of their host was open once more, continuing after their last handled page as soon as their circuits let probe requests through (portals that are skipped again stay in the retry queue for the retry worker)
+    skipped_portal_urls = list(dict.fromkeys(entry["portal_url"] for entry in retry_queue.pop("page", lambda entry: entry.get("run_id") == run_id and entry.get("circuit_open", False))))
+    if len(skipped_portal_urls) > 0:
+        print("\n" + "Retrying " + str(len(skipped_portal_urls)) + " portals skipped because the circuit of their host was open")
+        sleep(min(circuit_breaker.maximum_open_seconds, max(circuit_breaker.get_retry_seconds(url) for url in skipped_portal_urls)))
+        checkpoints.update(run_store.get_checkpoints(run_id))
+        crawl_concurrently(lambda j: crawl_portal(api_base_urls.index(skipped_portal_urls[j])), skipped_portal_urls, max_workers, max_workers_per_host)
+
+    # Handing the datasets skipped because the circuit of the Archiver was open to the Archiver workers again, as soon as the circuit lets probe requests through (in up to three rounds, since requests made while the circuit is half-open are skipped again - datasets that are still skipped stay in the retry queue for the retry worker)
+    for retry_round in range(3):
+        skipped_batches = retry_queue.pop("datasets", lambda entry: entry.get("run_id") == run_id and entry.get("circuit_open", False))
+        if len(skipped_batches) == 0:
+            break
+        print("\n" + "Retrying " + str(sum(len(entry["datasets"]) for entry in skipped_batches)) + " datasets skipped because the circuit of the Archiver was open")
+        sleep(min(circuit_breaker.maximum_open_seconds, circuit_breaker.get_retry_seconds(archiver.archiver_base_url)))
+        for entry in skipped_batches:
+            pipeline.submit(entry["datasets"], sequence_key = entry["portal_url"], run_id = run_id, portal_url = entry["portal_url"])
+        for portal_url in set(entry["portal_url"] for entry in skipped_batches):
+            pipeline.join(portal_url)
+
+    # Stopping the Archiver workers once they have handled all datasets in their queue
+    pipeline.close()
+
+    # Recording the end of the crawl run and exporting its datasets and failed API requests to CSV files
+    run_store.finish_run(run_id)
+    run_store.export_run_logs(run_id, log_file_success, log_file_fail, failed_api_requests_filename, dataset_column = adapter_class.dataset_column)
+
+    # Writing the remaining buffered log rows, so that the log files are complete when the crawl returns
+    flush_log_writers()
+
+
+def crawl_opendatasoft_v1(portal_list: str, statistics_file: str, max_workers: int = 8, max_workers_per_host: int = 1, resume: bool = False, incremental: bool = False, skip_unchanged: bool = False, parallel_requests: int = 1, archiver_workers: int = 4):
+    """Crawling all portals on the list that support the Opendatasoft API v1.0, inserting all datasets and metadata of each portal into the Archiver and saving statistics.
 
     Args:
         ``portal_list (str):`` the path of the CSV input file containing the final portal list - must be a file created previously by "extract_working_apis()" in the portal handler
         
         ``statistics_file (str):`` the path of the CSV file to be created or extended, containing the statistics for the crawled portals
-    """
 
-    # Getting the current timestamp
-    current_timestamp = datetime.now().strftime("%Y-%m-%d_%H_%M_%S")
+        ``max_workers (int, optional):`` the maximum number of portals crawled at the same time - defaults to 8
 
-    # Creating a dataframe to log failed API requests
-    failed_api_requests = pd.DataFrame([(None, None, None, None, None, None)], columns = ["timestamp", "api_request_url", "dataset_url", "metadata_url", "source_url", "exception"])
-    failed_api_requests_filename = project_path + "data_portal_tracker/logs/crawl_socrata_" + current_timestamp + "_fail.csv"
+        ``max_workers_per_host (int, optional):`` the maximum number of portals crawled at the same time on the same host - defaults to 1
 
-    # Setting file paths for the log files to be created by handle_dataset()
-    log_file_success = project_path +  "data_portal_tracker/logs/handle_dataset_socrata_" + current_timestamp + "_success.csv"
-    log_file_fail = project_path + "data_portal_tracker/logs/handle_dataset_socrata_" + current_timestamp + "_fail.csv"
+        ``resume (bool, optional):`` whether the latest crawl run should be continued where it stopped if it was interrupted, skipping the portals that were already crawled - defaults to False
 
-    # Creating lists for the API base URLs and API method URLs
-    api_base_urls = []
-    api_method_urls = []
+        ``incremental (bool, optional):`` whether only the datasets modified since the previous crawl of each portal (its high-water mark) should be requested instead of all datasets - the portal statistics are only saved by complete crawls - defaults to False
 
-    # Creating a list of portals that use Socrata and have a working API
-    for i in range(len(portal_list)):
-        if ((portal_list["api_software"][i] == "Socrata") & (portal_list["api_working"][i] == True)):
-            api_base_url = portal_list["url"][i]
-            api_base_urls.append(api_base_url)
-            api_method_urls.append(api_base_url + "/api/views")
+        ``skip_unchanged (bool, optional):`` whether portals should be skipped if their fingerprint (number of datasets and newest modification, saved in the statistics file) didn't change since the previous crawl - defaults to False
 
-    # Printing information
-    print("Crawling portals supporting Socrata")
+        ``parallel_requests (int, optional):`` the number of pages of a portal fetched at the same time once its total number of datasets is known (the pages are still handled in order, the rate limiter keeps the requests within the host's limits) - defaults to 1
 
-    # Looping through the Socrata portals
-    for i in range(len(api_method_urls)):
+        ``archiver_workers (int, optional):`` the number of threads inserting the datasets into the Archiver while the portals' pages are fetched, the crawls are blocked while their bounded queue is full - defaults to 4
+    """
 
-        # Creating a dataframe for the portal statistics
-        portal_statistics = pd.DataFrame([(None, None, None, None, None)], columns = ["url", "api_software", "number_of_datasets", "number_of_supported_datasets", "timestamp"])
+    # Crawling the portals with the shared crawl driver
+    crawl_portals(OpendatasoftV1Adapter, portal_list, statistics_file, max_workers, max_workers_per_host, resume, incremental, skip_unchanged, parallel_requests, archiver_workers)
 
-        # Setting the variable indicating if there are still unseen datasets on the portal
-        datasets_available = True
 
-        # Setting the number of datasets to be returned for each request
-        datasets_per_request = 800
+def crawl_opendatasoft_v2(portal_list: str, statistics_file: str, max_workers: int = 8, max_workers_per_host: int = 1, resume: bool = False, incremental: bool = False, skip_unchanged: bool = False, archiver_workers: int = 4):
+    """Crawling all portals on the list that support the Opendatasoft API v2.1, inserting all datasets and metadata of each portal into the Archiver and saving statistics.
 
-        # Setting the number of the first page to be requested (Socrata pagination starts with 1)
-        current_page = 1
+    Args:
+        ``portal_list (str):`` the path of the CSV input file containing the final portal list - must be a file created previously by "extract_working_apis()" in the portal handler
+        
+        ``statistics_file (str):`` the path of the CSV file to be created or extended, containing the statistics for the crawled portals
 
-        # Setting the variables counting the number of (total/supported) datasets on the portal
-        total_number_of_datasets = 0
-        number_of_supported_datasets = 0
+        ``max_workers (int, optional):`` the maximum number of portals crawled at the same time - defaults to 8
 
-        # Resetting the number of datasets counted in the response to the current request
-        datasets_in_current_response = 0
+        ``max_workers_per_host (int, optional):`` the maximum number of portals crawled at the same time on the same host - defaults to 1
 
-        # Resetting dataset, metadata and source variables for error logging purposes
-        dataset_url = None
-        metadata_url = None
-        source_url = None
-        metadata = None
+        ``resume (bool, optional):`` whether the latest crawl run should be continued where it stopped if it was interrupted, skipping the portals that were already crawled - defaults to False
 
-        # Setting the maximum number of attempts in case of an exception before skipping the portal
-        maximum_attempts = 3
+        ``incremental (bool, optional):`` whether only the datasets modified since the previous crawl of each portal (its high-water mark) should be requested instead of all datasets - the portal statistics are only saved by complete crawls - defaults to False
 
-        # Setting the number of the current attempt
-        attempt_number = 1
+        ``skip_unchanged (bool, optional):`` whether portals should be skipped if their fingerprint (number of datasets and newest modification, saved in the statistics file) didn't change since the previous crawl - defaults to False
 
-        # Setting the error variable
-        error = False
+        ``archiver_workers (int, optional):`` the number of threads inserting the datasets into the Archiver while the portals' pages are fetched, the crawls are blocked while their bounded queue is full - defaults to 4
+    """
 
-        # Printing the portal
-        print("\n" + "Portal " + str(i+1) + "/" + str(len(api_method_urls)) + ": " + api_base_urls[i])
+    # Crawling the portals with the shared crawl driver
+    crawl_portals(OpendatasoftV2Adapter, portal_list, statistics_file, max_workers, max_workers_per_host, resume, incremental, skip_unchanged, 1, archiver_workers)
 
-        # Iterating over all datasets on the portal in batches of 800 until we run out of datasets
-        while datasets_available:
-            # Building the API request URL
-            api_request_url = remove_double_slashes(api_method_urls[i] + "?limit=" + str(datasets_per_request) + "&page=" + str(current_page))
 
-            # Waiting before each request in order not to flood the API with requests
-            sleep(2)
+def crawl_ckan(portal_list: str, statistics_file: str, max_workers: int = 8, max_workers_per_host: int = 1, resume: bool = False, incremental: bool = False, skip_unchanged: bool = False, parallel_requests: int = 1, archiver_workers: int = 4):
+    """Crawling all portals on the list that support the CKAN API v2.x, inserting all datasets (CKAN term: resources) and metadata of each portal into the Archiver and saving statistics.
 
-            # Printing the current API request URL
-            print("\n" + "Currently crawling: " + api_request_url + "\n")
-            
-            try:
-                # Making the API request and deserializing the JSON response string
-                metadata = json.loads(requests.get(api_request_url).text)
+    Args:
+        ``portal_list (str):`` the path of the CSV input file containing the final portal list - must be a file created previously by "extract_working_apis()" in the portal handler
+        
+        ``statistics_file (str):`` the path of the CSV file to be created or extended, containing the statistics for the crawled portals
 
-                # Stopping the loop if a page after the first one is empty (no datasets are available anymore)
-                if current_page > 1 and metadata == []:
-                    datasets_available = False
-                    break
+        ``max_workers (int, optional):`` the maximum number of portals crawled at the same time - defaults to 8
 
-                # Counting the number of datasets in the metadata
-                datasets_in_current_response = len(metadata)
+        ``max_workers_per_host (int, optional):`` the maximum number of portals crawled at the same time on the same host - defaults to 1
 
-                # Iterating over all the metadata of the current response
-                for j in range(datasets_in_current_response):
+        ``resume (bool, optional):`` whether the latest crawl run should be continued where it stopped if it was interrupted, skipping the portals that were already crawled - defaults to False
 
-                    # Printing the current dataset number
-                    print("Dataset " + str(j + 1 + total_number_of_datasets))
-
-                    # Getting the dataset ID and asset type
-                    dataset_id = metadata[j]["id"]
-                    asset_type = metadata[j]["assetType"]
-
-                    # Getting the dataset URL if the asset type is supported, otherwise skipping the dataset
-                    if asset_type == "dataset":
-                        dataset_url = remove_double_slashes(api_method_urls[i] + "/") + dataset_id + "/rows.csv?accessType=DOWNLOAD"
-                    # After TESTING if the asset types "chart", "datalens", "filter" also always work with the method above, replace the if-statement above with ---> if asset_type == "dataset" or asset_type == "chart" or asset_type == "datalens" or asset_type == "filter": <---
-                    elif asset_type == "file":
-                        dataset_url = remove_double_slashes(api_base_urls[i] + "/download/") + dataset_id
-                    else:
-                        continue
+        ``incremental (bool, optional):`` whether only the datasets modified since the previous crawl of each portal (its high-water mark) should be requested instead of all datasets - the portal statistics are only saved by complete crawls - defaults to False
 
-                    # Increasing the number of supported datasets
-                    number_of_supported_datasets += 1
+        ``skip_unchanged (bool, optional):`` whether portals should be skipped if their fingerprint (number of datasets and newest modification, saved in the statistics file) didn't change since the previous crawl - defaults to False
 
-                    # Building the metadata URL
-                    metadata_url = remove_double_slashes(api_method_urls[i] + "/metadata/v1/") + dataset_id
+        ``parallel_requests (int, optional):`` the number of pages of a portal fetched at the same time once its total number of datasets is known (the pages are still handled in order, the rate limiter keeps the requests within the host's limits) - defaults to 1
 
-                    # Building the source URL
-                    source_url = remove_double_slashes(api_base_urls[i] + "/d/") + dataset_id
+        ``archiver_workers (int, optional):`` the number of threads inserting the datasets into the Archiver while the portals' pages are fetched, the crawls are blocked while their bounded queue is full - defaults to 4
+    """
 
-                    # Calling the Archiver connector to insert data into the Archiver
-                    archiver.handle_dataset(dataset_url, metadata_url, source_url, log_file_success, log_file_fail)
+    # Printing information
+    print("On CKAN portals, one dataset/package can contain multiple resources.")
+    print('The term "resource" on CKAN portals is mostly equivalent to the term "dataset" used in this project.')
 
-                    # Printing dataset information
-                    # print("Dataset URL: " + dataset_url)
-                    # print("Metadata URL: " + metadata_url)
-                    # print("Source URL: " + source_url + "\n")
-                    
-                # Increasing the number of the page to be requested
-                current_page += 1
+    # Crawling the portals with the shared crawl driver
+    crawl_portals(CkanAdapter, portal_list, statistics_file, max_workers, max_workers_per_host, resume, incremental, skip_unchanged, parallel_requests, archiver_workers)
 
-                # Adding the current datasets to the total dataset number
-                total_number_of_datasets += datasets_in_current_response 
 
-                # Stopping the loop after this iteration if less than 800 datasets are returned (meaning that these are the last available datasets)
-                if datasets_in_current_response != datasets_per_request:
-                    datasets_available = False
-            except Exception as exception:
-                # Saving the failed API requests to the dataframe, then saving them to a new CSV file or appending them to an existing one
-                failed_api_requests.loc[0, "timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                failed_api_requests.loc[0, "api_request_url"] = api_request_url
-                failed_api_requests.loc[0, "exception"] = repr(exception)
-                try:
-                    failed_api_requests.loc[0, "dataset_url"] = dataset_url
-                    failed_api_requests.loc[0, "metadata_url"] = metadata_url
-                    failed_api_requests.loc[0, "source_url"] = source_url
-                except NameError:
-                    pass
-                failed_api_requests.to_csv(failed_api_requests_filename, mode = "a", index = False, header = not os.path.isfile(failed_api_requests_filename))
-                print("An exception occurred!")
+def crawl_socrata(portal_list: str, statistics_file: str, max_workers: int = 8, max_workers_per_host: int = 1, resume: bool = False, incremental: bool = False, skip_unchanged: bool = False, archiver_workers: int = 4):
+    """Crawling all portals on the list that support the Socrata API, inserting all datasets and metadata of each portal into the Archiver and saving statistics.
 
-                # If the maximum number of attempts has been reached, skipping the portal 
-                if attempt_number == maximum_attempts:
-                    datasets_available = False
-                    error = True
-                # Otherwise, increasing the number of attempts by 1
-                else:
-                    attempt_number += 1
-                    sleep(2)
+    Args:
+        ``portal_list (str):`` the path of the CSV input file containing the final portal list - must be a file created previously by "extract_working_apis()" in the portal handler
         
-        # Printing the number of (total/supported) datasets
-        print("\n" + "Total number of datasets on " + api_base_urls[i] + " : " + str(total_number_of_datasets))
-        print("Number of supported datasets on " + api_base_urls[i] + " : " + str(number_of_supported_datasets) + "\n")
+        ``statistics_file (str):`` the path of the CSV file to be created or extended, containing the statistics for the crawled portals
 
-        # Saving information to the statistics dataframe
-        portal_statistics.loc[0, "url"] = api_base_urls[i]
-        portal_statistics.loc[0, "api_software"] = "Socrata"
-        if error is False:
-            portal_statistics.loc[0, "number_of_datasets"] = int(total_number_of_datasets)
-            portal_statistics.loc[0, "number_of_supported_datasets"] = int(number_of_supported_datasets)
-        portal_statistics.loc[0, "timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        ``max_workers (int, optional):`` the maximum number of portals crawled at the same time - defaults to 8
 
-        # Export statistics to a CSV file
-        portal_statistics.to_csv(statistics_file, mode = "a", index = False, header = not os.path.isfile(statistics_file))
+        ``max_workers_per_host (int, optional):`` the maximum number of portals crawled at the same time on the same host - defaults to 1
+
+        ``resume (bool, optional):`` whether the latest crawl run should be continued where it stopped if it was interrupted, skipping the portals that were already crawled - defaults to False
+
+        ``incremental (bool, optional):`` whether only the datasets modified since the previous crawl of each portal (its high-water mark) should be requested instead of all datasets - the portal statistics are only saved by complete crawls - defaults to False
+
+        ``skip_unchanged (bool, optional):`` whether portals should be skipped if their fingerprint (number of datasets and newest modification, saved in the statistics file) didn't change since the previous crawl - defaults to False
+
+        ``archiver_workers (int, optional):`` the number of threads inserting the datasets into the Archiver while the portals' pages are fetched, the crawls are blocked while their bounded queue is full - defaults to 4
+    """
 
+    # Crawling the portals with the shared crawl driver
+    crawl_portals(SocrataAdapter, portal_list, statistics_file, max_workers, max_workers_per_host, resume, incremental, skip_unchanged, 1, archiver_workers)
+
+
+# Running a crawl from the command line, e.g. "python3 portal_crawler.py ckan --resume" (from the script path)
+if __name__ == "__main__":
+    # Defining the command line arguments
+    parser = argparse.ArgumentParser(description = "Crawling all portals of an API on the portal list and inserting their datasets and metadata into the Archiver.")
+    parser.add_argument("api", choices = ["opendatasoft_v1", "opendatasoft_v2", "ckan", "socrata"], help = "the API of the portals to be crawled")
+    parser.add_argument("--resume", action = "store_true", help = "continue the latest crawl run of the API where it stopped if it was interrupted")
+    parser.add_argument("--incremental", action = "store_true", help = "only request the datasets modified since the previous crawl of each portal")
+    parser.add_argument("--skip-unchanged", action = "store_true", help = "skip the portals whose fingerprint didn't change since the previous crawl")
+    parser.add_argument("--test", action = "store_true", help = "crawl the test subset of the portal list")
+    parser.add_argument("--max-workers", type = int, default = 8, help = "the maximum number of portals crawled at the same time")
+    parser.add_argument("--max-workers-per-host", type = int, default = 1, help = "the maximum number of portals crawled at the same time on the same host")
+    parser.add_argument("--archiver-workers", type = int, default = 4, help = "the number of threads inserting the datasets into the Archiver")
+    parser.add_argument("--parallel-requests", type = int, default = 1, help = "the number of pages of a portal fetched at the same time (only opendatasoft_v1 and ckan, which report the total number of datasets)")
+    parser.add_argument("--job", type = int, help = "work on a sharded crawl job created by the crawl coordinator, leasing its portals from the work queue together with the workers on other nodes")
+    parser.add_argument("--work-queue", default = project_path + "data_portal_tracker/data/work_queue.sqlite", help = "the SQLite file of the work queue shared by the coordinator and the workers")
+    arguments = parser.parse_args()
+
+    # Fetching pages concurrently is only supported by the APIs whose pages can be fetched ahead, i.e. that report the total number of datasets
+    options = {}
+    if arguments.parallel_requests > 1:
+        if not portal_adapters[arguments.api].prefetchable:
+            parser.error("--parallel-requests is only supported for " + " and ".join(key for key, adapter in portal_adapters.items() if adapter.prefetchable))
+        options["parallel_requests"] = arguments.parallel_requests
+
+    # Choosing the crawl function and statistics file of the API (both Opendatasoft APIs share one statistics file)
+    crawl_functions = {"opendatasoft_v1": crawl_opendatasoft_v1, "opendatasoft_v2": crawl_opendatasoft_v2, "ckan": crawl_ckan, "socrata": crawl_socrata}
+    statistics_file = project_path + "data_portal_tracker/data/portal_statistics_" + arguments.api.split("_")[0] + ("_test" if arguments.test else "") + ".csv"
+
+    # Working on a sharded crawl job with the shared crawl driver
+    if arguments.job is not None:
+        crawl_portals(portal_adapters[arguments.api], None, statistics_file, arguments.max_workers, resume = arguments.resume, incremental = arguments.incremental, skip_unchanged = arguments.skip_unchanged, archiver_workers = arguments.archiver_workers, work_queue = SqliteWorkQueue(arguments.work_queue), job_id = arguments.job, **options)
+        raise SystemExit
+
+    # Crawling the portals
+    crawl_functions[arguments.api](portal_list_test if arguments.test else portal_list, statistics_file, arguments.max_workers, arguments.max_workers_per_host, resume = arguments.resume, incremental = arguments.incremental, skip_unchanged = arguments.skip_unchanged, archiver_workers = arguments.archiver_workers, **options)
@@ -1,11 +1,11 @@
 # Importing necessary packages
 import os
 import json
-import requests
 import datetime
 import pandas as pd
 from urllib.parse import urlparse
 from helpers import check_protocol
+from http_client import http_client
 from IPython.display import display
 
 
@@ -59,8 +59,8 @@ def create_list(search_results_file: str, output_file: str):
     list_1_url = "https://data.opendatasoft.com/api/explore/v2.1/catalog/datasets/open-data-sources@public/exports/json"
     list_2_url = "https://dataportals.org/api/data.json"
 
-    list_1_response = requests.get(list_1_url)
-    list_2_response = requests.get(list_2_url)
+    list_1_response = http_client.get(list_1_url)
+    list_2_response = http_client.get(list_2_url)
 
     list_1 = json.loads(list_1_response.content)
     list_2 = json.loads(list_2_response.content)
@@ -296,7 +296,7 @@ def validate_list(input_list: str, output_list: str, output_markers: str, input_
 
         # Requesting the site and retrieve its contents
         try:
-            response = requests.get(base_url, timeout = 15)
+            response = http_client.get(base_url, timeout = 15, maximum_retries = 0)
             contents = response.text
         # If the request fails / times out, skipping to the next portal
         except Exception as e:
@@ -354,14 +354,14 @@ def validate_list(input_list: str, output_list: str, output_markers: str, input_
                 
                 try:
                     api_url = base_url + "/api/3/action/package_search"
-                    response = requests.get(api_url, timeout = 15)
+                    response = http_client.get(api_url, timeout = 15, maximum_retries = 0)
                     if json.loads(response.text)["success"] == True:
                         print("CKAN API working")
                         prefixed_portals.loc[index, "api_working"] = True
                         # Checking the API version
                         try:
                             api_version_url = base_url + "/api/3/action/status_show" 
-                            response = requests.get(api_version_url, timeout = 15)
+                            response = http_client.get(api_version_url, timeout = 15, maximum_retries = 0)
                             ckan_version = json.loads(response.text)["result"]["ckan_version"]
                             prefixed_portals.loc[index, "api_version"] = ckan_version
                         except Exception as e:
@@ -376,7 +376,7 @@ def validate_list(input_list: str, output_list: str, output_markers: str, input_
             elif prefixed_portals.loc[index, "suspected_api"] == "Socrata":
                 try:
                     api_url = base_url + "/api/views/metadata/v1?method=help"
-                    response = requests.get(api_url, timeout = 15)
+                    response = http_client.get(api_url, timeout = 15, maximum_retries = 0)
                     if "id" in json.loads(response.text)["immutableFields"]:
                         print("Socrata API working")
                         prefixed_portals.loc[index, "api_working"] = True
@@ -395,7 +395,7 @@ def validate_list(input_list: str, output_list: str, output_markers: str, input_
                 # Check API v2.x
                 try:
                     api_url = base_url + "/api/explore/"
-                    response = requests.get(api_url, timeout = 15)
+                    response = http_client.get(api_url, timeout = 15, maximum_retries = 0)
                     opendatasoft_versions = json.loads(response.text)["versions"]
                     print("Opendatasoft API v2.x working")
                 except Exception as e:
@@ -405,7 +405,7 @@ def validate_list(input_list: str, output_list: str, output_markers: str, input_
                 # Check API v1.0
                 try:
                     api_url_old = base_url + "/api/datasets/1.0/search/?rows=1"
-                    response = requests.get(api_url_old, timeout = 15)
+                    response = http_client.get(api_url_old, timeout = 15, maximum_retries = 0)
                     # Trying to access a JSON key of a valid API response  
                     json.loads(response.text)["nhits"]
                     try:
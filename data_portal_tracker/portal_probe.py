@@ -0,0 +1,104 @@
+# Importing required libraries
+import json
+import pandas as pd
+from urllib.parse import quote
+from helpers import remove_double_slashes, read_latest_statistics
+from http_client import http_client
+
+
+def probe_portal(api: str, api_base_url: str, datasets_per_request: int = 800) -> dict:
+    """Requesting the fingerprint of a portal, i.e. its number of datasets and the newest modification of their data or metadata, with a single small API request
+
+    Args:
+        api (str): the API of the portal - must be "opendatasoft_v1", "opendatasoft_v2", "ckan" or "socrata"
+        api_base_url (str): the base URL of the portal
+        datasets_per_request (int, optional): the page size of the Socrata crawl, whose first page is used as the probe - defaults to 800
+
+    Returns:
+        dict: {"request_success" = whether the request was successful, \n
+            "number_of_datasets" = the number of datasets on the portal or None, \n
+            "newest_modification" = the newest modification of the portal's datasets as text or None, \n
+            "complete" = whether the fingerprint covers the whole portal, i.e. whether it can show that the portal didn't change, \n
+            "message" = success message or failure message with details about the error}
+    """
+
+    try:
+        # CKAN: the newest package (sorted by modification) and the total number of packages
+        if api == "ckan":
+            api_request_url = remove_double_slashes(api_base_url + "/api/3/action/package_search?") + "rows=1&sort=" + quote("metadata_modified desc")
+            result = json.loads(http_client.get(api_request_url).text)["result"]
+            newest_modification = result["results"][0]["metadata_modified"] if len(result["results"]) > 0 else None
+            return {"request_success": True, "number_of_datasets": int(result["count"]), "newest_modification": newest_modification, "complete": True, "message": "Success!"}
+
+        # Opendatasoft v1.0: the newest dataset by modification of its data and by processing of its metadata (sorted descending) and the total number of datasets, since the crawl treats both as a modification
+        if api == "opendatasoft_v1":
+            api_request_url = remove_double_slashes(api_base_url + "/api/datasets/1.0/search/?") + "rows=1&sort="
+            modifications = []
+            for field in ("modified", "metadata_processed"):
+                response = json.loads(http_client.get(api_request_url + field).text)
+                if len(response["datasets"]) > 0 and response["datasets"][0]["metas"].get(field) is not None:
+                    modifications.append(response["datasets"][0]["metas"][field])
+            newest_modification = max(modifications) if len(modifications) > 0 else None
+            return {"request_success": True, "number_of_datasets": int(response["nhits"]), "newest_modification": newest_modification, "complete": True, "message": "Success!"}
+
+        # Opendatasoft v2.1: the newest dataset by modification of its data and by processing of its metadata (sorted descending) and the total number of datasets, since the crawl treats both as a modification
+        if api == "opendatasoft_v2":
+            api_request_url = remove_double_slashes(api_base_url + "/api/explore/v2.1/catalog/datasets?") + "limit=1&order_by="
+            modifications = []
+            for field in ("modified", "metadata_processed"):
+                response = json.loads(http_client.get(api_request_url + quote(field + " desc")).text)
+                if len(response["results"]) > 0 and response["results"][0]["metas"]["default"].get(field) is not None:
+                    modifications.append(response["results"][0]["metas"]["default"][field])
+            newest_modification = max(modifications) if len(modifications) > 0 else None
+            return {"request_success": True, "number_of_datasets": int(response["total_count"]), "newest_modification": newest_modification, "complete": True, "message": "Success!"}
+
+        # Socrata: the first page of the crawl, which only covers the whole portal if it isn't full and the second page is empty, since the server may cap the page size (the API reports neither a total nor sorts by modification)
+        if api == "socrata":
+            api_request_url = remove_double_slashes(api_base_url + "/api/views") + "?limit=" + str(datasets_per_request) + "&page=1"
+            metadata = json.loads(http_client.get(api_request_url).text)
+            modifications = [max(view.get("rowsUpdatedAt") or 0, view.get("viewLastModified") or 0) for view in metadata]
+            newest_modification = str(max(modifications)) if len(modifications) > 0 else None
+            complete = len(metadata) < datasets_per_request
+            if complete and len(metadata) > 0:
+                complete = json.loads(http_client.get(api_request_url[:-len("&page=1")] + "&page=2").text) == []
+            return {"request_success": True, "number_of_datasets": len(metadata), "newest_modification": newest_modification, "complete": complete, "message": "Success!"}
+
+        return {"request_success": False, "number_of_datasets": None, "newest_modification": None, "complete": False, "message": "Unknown API: " + api}
+    # The request failed or the response doesn't contain the expected fields
+    except Exception as exception:
+        return {"request_success": False, "number_of_datasets": None, "newest_modification": None, "complete": False, "message": "Exception: " + str(exception)}
+
+
+def get_portal_fingerprints(statistics_file: str) -> dict:
+    """Reading the latest fingerprint and statistics of each portal from a statistics file written by a previous crawl
+
+    Args:
+        statistics_file (str): the path of a CSV file created by one of the crawl functions in the portal crawler
+
+    Returns:
+        dict: {portal URL: the latest statistics row with a fingerprint as a dictionary} - empty if the file doesn't exist yet or contains no fingerprints
+    """
+
+    # Reading the fingerprints as text, so that they can be compared with the probed values
+    return read_latest_statistics(statistics_file, ["fingerprint_number_of_datasets"], dtype = {"fingerprint_newest_modification": str})
+
+
+def is_unchanged(fingerprint: dict, previous_statistics: dict) -> bool:
+    """Checking if a probed fingerprint equals the fingerprint saved by the previous crawl of the portal
+
+    Args:
+        fingerprint (dict): the return value of probe_portal()
+        previous_statistics (dict): the portal's entry returned by get_portal_fingerprints() or None
+
+    Returns:
+        bool: whether the portal didn't change since the previous crawl
+    """
+
+    if previous_statistics is None or fingerprint["request_success"] == False or fingerprint["complete"] == False:
+        return False
+
+    # Comparing the newest modifications as text (missing values are read as NaN)
+    previous_modification = previous_statistics["fingerprint_newest_modification"]
+    previous_modification = None if pd.isna(previous_modification) else str(previous_modification)
+
+    return int(previous_statistics["fingerprint_number_of_datasets"]) == fingerprint["number_of_datasets"] and previous_modification == fingerprint["newest_modification"]
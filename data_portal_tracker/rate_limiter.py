@@ -0,0 +1,167 @@
+# Importing required libraries
+import os
+import json
+import threading
+from time import sleep, monotonic
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from url_helpers import get_host
+
+
+class HostRateLimiter:
+    """A class that limits the request rate per host with a token bucket and adapts it to the responses of each server.
+
+    The rate of a host is increased step by step while its responses are successful and halved when it responds with 429 or 503 or with a server error, in which case further requests to the host are paused according to the "Retry-After" header or an exponential backoff.
+    """
+
+    # Response codes that indicate that a server is overloaded or rate limiting our requests
+    throttling_response_codes = (429, 503)
+
+    # Response codes of server errors, after which the requests to the server are slowed down as well
+    server_error_response_codes = (500, 502, 504)
+
+    def __init__(self, default_limits: dict, host_limits: dict = None):
+        """Instantiating the class.
+
+        Args:
+            default_limits (dict): the limits used for every host without its own entry in "host_limits" - see "rate_limits.json" for the available keys
+            host_limits (dict, optional): {host: limits} overriding the default limits for individual hosts - defaults to None
+        """
+
+        self.default_limits = default_limits
+        self.host_limits = host_limits if host_limits is not None else {}
+
+        # Creating a dictionary for the state of each host and a lock that protects it
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config_file: str):
+        """Creating a rate limiter from a JSON configuration file.
+
+        Args:
+            config_file (str): the path of the JSON file containing the "default" limits and a "hosts" dictionary with per-host limits
+
+        Returns:
+            HostRateLimiter: the configured rate limiter
+        """
+
+        with open(config_file, "r", encoding = "utf-8") as file:
+            config = json.load(file)
+
+        return cls(config["default"], config.get("hosts", {}))
+
+    def get_limits(self, host: str) -> dict:
+        """Getting the limits of a host, i.e. the default limits updated with the host's own limits.
+
+        Args:
+            host (str): the host, e.g. "data.gv.at"
+
+        Returns:
+            dict: the limits of the host
+        """
+
+        limits = dict(self.default_limits)
+        limits.update(self.host_limits.get(host, {}))
+        return limits
+
+    def get_state(self, host: str) -> dict:
+        """Getting the current state of a host, creating it on the first request - must be called while holding the lock.
+
+        Args:
+            host (str): the host, e.g. "data.gv.at"
+
+        Returns:
+            dict: {"limits", "rate", "tokens", "updated", "blocked_until", "failures"}
+        """
+
+        if host not in self.hosts:
+            limits = self.get_limits(host)
+            self.hosts[host] = {"limits": limits, "rate": limits["requests_per_second"], "tokens": limits["burst"], "updated": monotonic(), "blocked_until": 0.0, "failures": 0}
+        return self.hosts[host]
+
+    def wait(self, url: str):
+        """Waiting until a request to the host of the URL is allowed. The token is reserved immediately, so concurrent callers queue up behind each other.
+
+        Args:
+            url (str): the URL to be requested
+        """
+
+        with self.lock:
+            state = self.get_state(get_host(url))
+            now = monotonic()
+
+            # Refilling the bucket according to the time passed since the last update
+            state["tokens"] = min(state["limits"]["burst"], state["tokens"] + (now - state["updated"]) * state["rate"])
+            state["updated"] = now
+
+            # Taking a token - a negative balance means that the caller has to wait until it is refilled
+            state["tokens"] -= 1
+            delay = max(0.0, -state["tokens"] / state["rate"], state["blocked_until"] - now)
+
+        if delay > 0:
+            sleep(delay)
+
+    def report(self, url: str, status_code: int = None, retry_after: float = None) -> float:
+        """Adapting the rate of a host to the outcome of a request.
+
+        Args:
+            url (str): the requested URL
+            status_code (int, optional): the response code or None if the request failed with an exception - defaults to None
+            retry_after (float, optional): the number of seconds the server asked us to wait - defaults to None
+
+        Returns:
+            float: the number of seconds the host is paused for (0 if the request was successful)
+        """
+
+        with self.lock:
+            state = self.get_state(get_host(url))
+            limits = state["limits"]
+
+            # The server is available: increasing the rate step by step up to the maximum
+            if status_code is not None and status_code not in self.throttling_response_codes and status_code not in self.server_error_response_codes:
+                state["failures"] = 0
+                state["rate"] = min(limits["maximum_requests_per_second"], state["rate"] + 0.1 * limits["requests_per_second"])
+                return 0.0
+
+            # The server is throttling, failing or not responding: halving the rate and pausing the host with an exponential backoff
+            state["failures"] += 1
+            state["rate"] = max(limits["minimum_requests_per_second"], state["rate"] / 2)
+            backoff = min(limits["maximum_backoff"], limits["initial_backoff"] * 2 ** (state["failures"] - 1))
+
+            # Honoring the "Retry-After" header if the server asked for a longer pause
+            if retry_after is not None:
+                backoff = max(backoff, min(retry_after, limits["maximum_backoff"]))
+
+            state["blocked_until"] = max(state["blocked_until"], monotonic() + backoff)
+            return backoff
+
+
+def parse_retry_after(retry_after: str) -> float:
+    """Converting the value of a "Retry-After" header into a number of seconds
+
+    Args:
+        retry_after (str): the header value - either a number of seconds or an HTTP date
+
+    Returns:
+        float: the number of seconds to wait or None if the header is missing or invalid
+    """
+
+    if retry_after is None:
+        return None
+
+    # The header contains a number of seconds
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+
+    # The header contains an HTTP date
+    try:
+        return max(0.0, (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds())
+    except Exception:
+        return None
+
+
+# Creating the rate limiter shared by all modules, using the limits in "rate_limits.json"
+rate_limiter = HostRateLimiter.from_config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "rate_limits.json"))
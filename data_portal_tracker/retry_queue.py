@@ -0,0 +1,289 @@
+# Importing required libraries
+import os
+import csv
+import json
+import sqlite3
+import threading
+from re import search
+from time import time
+from run_store import get_timestamp
+
+
+class RetryQueue:
+    """A class containing a durable queue (SQLite) of the work that failed during a crawl, e.g. the pages of a portal that couldn't be requested or the datasets that couldn't be inserted into the Archiver, so that it can be retried later instead of crawling whole portals again.
+
+    Each entry has a kind and the full context needed to retry it, e.g. {"kind": "page", "api": ..., "portal_url": ..., "api_request_url": ..., "position": ...} or {"kind": "datasets", "datasets": [...], "run_id": ..., "portal_url": ...}. Entries that fail again are retried with an exponential backoff and end up in the dead-letter state after a maximum number of attempts.
+    """
+
+    def __init__(self, database_file: str, maximum_attempts: int = 8, initial_backoff: float = 60, maximum_backoff: float = 6 * 60 * 60, claim_seconds: float = 15 * 60):
+        """Instantiating the class.
+
+        Args:
+            database_file (str): the path of the SQLite file to be created or reused
+            maximum_attempts (int, optional): the number of failed retries after which an entry is moved to the dead-letter state - defaults to 8
+            initial_backoff (float, optional): the number of seconds before the retry after the first failed attempt, which doubles with each further attempt - defaults to 60
+            maximum_backoff (float, optional): the maximum number of seconds between two attempts - defaults to 6 hours
+            claim_seconds (float, optional): the number of seconds a claimed entry is hidden from other workers, after which it is retried if its worker didn't report the outcome, e.g. because it was stopped - defaults to 15 minutes
+        """
+
+        self.maximum_attempts = maximum_attempts
+        self.initial_backoff = initial_backoff
+        self.maximum_backoff = maximum_backoff
+        self.claim_seconds = claim_seconds
+
+        # Opening the database, which is shared by all threads and protected by a lock
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(database_file, check_same_thread = False, timeout = 30)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+
+        # Creating the table and index if they don't exist yet
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (entry_id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, context TEXT NOT NULL, reason TEXT, state TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, next_attempt REAL NOT NULL, source TEXT, created TEXT NOT NULL, updated TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS entries_state_next_attempt ON entries (state, next_attempt);
+        """)
+        self.connection.commit()
+
+    def push(self, kind: str, reason: str, source: str = None, **context) -> int:
+        """Adding failed work to the queue, which can be retried right away.
+
+        Args:
+            kind (str): the kind of the work, e.g. "page" or "datasets"
+            reason (str): why the work failed, e.g. the message of the exception
+            source (str, optional): the log file the work was imported from - defaults to None
+            **context: everything needed to retry the work, e.g. "api", "portal_url", "api_request_url", "position", "datasets" or "run_id"
+
+        Returns:
+            int: the ID of the entry
+        """
+
+        timestamp = get_timestamp()
+
+        with self.lock, self.connection:
+            return self.connection.execute("INSERT INTO entries (kind, context, reason, next_attempt, source, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?)", (kind, json.dumps(context), reason, time(), source, timestamp, timestamp)).lastrowid
+
+    def pop(self, kind: str, condition = None) -> list:
+        """Removing the pending entries of a kind from the queue, e.g. to retry them during the same crawl run.
+
+        Args:
+            kind (str): the kind of the work, e.g. "page" or "datasets"
+            condition (function, optional): a function called with each entry, only the entries for which it returns True are removed - defaults to None (all pending entries of the kind)
+
+        Returns:
+            list: the removed entries in the order they were added - see get_entries() for details
+        """
+
+        with self.lock, self.connection:
+            removed = [entry for entry in self.select_entries("WHERE state = 'pending' AND kind = ?", (kind,)) if condition is None or condition(entry)]
+            self.connection.executemany("DELETE FROM entries WHERE entry_id = ?", [(entry["entry_id"],) for entry in removed])
+            return removed
+
+    def claim(self, limit: int = 100, kind: str = None) -> list:
+        """Claiming the pending entries that are due for a retry, hiding them from other workers until the outcome is reported with complete(), fail() or postpone().
+
+        Args:
+            limit (int, optional): the maximum number of claimed entries - defaults to 100
+            kind (str, optional): the kind of the claimed entries - defaults to None (all kinds)
+
+        Returns:
+            list: the claimed entries in the order they were added - see get_entries() for details
+        """
+
+        now = time()
+
+        with self.lock, self.connection:
+            claimed = self.select_entries("WHERE state = 'pending' AND next_attempt <= ?" + (" AND kind = ?" if kind is not None else "") + " ORDER BY entry_id LIMIT ?", (now,) + ((kind,) if kind is not None else ()) + (limit,))
+            self.connection.executemany("UPDATE entries SET next_attempt = ? WHERE entry_id = ?", [(now + self.claim_seconds, entry["entry_id"]) for entry in claimed])
+            return claimed
+
+    def complete(self, entry_id: int):
+        """Removing an entry that was retried successfully.
+
+        Args:
+            entry_id (int): the ID of the entry
+        """
+
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM entries WHERE entry_id = ?", (entry_id,))
+
+    def fail(self, entry_id: int, reason: str, **context) -> bool:
+        """Recording a failed retry of an entry, scheduling the next attempt with an exponential backoff or moving the entry to the dead-letter state once the maximum number of attempts has been reached.
+
+        Args:
+            entry_id (int): the ID of the entry
+            reason (str): why the retry failed
+            **context: values replacing those of the entry's context, e.g. the "datasets" that still failed
+
+        Returns:
+            bool: whether the entry was moved to the dead-letter state
+        """
+
+        with self.lock, self.connection:
+            row = self.connection.execute("SELECT context, attempts FROM entries WHERE entry_id = ?", (entry_id,)).fetchone()
+            if row is None:
+                return False
+
+            attempts = row[1] + 1
+            dead = attempts >= self.maximum_attempts
+            backoff = min(self.maximum_backoff, self.initial_backoff * 2 ** (attempts - 1))
+            self.connection.execute("UPDATE entries SET context = ?, reason = ?, state = ?, attempts = ?, next_attempt = ?, updated = ? WHERE entry_id = ?", (json.dumps(dict(json.loads(row[0]), **context)), reason, "dead" if dead else "pending", attempts, time() + backoff, get_timestamp(), entry_id))
+            return dead
+
+    def update(self, entry_id: int, **context):
+        """Saving the progress of an entry while it is retried, without counting an attempt, and extending its claim, so that a long retry isn't claimed by another worker.
+
+        Args:
+            entry_id (int): the ID of the entry
+            **context: values replacing those of the entry's context, e.g. the "position" of the next page of a portal
+        """
+
+        with self.lock, self.connection:
+            row = self.connection.execute("SELECT context FROM entries WHERE entry_id = ?", (entry_id,)).fetchone()
+            if row is not None:
+                self.connection.execute("UPDATE entries SET context = ?, next_attempt = ?, updated = ? WHERE entry_id = ?", (json.dumps(dict(json.loads(row[0]), **context)), time() + self.claim_seconds, get_timestamp(), entry_id))
+
+    def postpone(self, entry_id: int, seconds: float):
+        """Postponing the retry of an entry without counting an attempt, e.g. while the circuit of its host is open.
+
+        Args:
+            entry_id (int): the ID of the entry
+            seconds (float): the number of seconds until the entry is due again
+        """
+
+        with self.lock, self.connection:
+            self.connection.execute("UPDATE entries SET next_attempt = ?, updated = ? WHERE entry_id = ?", (time() + seconds, get_timestamp(), entry_id))
+
+    def revive(self, kind: str = None) -> int:
+        """Moving the entries in the dead-letter state back to the queue, e.g. after the cause of their failures was fixed.
+
+        Args:
+            kind (str, optional): the kind of the revived entries - defaults to None (all kinds)
+
+        Returns:
+            int: the number of revived entries
+        """
+
+        with self.lock, self.connection:
+            return self.connection.execute("UPDATE entries SET state = 'pending', attempts = 0, next_attempt = ?, updated = ? WHERE state = 'dead'" + (" AND kind = ?" if kind is not None else ""), (time(), get_timestamp()) + ((kind,) if kind is not None else ())).rowcount
+
+    def get_entries(self, state: str = "pending", kind: str = None) -> list:
+        """Getting the entries in a state without claiming them, e.g. the dead letters.
+
+        Args:
+            state (str, optional): the state of the entries - must be "pending" or "dead" - defaults to "pending"
+            kind (str, optional): the kind of the entries - defaults to None (all kinds)
+
+        Returns:
+            list: the entries in the order they were added as dictionaries of their context and the keys "entry_id", "kind", "reason", "attempts", "source" and "timestamp" (when they were added)
+        """
+
+        with self.lock:
+            return self.select_entries("WHERE state = ?" + (" AND kind = ?" if kind is not None else "") + " ORDER BY entry_id", (state,) + ((kind,) if kind is not None else ()))
+
+    def select_entries(self, condition: str, parameters: tuple) -> list:
+        """Selecting entries and converting them to dictionaries - must be called while holding the lock.
+
+        Args:
+            condition (str): the WHERE, ORDER BY and LIMIT clauses of the query
+            parameters (tuple): the parameters of the clauses
+
+        Returns:
+            list: the entries - see get_entries() for details
+        """
+
+        rows = self.connection.execute("SELECT entry_id, kind, context, reason, attempts, source, created FROM entries " + condition, parameters).fetchall()
+        return [dict(json.loads(context), entry_id = entry_id, kind = kind, reason = reason, attempts = attempts, source = source, timestamp = created) for entry_id, kind, context, reason, attempts, source, created in rows]
+
+    def get_seconds_until_due(self) -> float:
+        """Getting the number of seconds until the next pending entry is due for a retry.
+
+        Returns:
+            float: the number of seconds (0 if an entry is due already) or None if no entry is pending
+        """
+
+        with self.lock:
+            next_attempt = self.connection.execute("SELECT MIN(next_attempt) FROM entries WHERE state = 'pending'").fetchone()[0]
+
+        return None if next_attempt is None else max(0.0, next_attempt - time())
+
+    def count(self, state: str = "pending") -> int:
+        """Counting the entries in a state.
+
+        Args:
+            state (str, optional): the state of the entries - must be "pending" or "dead" - defaults to "pending"
+
+        Returns:
+            int: the number of entries
+        """
+
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM entries WHERE state = ?", (state,)).fetchone()[0]
+
+    def __len__(self) -> int:
+        return self.count("pending")
+
+    def import_fail_log(self, log_file: str, api: str = None) -> int:
+        """Importing a CSV file of failed API requests ("crawl_<API>_<timestamp>_fail.csv") or failed datasets ("handle_dataset_<API>_<timestamp>_fail.csv") written by the crawlers, so that its failures are retried. Each failed request or dataset is only imported once, a file that was already imported is skipped.
+
+        Args:
+            log_file (str): the path of the CSV file
+            api (str, optional): the API of the crawled portals, e.g. "ckan" - defaults to None (taken from the file name)
+
+        Returns:
+            int: the number of imported entries
+        """
+
+        source = os.path.basename(log_file)
+
+        # Getting the API from the file name
+        if api is None:
+            match = search(r"^(?:crawl|handle_dataset)_(.+)_\d{4}-\d{2}-\d{2}_\d{2}_\d{2}_\d{2}_fail\.csv$", source)
+            if match is None:
+                raise ValueError("The API of " + source + " could not be found in its file name, please pass it.")
+            api = match.group(1)
+
+        # Skipping the file if it was already imported
+        with self.lock:
+            if self.connection.execute("SELECT 1 FROM entries WHERE source = ? LIMIT 1", (source,)).fetchone() is not None:
+                print(source + " was already imported")
+                return 0
+
+        with open(log_file, newline = "", encoding = "utf-8") as file:
+            rows = list(csv.DictReader(file))
+
+        entries = {}
+        for row in rows:
+            # A failed API request is retried as a page (failures without an API request, e.g. of the Archiver workers, can't be retried)
+            if "api_request_url" in row:
+                if row["api_request_url"]:
+                    entries.setdefault(row["api_request_url"], ("page", row["exception"], {"api": api, "portal_url": get_portal_url(row["api_request_url"]), "api_request_url": row["api_request_url"]}))
+            # A failed dataset is retried on its own
+            elif row["dataset_url"] and row["metadata_url"]:
+                dataset = {"dataset_url": row["dataset_url"], "metadata_url": row["metadata_url"], "source_url": row["source_url"]}
+                entries.setdefault((row["dataset_url"], row["metadata_url"]), ("datasets", row["message"], {"api": api, "portal_url": get_portal_url(row["metadata_url"]), "datasets": [dataset]}))
+
+        for kind, reason, context in entries.values():
+            self.push(kind, reason, source = source, **context)
+
+        print("Imported " + str(len(entries)) + " failures from " + source)
+        return len(entries)
+
+    def close(self):
+        """Closing the database.
+        """
+
+        with self.lock:
+            self.connection.close()
+
+
+def get_portal_url(url: str) -> str:
+    """Getting the URL of the portal of an API request, metadata or dataset URL (the part before the API path, which starts with "/api/" for all supported portal softwares).
+
+    Args:
+        url (str): the URL
+
+    Returns:
+        str: the URL of the portal
+    """
+
+    return url.split("/api/")[0]
+
@@ -0,0 +1,219 @@
+# Loading required packages
+import argparse
+from time import sleep
+from datetime import datetime
+from dotenv import dotenv_values
+from archiver_connector import ArchiverConnector
+from archiver_cache import ArchiverCache
+from circuit_breaker import CircuitOpenError, circuit_breaker
+from log_writer import flush_log_writers
+from portal_adapters import portal_adapters
+from retry_queue import RetryQueue
+
+
+def resume_portal(entry: dict, archiver: ArchiverConnector, retry_queue: RetryQueue, log_file_success: str = None, log_file_fail: str = None) -> int:
+    """Resuming the crawl of a portal at a failed page: requesting the page and all following pages with the adapter of its portal software and inserting their datasets into the Archiver. Datasets that fail are pushed to the retry queue on their own.
+
+    The position of the next page is saved to the entry after each page, so that a retry after another failure continues there instead of at the failed page.
+
+    Args:
+        entry (dict): the entry of the page in the retry queue with the keys "api", "portal_url" and "api_request_url" and optionally "position", "rows" and "high_water_mark"
+        archiver (ArchiverConnector): the Archiver connector, which must not have a retry queue itself
+        retry_queue (RetryQueue): the retry queue
+        log_file_success (str, optional): the path of a log file logging successfully handled datasets - defaults to None (no log file)
+        log_file_fail (str, optional): the path of a log file logging datasets for which an exception occurred - defaults to None (no log file)
+
+    Returns:
+        int: the number of datasets on the crawled pages
+
+    Raises:
+        Exception: if requesting a page failed
+    """
+
+    # Creating the adapter of the portal with the request parameters of the failed request
+    adapter = portal_adapters[entry["api"]](entry["portal_url"], entry.get("high_water_mark"))
+
+    # Getting the position and page size of the failed page (pages imported from log files only have their API request URL)
+    if entry.get("position") is not None:
+        position, rows = entry["position"], entry.get("rows")
+    else:
+        position, rows = adapter.parse_api_request_url(entry["api_request_url"])
+
+    # Creating a set of the IDs of the items seen on the portal, so that items moving between the pages are only handled once
+    seen_item_ids = set()
+    number_of_datasets = 0
+
+    # Iterating over the pages until the last page of the portal
+    while True:
+        # Requesting the page
+        page = adapter.fetch_page(position, rows)
+
+        # The portal rejected the request parameters, which the adapter changed, requesting the page again (each fallback of the adapter is only used once, like in the crawl driver)
+        if page["parameters_changed"]:
+            continue
+
+        # Collecting the datasets of the items that weren't seen on a previous page
+        number_of_items = 0
+        datasets = []
+        for item in page["items"]:
+            number_of_items += 1
+            if item.id not in seen_item_ids:
+                seen_item_ids.add(item.id)
+                datasets.extend(item.datasets)
+
+        # Inserting the datasets of the page into the Archiver
+        results = archiver.handle_datasets(datasets, log_file_success, log_file_fail, portal_url = entry["portal_url"], **adapter.handle_arguments)
+        number_of_datasets += len(datasets)
+
+        # Pushing the failed datasets to the retry queue, one entry per fail reason
+        failed_datasets = {}
+        for dataset, result in zip(datasets, results):
+            if result["success"] == False:
+                failed_datasets.setdefault(result["message"], []).append(dataset)
+        for message, failed in failed_datasets.items():
+            retry_queue.push("datasets", message, datasets = failed, run_id = entry.get("run_id"), portal_url = entry["portal_url"], circuit_open = False)
+
+        print("Retried " + adapter.build_api_request_url(position, rows) + ": " + str(len(datasets)) + " datasets, " + str(sum(len(failed) for failed in failed_datasets.values())) + " failed")
+
+        # Stopping after the last page, otherwise saving the position of the next page to the entry
+        position = adapter.next_position(position, number_of_items)
+        if adapter.is_last_page(position, number_of_items, page["total"]):
+            return number_of_datasets
+        retry_queue.update(entry["entry_id"], position = position, rows = rows, api_request_url = adapter.build_api_request_url(position, rows))
+
+
+def drain_retry_queue(retry_queue: RetryQueue, archiver: ArchiverConnector, log_file_success: str = None, log_file_fail: str = None, follow: bool = False, batch_size: int = 100) -> dict:
+    """Retrying the entries of the retry queue that are due, until no entry is due any more. Entries that fail again are retried later with an exponential backoff or end up in the dead-letter state, entries whose host has an open circuit are postponed without counting an attempt.
+
+    Args:
+        retry_queue (RetryQueue): the retry queue
+        archiver (ArchiverConnector): the Archiver connector, which must not have a retry queue itself, so that the datasets failing again are not pushed twice
+        log_file_success (str, optional): the path of a log file logging successfully handled datasets - defaults to None (no log file)
+        log_file_fail (str, optional): the path of a log file logging datasets for which an exception occurred - defaults to None (no log file)
+        follow (bool, optional): whether the worker keeps waiting for entries that become due or are pushed by crawls instead of stopping - defaults to False
+        batch_size (int, optional): the maximum number of entries claimed at once, whose datasets are handed to the Archiver connector together - defaults to 100
+
+    Returns:
+        dict: {"completed" = the number of entries retried successfully, \n
+            "failed" = the number of entries that failed again and will be retried, \n
+            "dead" = the number of entries moved to the dead-letter state, \n
+            "postponed" = the number of entries postponed because the circuit of their host was open}
+    """
+
+    summary = {"completed": 0, "failed": 0, "dead": 0, "postponed": 0}
+
+    # Remembering the metadata IDs resolved during the retries, so that the metadata of multiple datasets is only resolved once
+    metadata_memo = {}
+
+    def record_failure(entry: dict, reason: str, **context):
+        # Scheduling the next attempt or moving the entry to the dead-letter state
+        if retry_queue.fail(entry["entry_id"], reason, **context):
+            summary["dead"] += 1
+            print("Moved entry " + str(entry["entry_id"]) + " (" + entry["kind"] + ") to the dead-letter state after " + str(entry["attempts"] + 1) + " attempts: " + reason)
+        else:
+            summary["failed"] += 1
+
+    while True:
+        entries = retry_queue.claim(batch_size)
+
+        # No entry is due: stopping or waiting for the next entry that becomes due
+        if len(entries) == 0:
+            if not follow:
+                break
+            seconds_until_due = retry_queue.get_seconds_until_due()
+            sleep(60 if seconds_until_due is None else min(60, max(1, seconds_until_due)))
+            continue
+
+        # Resuming the crawls of the portals at their failed pages one at a time
+        for entry in [entry for entry in entries if entry["kind"] == "page"]:
+            try:
+                resume_portal(entry, archiver, retry_queue, log_file_success, log_file_fail)
+                retry_queue.complete(entry["entry_id"])
+                summary["completed"] += 1
+            except CircuitOpenError as exception:
+                retry_queue.postpone(entry["entry_id"], max(retry_queue.initial_backoff, exception.retry_seconds))
+                summary["postponed"] += 1
+            except Exception as exception:
+                record_failure(entry, repr(exception))
+
+        # Retrying the datasets of all claimed entries together, unless the circuit of the Archiver is open
+        dataset_entries = [entry for entry in entries if entry["kind"] == "datasets"]
+        if len(dataset_entries) == 0:
+            continue
+
+        if circuit_breaker.is_open(archiver.archiver_base_url):
+            for entry in dataset_entries:
+                retry_queue.postpone(entry["entry_id"], max(retry_queue.initial_backoff, circuit_breaker.get_retry_seconds(archiver.archiver_base_url)))
+            summary["postponed"] += len(dataset_entries)
+            continue
+
+        datasets = [dataset for entry in dataset_entries for dataset in entry["datasets"]]
+        print("Retrying " + str(len(datasets)) + " datasets")
+        results = iter(archiver.handle_datasets(datasets, log_file_success, log_file_fail, metadata_memo = metadata_memo))
+        circuit_closed = circuit_breaker.is_closed(archiver.archiver_base_url)
+
+        for entry in dataset_entries:
+            # Keeping only the datasets of the entry that failed again
+            failed = [(dataset, result) for dataset, result in zip(entry["datasets"], results) if result["success"] == False]
+            if len(failed) == 0:
+                retry_queue.complete(entry["entry_id"])
+                summary["completed"] += 1
+            # The datasets most likely failed because the Archiver is unavailable
+            elif not circuit_closed:
+                retry_queue.postpone(entry["entry_id"], max(retry_queue.initial_backoff, circuit_breaker.get_retry_seconds(archiver.archiver_base_url)))
+                summary["postponed"] += 1
+            else:
+                record_failure(entry, failed[0][1]["message"], datasets = [dataset for dataset, result in failed])
+
+    return summary
+
+
+# Running the retry worker from the command line, e.g. "python3 retry_worker.py --import-fail-logs logs/crawl_ckan_2023-08-13_18_11_55_fail.csv" (from the script path)
+if __name__ == "__main__":
+    # Defining the command line arguments
+    parser = argparse.ArgumentParser(description = "Retrying the failed pages and datasets in the retry queue with an exponential backoff, until they succeed or end up in the dead-letter state.")
+    parser.add_argument("--import-fail-logs", nargs = "+", default = [], metavar = "LOG_FILE", help = "import the failures of crawl_*_fail.csv and handle_dataset_*_fail.csv log files into the retry queue first")
+    parser.add_argument("--revive-dead", action = "store_true", help = "move the entries in the dead-letter state back to the retry queue first")
+    parser.add_argument("--dead-letters", action = "store_true", help = "only print the entries in the dead-letter state")
+    parser.add_argument("--follow", action = "store_true", help = "keep waiting for entries that become due instead of stopping once no entry is due")
+    arguments = parser.parse_args()
+
+    # Loading environment variables
+    config = dotenv_values("../.env")
+
+    # Getting the project path
+    project_path = config["PATH"]
+
+    # Opening the retry queue shared with the portal crawler
+    retry_queue = RetryQueue(project_path + "data_portal_tracker/data/retry_queue.sqlite")
+
+    # Printing the dead letters
+    if arguments.dead_letters:
+        for entry in retry_queue.get_entries("dead"):
+            print(str(entry["entry_id"]) + " " + entry["kind"] + " " + entry["timestamp"] + " (" + str(entry["attempts"]) + " attempts): " + (entry["api_request_url"] if entry["kind"] == "page" else str(len(entry["datasets"])) + " datasets of " + str(entry.get("portal_url"))) + " - " + str(entry["reason"]))
+        raise SystemExit
+
+    # Importing the failures of the log files
+    for log_file in arguments.import_fail_logs:
+        retry_queue.import_fail_log(log_file)
+
+    # Reviving the dead letters
+    if arguments.revive_dead:
+        print("Revived " + str(retry_queue.revive()) + " entries in the dead-letter state")
+
+    # Calling the Archiver connector (without the retry queue, since the worker records the outcome of each entry itself)
+    archiver = ArchiverConnector(mode = "local", cache = ArchiverCache(project_path + "data_portal_tracker/data/archiver_cache.sqlite"))
+    # archiver = ArchiverConnector(mode = "production", cache = ArchiverCache(project_path + "data_portal_tracker/data/archiver_cache.sqlite"), verification = "sampled")
+
+    # Setting the paths of the log files of the retried datasets
+    current_timestamp = datetime.now().strftime("%Y-%m-%d_%H_%M_%S")
+    log_file_success = project_path + "data_portal_tracker/logs/retry_" + current_timestamp + "_success.csv"
+    log_file_fail = project_path + "data_portal_tracker/logs/retry_" + current_timestamp + "_fail.csv"
+
+    # Draining the retry queue
+    print(str(len(retry_queue)) + " entries in the retry queue, " + str(retry_queue.count("dead")) + " in the dead-letter state")
+    summary = drain_retry_queue(retry_queue, archiver, log_file_success, log_file_fail, arguments.follow)
+    flush_log_writers()
+
+    print("\n" + "Completed: " + str(summary["completed"]) + ", failed again: " + str(summary["failed"]) + ", dead letters: " + str(summary["dead"]) + ", postponed: " + str(summary["postponed"]))
+    print(str(len(retry_queue)) + " entries left in the retry queue, " + str(retry_queue.count("dead")) + " in the dead-letter state")
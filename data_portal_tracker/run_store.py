@@ -0,0 +1,355 @@
+# Importing required libraries
+import json
+import sqlite3
+import threading
+import pandas as pd
+from datetime import datetime
+
+
+class RunStore:
+    """A class containing an embedded database (SQLite) that records every crawl run: the crawled portals, the requested pages, the handled datasets and the failed API requests.
+
+    Pages, datasets and failures are buffered and written in batched transactions. The database can be queried across runs and exported to the CSV log files of earlier versions. It also keeps a checkpoint of the pagination of each portal, so that an interrupted run can be resumed, and the newest modification seen on each portal, so that later runs can only request changed datasets.
+    """
+
+    # The tables, whose rows are buffered before being written, and the statements inserting them
+    insert_statements = {
+        "pages": "INSERT INTO pages (run_id, portal_url, api_request_url, number_of_datasets, timestamp) VALUES (?, ?, ?, ?, ?)",
+        "datasets": "INSERT INTO datasets (run_id, portal_url, timestamp, dataset_url, metadata_url, source_url, dataset_id, metadata_id, dataset_added, metadata_added, mapping_added, success, message) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        "failures": "INSERT INTO failures (run_id, portal_url, timestamp, api_request_url, dataset_url, metadata_url, source_url, exception) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+    }
+
+    def __init__(self, database_file: str, batch_size: int = 1000):
+        """Instantiating the class.
+
+        Args:
+            database_file (str): the path of the SQLite file to be created or reused
+            batch_size (int, optional): the number of buffered rows after which they are written in one transaction - defaults to 1000
+        """
+
+        self.batch_size = batch_size
+
+        # Creating the buffers of the pages, datasets and failures
+        self.buffers = {table: [] for table in self.insert_statements}
+        self.buffered_rows = 0
+
+        # Opening the database, which is shared by all threads and protected by a lock
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(database_file, check_same_thread = False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+
+        # Creating the tables and indexes if they don't exist yet
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (run_id INTEGER PRIMARY KEY AUTOINCREMENT, api_software TEXT NOT NULL, started TEXT NOT NULL, finished TEXT);
+            CREATE TABLE IF NOT EXISTS portals (run_id INTEGER NOT NULL, url TEXT NOT NULL, api_software TEXT, started TEXT NOT NULL, finished TEXT, number_of_datasets INTEGER, number_of_supported_datasets INTEGER, number_of_resources INTEGER, PRIMARY KEY (run_id, url));
+            CREATE TABLE IF NOT EXISTS pages (run_id INTEGER NOT NULL, portal_url TEXT NOT NULL, api_request_url TEXT, number_of_datasets INTEGER, timestamp TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS datasets (run_id INTEGER NOT NULL, portal_url TEXT, timestamp TEXT NOT NULL, dataset_url TEXT, metadata_url TEXT, source_url TEXT, dataset_id TEXT, metadata_id TEXT, dataset_added INTEGER, metadata_added INTEGER, mapping_added INTEGER, success INTEGER NOT NULL, message TEXT);
+            CREATE TABLE IF NOT EXISTS failures (run_id INTEGER NOT NULL, portal_url TEXT NOT NULL, timestamp TEXT NOT NULL, api_request_url TEXT, dataset_url TEXT, metadata_url TEXT, source_url TEXT, exception TEXT);
+            CREATE TABLE IF NOT EXISTS high_water_marks (api_software TEXT NOT NULL, portal_url TEXT NOT NULL, mark TEXT NOT NULL, run_id INTEGER NOT NULL, updated TEXT NOT NULL, PRIMARY KEY (api_software, portal_url));
+            CREATE TABLE IF NOT EXISTS checkpoints (run_id INTEGER NOT NULL, portal_url TEXT NOT NULL, position INTEGER, counters TEXT, finished INTEGER NOT NULL DEFAULT 0, updated TEXT NOT NULL, PRIMARY KEY (run_id, portal_url));
+            CREATE INDEX IF NOT EXISTS portals_url ON portals (url, run_id);
+            CREATE INDEX IF NOT EXISTS pages_run_portal ON pages (run_id, portal_url);
+            CREATE INDEX IF NOT EXISTS datasets_run_portal ON datasets (run_id, portal_url, success);
+            CREATE INDEX IF NOT EXISTS datasets_dataset_url ON datasets (dataset_url);
+            CREATE INDEX IF NOT EXISTS failures_run_portal ON failures (run_id, portal_url);
+        """)
+        self.connection.commit()
+
+    def start_run(self, api_software: str) -> int:
+        """Recording the start of a crawl run.
+
+        Args:
+            api_software (str): the crawled API, e.g. "ckan" or "opendatasoft_v2"
+
+        Returns:
+            int: the ID of the run, which is passed to all other functions
+        """
+
+        with self.lock:
+            with self.connection:
+                return self.connection.execute("INSERT INTO runs (api_software, started) VALUES (?, ?)", (api_software, get_timestamp())).lastrowid
+
+    def finish_run(self, run_id: int):
+        """Recording the end of a crawl run and writing all buffered rows.
+
+        Args:
+            run_id (int): the ID of the run
+        """
+
+        with self.lock:
+            self.flush_buffers()
+            with self.connection:
+                self.connection.execute("UPDATE runs SET finished = ? WHERE run_id = ?", (get_timestamp(), run_id))
+
+    def start_portal(self, run_id: int, portal_url: str, api_software: str):
+        """Recording the start of the crawl of a portal. If the portal was already started in the same run (which is resumed), its start time is kept.
+
+        Args:
+            run_id (int): the ID of the run
+            portal_url (str): the URL of the portal
+            api_software (str): the API software of the portal, e.g. "CKAN"
+        """
+
+        with self.lock:
+            with self.connection:
+                self.connection.execute("INSERT OR IGNORE INTO portals (run_id, url, api_software, started) VALUES (?, ?, ?, ?)", (run_id, portal_url, api_software, get_timestamp()))
+
+    def finish_portal(self, run_id: int, portal_url: str, statistics: dict):
+        """Recording the end of the crawl of a portal and its statistics, and writing all buffered rows.
+
+        Args:
+            run_id (int): the ID of the run
+            portal_url (str): the URL of the portal
+            statistics (dict): the portal statistics with any of the keys "number_of_datasets", "number_of_supported_datasets" and "number_of_resources" - missing or empty values are saved as NULL
+        """
+
+        # Converting the statistics into integers, e.g. when they are taken from a statistics dataframe
+        numbers = [statistics.get(key) for key in ("number_of_datasets", "number_of_supported_datasets", "number_of_resources")]
+        numbers = [None if number is None or pd.isna(number) else int(number) for number in numbers]
+
+        with self.lock:
+            self.flush_buffers()
+            with self.connection:
+                self.connection.execute("UPDATE portals SET finished = ?, number_of_datasets = ?, number_of_supported_datasets = ?, number_of_resources = ? WHERE run_id = ? AND url = ?", (get_timestamp(), *numbers, run_id, portal_url))
+
+    def get_unfinished_run(self, api_software: str) -> int:
+        """Getting the latest run of an API if it was interrupted, i.e. it was started but not finished.
+
+        Args:
+            api_software (str): the crawled API, e.g. "ckan" or "opendatasoft_v2"
+
+        Returns:
+            int: the ID of the interrupted run or None if the latest run of the API was finished or there is no run yet
+        """
+
+        with self.lock:
+            row = self.connection.execute("SELECT run_id, finished FROM runs WHERE api_software = ? ORDER BY run_id DESC LIMIT 1", (api_software,)).fetchone()
+
+        return row[0] if row is not None and row[1] is None else None
+
+    def save_checkpoint(self, run_id: int, portal_url: str, position: int = None, counters: dict = None, finished: bool = False):
+        """Saving the progress of a portal's crawl. All buffered rows are written in the same transaction, so that the checkpoint never gets ahead of the recorded datasets.
+
+        Args:
+            run_id (int): the ID of the run
+            portal_url (str): the URL of the portal
+            position (int, optional): the position at which the crawl continues, e.g. the index of the next dataset or the number of the next page - defaults to None
+            counters (dict, optional): the counters needed to continue the portal's statistics, e.g. {"total_number_of_resources": 1234} - defaults to None
+            finished (bool, optional): whether the portal was completely crawled - defaults to False
+        """
+
+        with self.lock:
+            self.flush_buffers()
+            with self.connection:
+                self.connection.execute("INSERT OR REPLACE INTO checkpoints (run_id, portal_url, position, counters, finished, updated) VALUES (?, ?, ?, ?, ?, ?)", (run_id, portal_url, position, json.dumps(counters if counters is not None else {}), finished, get_timestamp()))
+
+    def get_checkpoints(self, run_id: int) -> dict:
+        """Getting the checkpoints of all portals of a run.
+
+        Args:
+            run_id (int): the ID of the run
+
+        Returns:
+            dict: {portal URL: {"position" = the position at which the crawl continues, "counters" = the saved counters, "finished" = whether the portal was completely crawled}}
+        """
+
+        with self.lock:
+            rows = self.connection.execute("SELECT portal_url, position, counters, finished FROM checkpoints WHERE run_id = ?", (run_id,)).fetchall()
+
+        return {portal_url: {"position": position, "counters": json.loads(counters), "finished": finished == 1} for portal_url, position, counters, finished in rows}
+
+    def get_high_water_marks(self, api_software: str) -> dict:
+        """Getting the high-water marks of all portals of an API, i.e. the newest modification timestamp of their datasets seen by previous runs.
+
+        Args:
+            api_software (str): the crawled API, e.g. "ckan" or "opendatasoft_v2"
+
+        Returns:
+            dict: {portal URL: high-water mark}
+        """
+
+        with self.lock:
+            return dict(self.connection.execute("SELECT portal_url, mark FROM high_water_marks WHERE api_software = ?", (api_software,)).fetchall())
+
+    def save_high_water_mark(self, api_software: str, portal_url: str, mark, run_id: int):
+        """Saving the high-water mark of a portal after it was crawled without errors.
+
+        Args:
+            api_software (str): the crawled API, e.g. "ckan" or "opendatasoft_v2"
+            portal_url (str): the URL of the portal
+            mark (str or int): the newest modification timestamp of the portal's datasets - saved as text
+            run_id (int): the ID of the run
+        """
+
+        with self.lock:
+            with self.connection:
+                self.connection.execute("INSERT OR REPLACE INTO high_water_marks (api_software, portal_url, mark, run_id, updated) VALUES (?, ?, ?, ?, ?)", (api_software, portal_url, str(mark), run_id, get_timestamp()))
+
+    def add_page(self, run_id: int, portal_url: str, api_request_url: str, number_of_datasets: int):
+        """Buffering a successfully crawled page of a portal.
+
+        Args:
+            run_id (int): the ID of the run
+            portal_url (str): the URL of the portal
+            api_request_url (str): the URL of the API request returning the page
+            number_of_datasets (int): the number of datasets on the page
+        """
+
+        self.add_rows("pages", [(run_id, portal_url, api_request_url, number_of_datasets, get_timestamp())])
+
+    def add_datasets(self, run_id: int, portal_url: str, datasets: list):
+        """Buffering the results of handled datasets.
+
+        Args:
+            run_id (int): the ID of the run
+            portal_url (str): the URL of the portal
+            datasets (list): the handled datasets as dictionaries with the keys "timestamp", "dataset_url", "metadata_url", "source_url", "success" and "message" and optionally "dataset_id", "metadata_id", "dataset_added", "metadata_added" and "mapping_added"
+        """
+
+        rows = []
+        for dataset in datasets:
+            dataset_id = dataset.get("dataset_id")
+            metadata_id = dataset.get("metadata_id")
+            rows.append((run_id, portal_url, dataset["timestamp"], dataset["dataset_url"], dataset["metadata_url"], dataset["source_url"], None if dataset_id is None else str(dataset_id), None if metadata_id is None else str(metadata_id), dataset.get("dataset_added", False), dataset.get("metadata_added", False), dataset.get("mapping_added", False), dataset["success"], dataset["message"]))
+
+        self.add_rows("datasets", rows)
+
+    def add_failure(self, run_id: int, portal_url: str, failure: dict):
+        """Buffering a failed API request.
+
+        Args:
+            run_id (int): the ID of the run
+            portal_url (str): the URL of the portal
+            failure (dict): the failed request with the keys "timestamp", "api_request_url", "dataset_url", "metadata_url", "source_url" and "exception"
+        """
+
+        self.add_rows("failures", [(run_id, portal_url, failure["timestamp"], failure["api_request_url"], failure["dataset_url"], failure["metadata_url"], failure["source_url"], failure["exception"])])
+
+    def add_rows(self, table: str, rows: list):
+        """Buffering rows of a table, which are written as soon as the buffers contain "batch_size" rows.
+
+        Args:
+            table (str): the table - must be "pages", "datasets" or "failures"
+            rows (list): the rows as tuples in the order of the table's insert statement
+        """
+
+        with self.lock:
+            self.buffers[table].extend(rows)
+            self.buffered_rows += len(rows)
+            if self.buffered_rows >= self.batch_size:
+                self.flush_buffers()
+
+    def flush(self):
+        """Writing all buffered rows.
+        """
+
+        with self.lock:
+            self.flush_buffers()
+
+    def flush_buffers(self):
+        """Writing all buffered rows in one transaction - must be called while holding the lock.
+        """
+
+        if self.buffered_rows == 0:
+            return
+
+        with self.connection:
+            for table, rows in self.buffers.items():
+                if len(rows) > 0:
+                    self.connection.executemany(self.insert_statements[table], rows)
+
+        self.buffers = {table: [] for table in self.insert_statements}
+        self.buffered_rows = 0
+
+    def query(self, sql: str, params: tuple = ()) -> pd.DataFrame:
+        """Running a query on the database after writing all buffered rows.
+
+        Args:
+            sql (str): the SQL query
+            params (tuple, optional): the parameters of the query - defaults to ()
+
+        Returns:
+            pd.DataFrame: the result of the query
+        """
+
+        with self.lock:
+            self.flush_buffers()
+            return pd.read_sql_query(sql, self.connection, params = params)
+
+    def get_runs(self) -> pd.DataFrame:
+        """Getting all runs with their number of portals, handled datasets, failed datasets and failed API requests.
+
+        Returns:
+            pd.DataFrame: one row per run, the latest run first
+        """
+
+        return self.query("""
+            SELECT runs.*,
+                (SELECT COUNT(*) FROM portals WHERE portals.run_id = runs.run_id) AS number_of_portals,
+                (SELECT COUNT(*) FROM datasets WHERE datasets.run_id = runs.run_id) AS number_of_handled_datasets,
+                (SELECT COUNT(*) FROM datasets WHERE datasets.run_id = runs.run_id AND success = 0) AS number_of_failed_datasets,
+                (SELECT COUNT(*) FROM failures WHERE failures.run_id = runs.run_id) AS number_of_failed_requests
+            FROM runs ORDER BY run_id DESC
+        """)
+
+    def get_failed_datasets(self, portal_url: str, last_runs: int = 5) -> pd.DataFrame:
+        """Getting the datasets of a portal that failed during the latest runs which crawled the portal.
+
+        Args:
+            portal_url (str): the URL of the portal
+            last_runs (int, optional): the number of latest runs to be included - defaults to 5
+
+        Returns:
+            pd.DataFrame: one row per failed dataset and run
+        """
+
+        return self.query("SELECT * FROM datasets WHERE portal_url = ? AND success = 0 AND run_id IN (SELECT run_id FROM portals WHERE url = ? ORDER BY run_id DESC LIMIT ?) ORDER BY run_id, rowid", (portal_url, portal_url, last_runs))
+
+    def export_run_logs(self, run_id: int, log_file_success: str, log_file_fail: str, failed_api_requests_filename: str, dataset_column: str = "dataset_url"):
+        """Exporting the handled datasets and failed API requests of a run to CSV files with the same columns as the log files of earlier versions. Files without any rows are not created.
+
+        Args:
+            run_id (int): the ID of the run
+            log_file_success (str): the path of the CSV file for the successfully handled datasets
+            log_file_fail (str): the path of the CSV file for the failed datasets
+            failed_api_requests_filename (str): the path of the CSV file for the failed API requests
+            dataset_column (str, optional): the name of the dataset URL column in the failed API requests, e.g. "resource_url" for CKAN - defaults to "dataset_url"
+        """
+
+        flags = ["dataset_added", "metadata_added", "mapping_added"]
+
+        # Exporting the successfully handled datasets
+        datasets = self.query("SELECT timestamp, dataset_url, metadata_url, source_url, dataset_id, metadata_id, dataset_added, metadata_added, mapping_added, message FROM datasets WHERE run_id = ? AND success = 1 ORDER BY rowid", (run_id,))
+        if len(datasets) > 0:
+            datasets[flags] = datasets[flags].astype(bool)
+            datasets.to_csv(log_file_success, index = False)
+
+        # Exporting the failed datasets
+        datasets = self.query("SELECT timestamp, dataset_url, metadata_url, source_url, dataset_added, metadata_added, mapping_added, message FROM datasets WHERE run_id = ? AND success = 0 ORDER BY rowid", (run_id,))
+        if len(datasets) > 0:
+            datasets[flags] = datasets[flags].astype(bool)
+            datasets.to_csv(log_file_fail, index = False)
+
+        # Exporting the failed API requests
+        failures = self.query("SELECT timestamp, api_request_url, dataset_url, metadata_url, source_url, exception FROM failures WHERE run_id = ? ORDER BY rowid", (run_id,))
+        if len(failures) > 0:
+            failures.rename(columns = {"dataset_url": dataset_column}).to_csv(failed_api_requests_filename, index = False)
+
+    def close(self):
+        """Writing all buffered rows and closing the database.
+        """
+
+        with self.lock:
+            self.flush_buffers()
+            self.connection.close()
+
+
+def get_timestamp() -> str:
+    """Getting the current timestamp in the format used by all log files
+
+    Returns:
+        str: the current timestamp, e.g. "2023-05-01 12:00:00"
+    """
+
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -0,0 +1,6 @@
+# Importing required libraries
+import os
+import sys
+
+# Making the modules of the data portal tracker importable, which import each other from the script path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,61 @@
+# Importing required libraries
+import mongomock
+import pytest
+from pymongo.errors import BulkWriteError
+import archiver_connector
+from archiver_connector import ArchiverConnector
+
+
+class RacingCollection:
+    """A mapping collection that behaves as if another crawler added a mapping between the query and the bulk upsert of mongodb_reconcile_mappings(), which makes the MongoDB report a duplicate key error for it.
+    """
+
+    def __init__(self, collection, racing_mapping: tuple):
+        self.collection = collection
+        self.racing_mapping = racing_mapping
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def bulk_write(self, operations, ordered = True):
+        # Adding the mapping like the other crawler (the first operation of the bulk upsert), then upserting the remaining ones
+        self.collection.insert_one({"dataset_id": self.racing_mapping[0], "metadata_id": self.racing_mapping[1]})
+        result = self.collection.bulk_write(operations[1:], ordered = ordered)
+        raise BulkWriteError({"writeErrors": [{"index": 0, "code": 11000, "errmsg": "E11000 duplicate key error"}], "upserted": [{"index": index + 1, "_id": _id} for index, _id in result.upserted_ids.items()]})
+
+
+@pytest.fixture
+def mapping_collection(monkeypatch):
+    # Using a configuration without an Archiver, since only the MongoDB is used
+    monkeypatch.setattr(archiver_connector, "dotenv_values", lambda path: {"ARCHIVER_BASE_URL": "http://archiver.invalid/", "ARCHIVER_PASSWORD": ""})
+    return mongomock.MongoClient()["archiver"]["datasets.mappings"]
+
+
+def test_ensure_indexes_creates_unique_index(mapping_collection):
+    ArchiverConnector(mode = "local", mapping_collection = mapping_collection)
+
+    indexes = mapping_collection.index_information()
+    assert indexes["dataset_id_metadata_id_unique"]["key"] == [("dataset_id", 1), ("metadata_id", 1)]
+    assert indexes["dataset_id_metadata_id_unique"]["unique"] is True
+    assert "metadata_id" in indexes
+
+
+def test_reconcile_mappings_finds_existing_and_upserts_missing(mapping_collection):
+    archiver = ArchiverConnector(mode = "local", mapping_collection = mapping_collection)
+    mapping_collection.insert_one({"dataset_id": "d1", "metadata_id": "m1"})
+
+    results = archiver.mongodb_reconcile_mappings([("d1", "m1"), ("d2", "m2"), ("d2", "m2")])
+
+    assert results[("d1", "m1")] == {"query_success": True, "mapping_found": True, "mapping_added": False, "message": "Success!"}
+    assert results[("d2", "m2")] == {"query_success": True, "mapping_found": False, "mapping_added": True, "message": "Success!"}
+    assert mapping_collection.count_documents({"dataset_id": "d2", "metadata_id": "m2"}) == 1
+
+
+def test_reconcile_mappings_treats_duplicate_key_race_as_found(mapping_collection):
+    archiver = ArchiverConnector(mode = "local", mapping_collection = RacingCollection(mapping_collection, ("d1", "m1")))
+
+    results = archiver.mongodb_reconcile_mappings([("d1", "m1"), ("d2", "m2")])
+
+    assert results[("d1", "m1")] == {"query_success": True, "mapping_found": True, "mapping_added": False, "message": "Success!"}
+    assert results[("d2", "m2")] == {"query_success": True, "mapping_found": False, "mapping_added": True, "message": "Success!"}
+    assert mapping_collection.count_documents({}) == 2
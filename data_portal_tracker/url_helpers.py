@@ -0,0 +1,19 @@
+# Importing required libraries
+from urllib.parse import urlparse
+
+
+def get_host(url: str) -> str:
+    """Extracting the host of a URL, which is used to group portals that are served by the same server
+
+    Args:
+        url (str): the URL of the portal - can be with or without HTTP(S) prefix
+
+    Returns:
+        str: the host of the URL in lower case, e.g. "data.gv.at"
+    """
+
+    # Adding a protocol prefix if there is none, because urlparse() only detects the host after "//"
+    if not url.startswith("http://") and not url.startswith("https://"):
+        url = "http://" + url
+
+    return urlparse(url).netloc.lower()
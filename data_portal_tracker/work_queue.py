@@ -0,0 +1,307 @@
+# Importing required libraries
+import os
+import json
+import socket
+import sqlite3
+import threading
+from time import time
+from url_helpers import get_host
+from run_store import get_timestamp
+
+
+class WorkQueue:
+    """A base class for the work queue of sharded crawls, which hands the portals of a crawl job to the crawlers (workers) on several nodes through leases.
+
+    A worker leases one portal at a time and renews the leases of all its portals with heartbeats while it crawls them. If a worker dies, its leases expire and the portals are leased by other workers, which continue after the checkpoint saved by the dead worker. Only the worker holding a lease can save a checkpoint or complete the portal, so that a worker whose lease was taken over cannot overwrite the progress of the new worker.
+
+    Supporting another backend than the SQLite file of "SqliteWorkQueue" (e.g. a database server shared by the nodes) only requires a subclass implementing the methods below.
+    """
+
+    def __init__(self, lease_seconds: float = 300, maximum_attempts: int = 3):
+        """Instantiating the class.
+
+        Args:
+            lease_seconds (float, optional): the number of seconds a lease is valid without a heartbeat - defaults to 300
+            maximum_attempts (int, optional): the number of leases of a portal after which it is marked as failed instead of being leased again, so that a portal killing its workers doesn't stop the whole job - defaults to 3
+        """
+
+        self.lease_seconds = lease_seconds
+        self.maximum_attempts = maximum_attempts
+
+    def create_job(self, api: str, portal_urls: list, portal_sizes: dict = None, max_leases_per_host: int = 1) -> int:
+        """Creating a crawl job with a work item for each portal.
+
+        Args:
+            api (str): the API of the portals, e.g. "ckan"
+            portal_urls (list): the base URLs of the portals to be crawled
+            portal_sizes (dict, optional): {portal URL: number of datasets} used to lease the largest portals first - defaults to None
+            max_leases_per_host (int, optional): the maximum number of portals on the same host leased at the same time by all workers together - defaults to 1
+
+        Returns:
+            int: the ID of the job
+        """
+
+        raise NotImplementedError
+
+    def get_job(self, job_id: int) -> dict:
+        """Getting a crawl job.
+
+        Args:
+            job_id (int): the ID of the job
+
+        Returns:
+            dict: {"api" = the API of the portals, \n
+                "portal_urls" = the base URLs of all portals of the job, \n
+                "max_leases_per_host" = the maximum number of portals on the same host leased at the same time, \n
+                "created" = the timestamp of the job's creation} or None if the job doesn't exist
+        """
+
+        raise NotImplementedError
+
+    def lease(self, job_id: int, worker_id: str) -> dict:
+        """Leasing the next portal of a job, i.e. the largest portal that is pending or whose lease expired, as long as the limit of leases per host allows it.
+
+        Args:
+            job_id (int): the ID of the job
+            worker_id (str): the ID of the worker
+
+        Returns:
+            dict: {"item_id" = the ID of the work item, \n
+                "url" = the base URL of the portal, \n
+                "attempts" = the number of leases of the portal including this one, \n
+                "checkpoint" = the checkpoint saved by the previous worker {"position", "counters", "finished"} or None} or None if no portal can be leased right now
+        """
+
+        raise NotImplementedError
+
+    def heartbeat(self, worker_id: str) -> int:
+        """Renewing all leases of a worker.
+
+        Args:
+            worker_id (str): the ID of the worker
+
+        Returns:
+            int: the number of renewed leases
+        """
+
+        raise NotImplementedError
+
+    def save_checkpoint(self, item_id: int, worker_id: str, checkpoint: dict) -> bool:
+        """Saving the progress of a leased portal, so that another worker can continue after it if the lease expires.
+
+        Args:
+            item_id (int): the ID of the work item
+            worker_id (str): the ID of the worker
+            checkpoint (dict): {"position" = the position at which the crawl continues, "counters" = the counters of the crawl}
+
+        Returns:
+            bool: whether the worker still holds the lease
+        """
+
+        raise NotImplementedError
+
+    def complete(self, item_id: int, worker_id: str) -> bool:
+        """Marking a leased portal as crawled.
+
+        Args:
+            item_id (int): the ID of the work item
+            worker_id (str): the ID of the worker
+
+        Returns:
+            bool: whether the worker still held the lease
+        """
+
+        raise NotImplementedError
+
+    def fail(self, item_id: int, worker_id: str, reason: str) -> bool:
+        """Giving a leased portal back after its crawl failed, so that it is leased again or marked as failed once the maximum number of attempts has been reached.
+
+        Args:
+            item_id (int): the ID of the work item
+            worker_id (str): the ID of the worker
+            reason (str): why the crawl failed
+
+        Returns:
+            bool: whether the worker still held the lease
+        """
+
+        raise NotImplementedError
+
+    def get_progress(self, job_id: int) -> dict:
+        """Getting the progress of a job.
+
+        Args:
+            job_id (int): the ID of the job
+
+        Returns:
+            dict: {"pending" = the number of portals waiting for a worker, \n
+                "leased" = the number of portals currently crawled, \n
+                "expired" = the number of leased portals whose lease expired, \n
+                "done" = the number of crawled portals, \n
+                "failed" = the number of portals that failed too often, \n
+                "workers" = {worker ID: the number of seconds since its last heartbeat} of the workers holding leases}
+        """
+
+        raise NotImplementedError
+
+    def is_finished(self, job_id: int) -> bool:
+        """Checking whether all portals of a job were crawled or failed.
+
+        Args:
+            job_id (int): the ID of the job
+
+        Returns:
+            bool: whether no portal of the job is pending or leased
+        """
+
+        progress = self.get_progress(job_id)
+        return progress["pending"] == 0 and progress["leased"] == 0
+
+
+class SqliteWorkQueue(WorkQueue):
+    """A work queue stored in a SQLite file, which can be shared by multiple worker processes on one node or, on a file system with reliable locks, on several nodes.
+
+    Leases are taken in exclusive transactions, so that a portal is never leased by two workers at once.
+    """
+
+    def __init__(self, database_file: str, lease_seconds: float = 300, maximum_attempts: int = 3):
+        """Instantiating the class.
+
+        Args:
+            database_file (str): the path of the SQLite file to be created or reused
+            lease_seconds (float, optional): the number of seconds a lease is valid without a heartbeat - defaults to 300
+            maximum_attempts (int, optional): the number of leases of a portal after which it is marked as failed - defaults to 3
+        """
+
+        super().__init__(lease_seconds, maximum_attempts)
+
+        # Opening the database in autocommit mode, so that the transactions can be started explicitly, shared by all threads and protected by a lock
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(database_file, check_same_thread = False, timeout = 60, isolation_level = None)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+
+        # Creating the tables and index if they don't exist yet
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (job_id INTEGER PRIMARY KEY AUTOINCREMENT, api TEXT NOT NULL, max_leases_per_host INTEGER NOT NULL, created TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS items (item_id INTEGER PRIMARY KEY AUTOINCREMENT, job_id INTEGER NOT NULL, url TEXT NOT NULL, host TEXT NOT NULL, priority INTEGER NOT NULL DEFAULT 0, state TEXT NOT NULL DEFAULT 'pending', worker_id TEXT, lease_expires REAL, heartbeat REAL, attempts INTEGER NOT NULL DEFAULT 0, checkpoint TEXT, reason TEXT, updated TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS items_job_state ON items (job_id, state, priority);
+        """)
+
+    def transaction(self, statements):
+        """Running a function in an exclusive transaction, which is rolled back if an exception occurs.
+
+        Args:
+            statements (function): the function executing the statements, called with the connection
+
+        Returns:
+            the return value of the function
+        """
+
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(self.connection)
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+            return result
+
+    def create_job(self, api: str, portal_urls: list, portal_sizes: dict = None, max_leases_per_host: int = 1) -> int:
+        if portal_sizes is None:
+            portal_sizes = {}
+
+        def statements(connection):
+            job_id = connection.execute("INSERT INTO jobs (api, max_leases_per_host, created) VALUES (?, ?, ?)", (api, max_leases_per_host, get_timestamp())).lastrowid
+            connection.executemany("INSERT INTO items (job_id, url, host, priority, updated) VALUES (?, ?, ?, ?, ?)", [(job_id, url, get_host(url), int(portal_sizes.get(url, 0)), get_timestamp()) for url in dict.fromkeys(portal_urls)])
+            return job_id
+
+        return self.transaction(statements)
+
+    def get_job(self, job_id: int) -> dict:
+        with self.lock:
+            row = self.connection.execute("SELECT api, max_leases_per_host, created FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            portal_urls = [url for (url,) in self.connection.execute("SELECT url FROM items WHERE job_id = ? ORDER BY item_id", (job_id,))]
+
+        return {"api": row[0], "portal_urls": portal_urls, "max_leases_per_host": row[1], "created": row[2]}
+
+    def lease(self, job_id: int, worker_id: str) -> dict:
+        def statements(connection):
+            now = time()
+
+            # Marking the portals whose leases expired too often as failed
+            connection.execute("UPDATE items SET state = 'failed', reason = ?, updated = ? WHERE job_id = ? AND state = 'leased' AND lease_expires < ? AND attempts >= ?", ("The lease expired " + str(self.maximum_attempts) + " times.", get_timestamp(), job_id, now, self.maximum_attempts))
+
+            # Choosing the largest portal that is pending or whose lease expired, skipping the hosts which already have the maximum number of active leases
+            row = connection.execute("""
+                SELECT item_id, url, attempts, checkpoint FROM items
+                WHERE job_id = ? AND (state = 'pending' OR (state = 'leased' AND lease_expires < ?))
+                AND host NOT IN (SELECT host FROM items WHERE job_id = ? AND state = 'leased' AND lease_expires >= ? GROUP BY host HAVING COUNT(*) >= (SELECT max_leases_per_host FROM jobs WHERE job_id = ?))
+                ORDER BY priority DESC, item_id LIMIT 1
+            """, (job_id, now, job_id, now, job_id)).fetchone()
+            if row is None:
+                return None
+
+            item_id, url, attempts, checkpoint = row
+            connection.execute("UPDATE items SET state = 'leased', worker_id = ?, lease_expires = ?, heartbeat = ?, attempts = ?, updated = ? WHERE item_id = ?", (worker_id, now + self.lease_seconds, now, attempts + 1, get_timestamp(), item_id))
+            return {"item_id": item_id, "url": url, "attempts": attempts + 1, "checkpoint": json.loads(checkpoint) if checkpoint is not None else None}
+
+        return self.transaction(statements)
+
+    def heartbeat(self, worker_id: str) -> int:
+        def statements(connection):
+            now = time()
+            return connection.execute("UPDATE items SET lease_expires = ?, heartbeat = ? WHERE state = 'leased' AND worker_id = ? AND lease_expires >= ?", (now + self.lease_seconds, now, worker_id, now)).rowcount
+
+        return self.transaction(statements)
+
+    def save_checkpoint(self, item_id: int, worker_id: str, checkpoint: dict) -> bool:
+        def statements(connection):
+            return connection.execute("UPDATE items SET checkpoint = ?, updated = ? WHERE item_id = ? AND state = 'leased' AND worker_id = ?", (json.dumps(dict(checkpoint, finished = False)), get_timestamp(), item_id, worker_id)).rowcount == 1
+
+        return self.transaction(statements)
+
+    def complete(self, item_id: int, worker_id: str) -> bool:
+        def statements(connection):
+            return connection.execute("UPDATE items SET state = 'done', lease_expires = NULL, updated = ? WHERE item_id = ? AND state = 'leased' AND worker_id = ?", (get_timestamp(), item_id, worker_id)).rowcount == 1
+
+        return self.transaction(statements)
+
+    def fail(self, item_id: int, worker_id: str, reason: str) -> bool:
+        def statements(connection):
+            return connection.execute("UPDATE items SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, lease_expires = NULL, reason = ?, updated = ? WHERE item_id = ? AND state = 'leased' AND worker_id = ?", (self.maximum_attempts, reason, get_timestamp(), item_id, worker_id)).rowcount == 1
+
+        return self.transaction(statements)
+
+    def get_progress(self, job_id: int) -> dict:
+        now = time()
+
+        with self.lock:
+            progress = {state: 0 for state in ("pending", "leased", "expired", "done", "failed")}
+            for state, expired, count in self.connection.execute("SELECT state, state = 'leased' AND lease_expires < ?, COUNT(*) FROM items WHERE job_id = ? GROUP BY 1, 2", (now, job_id)):
+                progress[state] += count
+                if expired:
+                    progress["expired"] += count
+
+            progress["workers"] = {worker_id: now - heartbeat for worker_id, heartbeat in self.connection.execute("SELECT worker_id, MAX(heartbeat) FROM items WHERE job_id = ? AND state = 'leased' GROUP BY worker_id", (job_id,))}
+
+        return progress
+
+    def close(self):
+        """Closing the database.
+        """
+
+        with self.lock:
+            self.connection.close()
+
+
+def get_worker_id() -> str:
+    """Getting an ID of the current process that is unique across the nodes.
+
+    Returns:
+        str: the ID, e.g. "node-1:12345"
+    """
+
+    return socket.gethostname() + ":" + str(os.getpid())